@@ -0,0 +1,342 @@
+'''
+Centralized registry of the pretrained models used by the project. Resolve models through this module, e.g.
+`model_registry.load('gliner').model`, instead of calling `from_pretrained` directly.
+
+Each model is fetched once into a versioned directory, `MODELS_DIR/registry/<name>/<revision>`, and loaded from
+there without touching the network, so no HF_HOME needs to be configured. Loaded models are shared singletons per
+process. CPU-optimized variants, dynamically int8-quantized or exported to ONNX, are created on request:
+
+    python -m config.model_registry fetch
+    python -m config.model_registry export-onnx roberta-sentiment
+    python -m config.model_registry report --variants default int8 onnx
+'''
+
+from collections.abc import Sequence
+from dataclasses import dataclass
+import datetime as _dt
+import inspect
+import json
+from pathlib import Path
+import threading
+import time
+from typing import Any, Literal
+from config import config as _config
+
+REGISTRY_DIR = _config.MODELS_DIR / 'registry'
+
+ModelKind = Literal['sequence-classification', 'gliner', 'spacy']
+ModelVariant = Literal['default', 'int8', 'onnx']
+
+@dataclass(frozen=True)
+class ModelSpec:
+    '''
+    :param source: Hugging Face Hub repository id, or spaCy package name.
+    :param revision: Hub branch, tag or commit to fetch. Pin a commit hash for reproducible results.
+    '''
+    kind: ModelKind
+    source: str
+    revision: str = 'main'
+
+MODEL_SPECS: dict[str, ModelSpec] = {
+    'roberta-sentiment': ModelSpec('sequence-classification', 'cardiffnlp/twitter-roberta-base-sentiment-latest'),
+    'deberta-absa': ModelSpec('sequence-classification', 'yangheng/deberta-v3-base-absa-v1.1'),
+    'gliner': ModelSpec('gliner', 'urchade/gliner_medium-v2.1'),
+    'spacy': ModelSpec('spacy', 'en_core_web_sm'),
+}
+
+_MANIFEST_FILE = 'manifest.json'
+_ONNX_FILE = 'model.onnx'
+
+@dataclass(frozen=True)
+class LoadedModel:
+    '''
+    :param revision: Identifies the exact weights and variant, e.g. for `src.models.inference_cache` keys.
+    :param tokenizer: The tokenizer of sequence classification models, else None.
+    '''
+    name: str
+    variant: ModelVariant
+    path: Path
+    revision: str
+    model: Any
+    tokenizer: Any
+    load_seconds: float
+
+def _spec(name: str) -> ModelSpec:
+    if name not in MODEL_SPECS:
+        raise KeyError(f'Unknown model {name!r}, expected one of {sorted(MODEL_SPECS)}.')
+
+    return MODEL_SPECS[name]
+
+def model_dir(name: str) -> Path:
+    '''The versioned local directory of a model, whether or not it was fetched.'''
+    return REGISTRY_DIR / name / _spec(name).revision
+
+def is_fetched(name: str) -> bool:
+    return (model_dir(name) / _MANIFEST_FILE).exists()
+
+def manifest(name: str) -> dict[str, Any]:
+    return json.loads((model_dir(name) / _MANIFEST_FILE).read_text())
+
+def fetch(name: str, force: bool = False) -> Path:
+    '''Download a model into its versioned directory, unless it already is.
+
+    :return: The model directory.
+    '''
+    spec = _spec(name)
+    path = model_dir(name)
+
+    if is_fetched(name) and not force:
+        return path
+
+    path.mkdir(parents=True, exist_ok=True)
+    if spec.kind == 'spacy':
+        import spacy
+
+        nlp = spacy.load(spec.source)
+        nlp.to_disk(path / 'model')
+        resolved_revision = nlp.meta['version']
+    else:
+        from huggingface_hub import snapshot_download, model_info
+
+        snapshot_download(spec.source, revision=spec.revision, local_dir=path / 'model')
+        resolved_revision = model_info(spec.source, revision=spec.revision).sha or spec.revision
+
+    (path / _MANIFEST_FILE).write_text(json.dumps({
+        'source': spec.source,
+        'revision': spec.revision,
+        'resolved_revision': resolved_revision,
+        'fetched_at': _dt.datetime.now(_dt.timezone.utc).isoformat(),
+    }, indent=4))
+    return path
+
+def _local_path(name: str, offline: bool) -> Path:
+    if not is_fetched(name):
+        if offline:
+            raise FileNotFoundError(
+                f'Model {name!r} is not in {model_dir(name)}, fetch it with '
+                f'`python -m config.model_registry fetch {name}`.'
+            )
+
+        fetch(name)
+
+    return model_dir(name) / 'model'
+
+def _quantize_int8(model: Any) -> Any:
+    import torch
+
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+class OnnxSequenceClassifier:
+    '''Runs an exported sequence classification model with onnxruntime, called like the torch model:
+    `model(**inputs).logits`.
+    '''
+
+    def __init__(self, onnx_file: Path) -> None:
+        import onnxruntime
+
+        self.session = onnxruntime.InferenceSession(str(onnx_file), providers=['CPUExecutionProvider'])
+        self._input_names = {node.name for node in self.session.get_inputs()}
+
+    def __call__(self, **inputs: Any) -> Any:
+        import torch
+        from transformers.modeling_outputs import SequenceClassifierOutput
+
+        feed = {name: value.cpu().numpy() for name, value in inputs.items() if name in self._input_names}
+        logits, = self.session.run(['logits'], feed)
+        return SequenceClassifierOutput(logits=torch.from_numpy(logits))
+
+    def to(self, device: Any) -> 'OnnxSequenceClassifier':
+        return self
+
+    def eval(self) -> 'OnnxSequenceClassifier':
+        return self
+
+_ONNX_PARITY_TEXTS = [
+    'A sample text to trace the model with.',
+    'Max Verstappen wins the race after a brilliant pit stop strategy.',
+    'Terrible decision by the stewards, that penalty makes no sense at all.',
+]
+
+def export_onnx(name: str, offline: bool = False, opset_version: int = 17, atol: float = 1e-4) -> Path:
+    '''Export a sequence classification model to ONNX, next to its weights, and check that the exported model returns
+    the same logits as the torch model.
+
+    :param atol: Absolute tolerance of the logits check.
+    :return: The ONNX file.
+    '''
+    if _spec(name).kind != 'sequence-classification':
+        raise ValueError(f'Only sequence classification models can be exported to ONNX, not {name!r}.')
+
+    import numpy as np
+    import torch
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+    path = _local_path(name, offline)
+    tokenizer = AutoTokenizer.from_pretrained(path, local_files_only=True)
+    model = AutoModelForSequenceClassification.from_pretrained(path, local_files_only=True)
+    model.eval()
+
+    onnx_file = model_dir(name) / 'onnx' / _ONNX_FILE
+    onnx_file.parent.mkdir(parents=True, exist_ok=True)
+    inputs = tokenizer(_ONNX_PARITY_TEXTS[:1], return_tensors='pt')
+    # The graph inputs follow the order of the forward parameters, not the order of the tokenizer output, e.g.
+    # DeBERTa's tokenizer returns token_type_ids before attention_mask.
+    input_names = [parameter for parameter in inspect.signature(model.forward).parameters if parameter in inputs]
+    dynamic_axes = {input_name: {0: 'batch', 1: 'sequence'} for input_name in input_names}
+    dynamic_axes['logits'] = {0: 'batch'}
+
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            (dict(inputs),),
+            str(onnx_file),
+            input_names=input_names,
+            output_names=['logits'],
+            dynamic_axes=dynamic_axes,
+            opset_version=opset_version,
+        )
+
+        parity_inputs = tokenizer(_ONNX_PARITY_TEXTS, padding=True, return_tensors='pt')
+        torch_logits = model(**parity_inputs).logits.numpy()
+        onnx_logits = OnnxSequenceClassifier(onnx_file)(**parity_inputs).logits.numpy()
+
+    if not np.allclose(onnx_logits, torch_logits, atol=atol):
+        raise RuntimeError(
+            f'The ONNX export of {name!r} in {onnx_file} does not match the torch model: the logits differ by up to '
+            f'{np.abs(onnx_logits - torch_logits).max():.2e}.'
+        )
+
+    return onnx_file
+
+def _load_uncached(name: str, variant: ModelVariant, offline: bool) -> LoadedModel:
+    spec = _spec(name)
+    if variant == 'onnx' and spec.kind != 'sequence-classification':
+        raise ValueError(f'There is no ONNX variant of {name!r}, only of sequence classification models.')
+    if variant == 'int8' and spec.kind == 'spacy':
+        raise ValueError('There is no int8 variant of the spaCy pipeline.')
+
+    path = _local_path(name, offline)
+    started_at = time.perf_counter()
+    tokenizer = None
+
+    if spec.kind == 'spacy':
+        import spacy
+
+        model = spacy.load(path)
+    elif spec.kind == 'gliner':
+        from gliner import GLiNER
+
+        model = GLiNER.from_pretrained(str(path), local_files_only=True)
+    else:
+        from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+        tokenizer = AutoTokenizer.from_pretrained(path, local_files_only=True)
+        if variant == 'onnx':
+            onnx_file = model_dir(name) / 'onnx' / _ONNX_FILE
+            model = OnnxSequenceClassifier(onnx_file if onnx_file.exists() else export_onnx(name, offline=True))
+        else:
+            model = AutoModelForSequenceClassification.from_pretrained(path, local_files_only=True)
+
+    if variant == 'int8':
+        model = _quantize_int8(model)
+    if hasattr(model, 'eval'):
+        model.eval()
+
+    revision = manifest(name)['resolved_revision'] + ('' if variant == 'default' else f'+{variant}')
+    return LoadedModel(name, variant, path, revision, model, tokenizer, time.perf_counter() - started_at)
+
+_loaded_models: dict[tuple[str, ModelVariant], LoadedModel] = {}
+_load_lock = threading.Lock()
+
+def load(name: str, variant: ModelVariant = 'default', offline: bool = False) -> LoadedModel:
+    '''Load a registered model once per process; later calls return the same instance.
+
+    :param variant: 'int8' quantizes the linear layers dynamically, 'onnx' runs an exported ONNX graph on CPU.
+    :param offline: If true, never touch the network and raise FileNotFoundError if the model was not fetched.
+    '''
+    with _load_lock:
+        if (name, variant) not in _loaded_models:
+            _loaded_models[name, variant] = _load_uncached(name, variant, offline)
+
+        return _loaded_models[name, variant]
+
+def _measure_latency(loaded_model: LoadedModel, texts: Sequence[str], repeats: int) -> float:
+    ''':return: The mean seconds per call on `texts` as one batch.'''
+    if MODEL_SPECS[loaded_model.name].kind == 'spacy':
+        run = lambda: list(loaded_model.model.pipe(texts))
+    elif MODEL_SPECS[loaded_model.name].kind == 'gliner':
+        run = lambda: loaded_model.model.batch_predict_entities(list(texts), ['driver', 'position'])
+    else:
+        import torch
+
+        inputs = loaded_model.tokenizer(list(texts), return_tensors='pt', truncation=True, padding=True)
+        def run() -> None:
+            with torch.inference_mode():
+                loaded_model.model(**inputs)
+
+    run()
+    started_at = time.perf_counter()
+    for _ in range(repeats):
+        run()
+    return (time.perf_counter() - started_at) / repeats
+
+def report(
+    names: Sequence[str] = tuple(MODEL_SPECS),
+    variants: Sequence[ModelVariant] = ('default',),
+    texts: Sequence[str] = ('Verstappen will finish P1 again, Leclerc on the podium.',) * 8,
+    repeats: int = 5,
+) -> list[dict[str, Any]]:
+    '''Load time and latency per batch of `texts` of each (model, variant). Models that were not fetched and
+    unsupported variants are skipped.
+    '''
+    rows: list[dict[str, Any]] = []
+
+    for name in names:
+        for variant in variants:
+            try:
+                loaded_model = load(name, variant, offline=True)
+            except (ValueError, FileNotFoundError):
+                continue
+
+            rows.append({
+                'model': name,
+                'variant': variant,
+                'revision': loaded_model.revision,
+                'load_seconds': loaded_model.load_seconds,
+                'latency_ms': _measure_latency(loaded_model, texts, repeats) * 1000,
+            })
+
+    return rows
+
+def main() -> None:
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Fetch, export and compare the registered models.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    fetch_parser = subparsers.add_parser('fetch', help='download models into the registry')
+    fetch_parser.add_argument('names', nargs='*', default=list(MODEL_SPECS))
+    fetch_parser.add_argument('--force', action='store_true')
+    export_parser = subparsers.add_parser('export-onnx', help='export sequence classification models to ONNX')
+    export_parser.add_argument('names', nargs='+')
+    report_parser = subparsers.add_parser('report', help='compare load time and latency, offline')
+    report_parser.add_argument('--names', nargs='*', default=list(MODEL_SPECS))
+    report_parser.add_argument('--variants', nargs='*', default=['default'], choices=['default', 'int8', 'onnx'])
+    report_parser.add_argument('--repeats', type=int, default=5)
+    args = parser.parse_args()
+
+    if args.command == 'fetch':
+        for name in args.names:
+            print(f'{name}: {fetch(name, args.force)}')
+    elif args.command == 'export-onnx':
+        for name in args.names:
+            print(f'{name}: {export_onnx(name)}')
+    else:
+        print(f'{"model":<20}{"variant":<10}{"load (s)":>10}{"latency (ms)":>14}  revision')
+        for row in report(args.names, args.variants, repeats=args.repeats):
+            print(
+                f'{row["model"]:<20}{row["variant"]:<10}{row["load_seconds"]:>10.2f}{row["latency_ms"]:>14.1f}  '
+                f'{row["revision"]}'
+            )
+
+if __name__ == '__main__':
+    main()
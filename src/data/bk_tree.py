@@ -0,0 +1,82 @@
+'''Burkhard-Keller tree for sub-linear nearest-term lookups under the Levenshtein distance.'''
+
+from collections.abc import Iterable
+from editdistpy import levenshtein
+
+def levenshtein_distance(a: str, b: str) -> int:
+    '''Same distance as `nltk.metrics.distance.edit_distance` with its default arguments, computed in C.'''
+    return levenshtein.distance(a, b, max(len(a), len(b)))
+
+class _Node:
+    __slots__ = ('term', 'rank', 'children')
+
+    def __init__(self, term: str, rank: int) -> None:
+        self.term = term
+        self.rank = rank
+        self.children: dict[int, _Node] = {}
+
+class BKTree:
+    '''Index over a vocabulary that only compares a query against the terms the triangle inequality cannot rule out.
+
+    Each term keeps its rank, i.e. its position in the iteration order of `terms`, so ties between equally distant
+    terms can be broken the same way as a linear scan over `terms` would.
+    '''
+
+    def __init__(self, terms: Iterable[str]) -> None:
+        self._root: _Node | None = None
+        self._size = 0
+
+        for term in terms:
+            self.add(term)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add(self, term: str) -> None:
+        new_node = _Node(term, self._size)
+
+        if self._root is None:
+            self._root = new_node
+            self._size += 1
+            return
+
+        node = self._root
+        while True:
+            distance = levenshtein_distance(term, node.term)
+            if distance == 0:
+                return
+
+            child = node.children.get(distance)
+            if child is None:
+                node.children[distance] = new_node
+                self._size += 1
+                return
+
+            node = child
+
+    def search(self, query: str, max_distance: int) -> list[tuple[int, int, str]]:
+        ''':return: (distance, rank, term) of every term within `max_distance` of `query`, sorted.'''
+        if self._root is None:
+            return []
+
+        matches: list[tuple[int, int, str]] = []
+        stack = [self._root]
+
+        while stack:
+            node = stack.pop()
+            distance = levenshtein_distance(query, node.term)
+
+            if distance <= max_distance:
+                matches.append((distance, node.rank, node.term))
+
+            for child_distance, child in node.children.items():
+                if distance - max_distance <= child_distance <= distance + max_distance:
+                    stack.append(child)
+
+        matches.sort()
+        return matches
+
+    def nearest(self, query: str, max_distance: int) -> str | None:
+        ''':return: The closest term within `max_distance`, the lowest-ranked one on ties, or None if there is none.'''
+        matches = self.search(query, max_distance)
+        return matches[0][2] if matches else None
@@ -0,0 +1,152 @@
+'''Persistent columnar cache of parsed subreddit dumps.
+
+Parsed DataFrames are stored as Feather (Arrow IPC) files under `PARSED_DATA_CACHE_DIR`. A cache entry is keyed
+on the raw file's path, size, modification time and content hash, plus a digest of the dtype schema it was parsed
+with, so it invalidates itself when either the raw file or `src.data.constants` changes.
+'''
+
+from collections.abc import Set as ImmutableSet
+from collections.abc import Mapping
+from dataclasses import dataclass, asdict
+from typing import Any
+import hashlib
+import json
+import warnings
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+from pathlib import Path
+from config import config
+from src.data import compact
+
+PARSED_DATA_CACHE_DIR = config.PROCESSED_DATA_DIR / 'parsed'
+
+@dataclass(frozen=True)
+class FileFingerprint:
+    size: int
+    mtime_ns: int
+    sha256: str
+
+def file_key(ndjson_file: Path) -> str:
+    '''Name of the cache entries of `ndjson_file`: its stem plus a short hash of its resolved path, so files with the
+    same name in different directories do not share entries, e.g. '<stem>-1a2b3c4d'.
+    '''
+    path = ndjson_file.resolve()
+    if path.is_relative_to(config.ROOT_DIR.resolve()):
+        path = path.relative_to(config.ROOT_DIR.resolve())
+
+    return f'{ndjson_file.stem}-{hashlib.sha256(path.as_posix().encode("utf-8")).hexdigest()[:8]}'
+
+def _fingerprint_path(ndjson_file: Path) -> Path:
+    return PARSED_DATA_CACHE_DIR / f'{file_key(ndjson_file)}.fingerprint.json'
+
+def fingerprint_file(ndjson_file: Path) -> FileFingerprint:
+    '''Fingerprint a raw file by its size, mtime and SHA-256 content hash.
+
+    Hashing a full dump takes a while, so the hash is stored in a sidecar file and only recomputed when the size
+    or mtime of the raw file changed.
+    '''
+    stat = ndjson_file.stat()
+    fingerprint_path = _fingerprint_path(ndjson_file)
+
+    if fingerprint_path.exists():
+        stored = FileFingerprint(**json.loads(fingerprint_path.read_text(encoding='utf-8')))
+        if (stored.size, stored.mtime_ns) == (stat.st_size, stat.st_mtime_ns):
+            return stored
+
+    with open(ndjson_file, 'rb') as file:
+        sha256 = hashlib.file_digest(file, 'sha256').hexdigest()
+
+    fingerprint = FileFingerprint(size=stat.st_size, mtime_ns=stat.st_mtime_ns, sha256=sha256)
+    fingerprint_path.parent.mkdir(parents=True, exist_ok=True)
+    fingerprint_path.write_text(json.dumps(asdict(fingerprint)), encoding='utf-8')
+    return fingerprint
+
+def schema_digest(column_dtypes: Mapping[str, Any]) -> str:
+    '''Stable digest of a dtype map such as `src.data.constants.COMMENT_COLUMN_DTYPES`.'''
+    schema = sorted(
+        (column, 'str' if dtype is str else np.dtype(dtype).str)
+        for column, dtype in column_dtypes.items()
+    )
+    return hashlib.sha256(json.dumps(schema).encode('utf-8')).hexdigest()
+
+def cache_path(ndjson_file: Path, column_dtypes: Mapping[str, Any]) -> Path:
+    fingerprint = fingerprint_file(ndjson_file)
+    return PARSED_DATA_CACHE_DIR / (
+        f'{file_key(ndjson_file)}-{fingerprint.sha256[:16]}-{schema_digest(column_dtypes)[:12]}.feather'
+    )
+
+def cached_columns(ndjson_file: Path, column_dtypes: Mapping[str, Any]) -> frozenset[str]:
+    ''':return: The columns stored in the up-to-date cache entry of `ndjson_file`, empty if there is none.'''
+    path = cache_path(ndjson_file, column_dtypes)
+
+    if not path.exists():
+        return frozenset()
+
+    return frozenset(feather.read_table(path, memory_map=True).column_names)
+
+def read_cached_df(
+    ndjson_file: Path,
+    columns: ImmutableSet[str],
+    column_dtypes: Mapping[str, Any],
+    limit: int | None = None,
+    compact_column_dtypes: Mapping[str, Any] | None = None,
+) -> pd.DataFrame | None:
+    '''Read the requested columns of `ndjson_file` from the cache.
+
+    :param limit: Maximum number of rows to read. If None, read all rows.
+    :param compact_column_dtypes: If given, convert the rows to this compact schema one chunk at a time, see
+        `src.data.compact.to_compact_schema_chunked`.
+    :return: The cached DataFrame with its columns in the iteration order of `columns`, or None if there is no
+        up-to-date cache entry that contains all requested columns.
+    '''
+    path = cache_path(ndjson_file, column_dtypes)
+
+    if not path.exists() or not columns <= cached_columns(ndjson_file, column_dtypes):
+        return None
+
+    table = feather.read_table(path, columns=list(columns), memory_map=True)
+
+    if limit is not None:
+        table = table.slice(0, max(limit, 0))
+
+    if compact_column_dtypes is None:
+        return table.to_pandas()
+
+    return compact.to_compact_schema_chunked(
+        (
+            table.slice(start, compact.CHUNK_SIZE).to_pandas()
+            for start in range(0, max(table.num_rows, 1), compact.CHUNK_SIZE)
+        ),
+        compact_column_dtypes,
+    )
+
+def write_cached_df(ndjson_file: Path, df: pd.DataFrame, column_dtypes: Mapping[str, Any]) -> Path | None:
+    '''Store the parsed DataFrame of `ndjson_file`, replacing any stale cache entries of the same file.
+
+    :return: The cache entry, or None if `df` could not be written, e.g. because a column mixes types that Arrow
+        cannot convert. The load that parsed `df` does not depend on the cache, so it is not failed for it.
+    '''
+    path = cache_path(ndjson_file, column_dtypes)
+    temporary_path = path.with_suffix('.feather.tmp')
+
+    try:
+        feather.write_feather(df.reset_index(drop=True), temporary_path, compression='lz4')
+    except (pa.ArrowException, OSError) as error:
+        temporary_path.unlink(missing_ok=True)
+        warnings.warn(f'Not caching {ndjson_file}: {error}', UserWarning)
+        return None
+
+    for stale_path in PARSED_DATA_CACHE_DIR.glob(f'{file_key(ndjson_file)}-*.feather'):
+        stale_path.unlink()
+
+    temporary_path.replace(path)
+    return path
+
+def clear_cache(ndjson_file: Path | None = None) -> None:
+    '''Remove the cache entries of `ndjson_file`, or of all files if None.'''
+    pattern = f'{file_key(ndjson_file)}[-.]*' if ndjson_file is not None else '*'
+
+    for path in PARSED_DATA_CACHE_DIR.glob(pattern):
+        path.unlink()
@@ -0,0 +1,154 @@
+'''Conversion between the default and the memory-compact schemas of the loaded DataFrames.
+
+See `src.data.constants.COMPACT_SUBMISSION_COLUMN_DTYPES` and `src.data.constants.COMPACT_COMMENT_COLUMN_DTYPES`.
+'''
+
+from collections.abc import Iterable, Mapping, Sequence
+from typing import Any
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+from src.data import constants
+
+_BASE36_ALPHABET = np.frombuffer(b'0123456789abcdefghijklmnopqrstuvwxyz', dtype=np.uint8)
+_BASE36_DIGIT_VALUES = np.full(256, -1, dtype=np.int64)
+_BASE36_DIGIT_VALUES[_BASE36_ALPHABET] = np.arange(len(_BASE36_ALPHABET))
+
+# 36 ** 12 still fits in an int64, Reddit ids are at most 7 characters long.
+_BASE36_MAX_WIDTH = 12
+
+# Decoded value of a missing id, e.g. the 'None' that a missing `link_id` becomes in the default schema.
+MISSING_ID = -1
+_MISSING_ID_STRINGS = ('None', 'nan', '')
+
+# Number of rows that a compact load converts at a time, see `to_compact_schema_chunked`.
+CHUNK_SIZE = 100_000
+
+def decode_base36(ids: pd.Series, prefix: str = '') -> np.ndarray:
+    '''Decode base-36 Reddit ids such as 'dbumnq8' (or 't3_5lcgjh' with `prefix='t3_'`) into integers. Missing ids,
+    including the 'None' strings of the default schema, are decoded to `MISSING_ID`.
+
+    :raises ValueError: If an id is missing `prefix`, is not lowercase base-36 or is too long to fit in an int64.
+    '''
+    is_missing = (ids.isna() | ids.astype(str).isin(_MISSING_ID_STRINGS)).to_numpy()
+
+    if is_missing.any():
+        decoded = np.full(len(ids), MISSING_ID, dtype=np.int64)
+        decoded[~is_missing] = decode_base36(ids[~is_missing], prefix)
+        return decoded
+
+    if len(ids) == 0:
+        return np.empty(0, dtype=np.int64)
+
+    ids = ids.astype(str)
+    if prefix:
+        has_prefix = ids.str.startswith(prefix)
+        if not has_prefix.all():
+            raise ValueError(f'Expected all ids to start with {prefix!r}, got e.g. {ids[~has_prefix].iloc[0]!r}.')
+        ids = ids.str.slice(len(prefix))
+
+    width = int(ids.str.len().max())
+    if width > _BASE36_MAX_WIDTH:
+        raise ValueError(f'Expected ids of at most {_BASE36_MAX_WIDTH} characters, got {width}.')
+
+    # Left-pad with '0' so every id becomes one row of a fixed-width ASCII byte matrix.
+    characters = ids.str.rjust(width, '0').to_numpy(dtype=f'S{width}').view(np.uint8).reshape(-1, width)
+    digits = _BASE36_DIGIT_VALUES[characters]
+
+    if (digits < 0).any():
+        raise ValueError(f'Expected lowercase base-36 ids, got e.g. {ids[(digits < 0).any(axis=1)].iloc[0]!r}.')
+
+    return digits @ (36 ** np.arange(width - 1, -1, -1, dtype=np.int64))
+
+def encode_base36(values: np.ndarray, prefix: str = '') -> np.ndarray:
+    '''Inverse of `decode_base36`.
+
+    :return: Object array of id strings, None for `MISSING_ID`.
+    '''
+    values = np.asarray(values, dtype=np.int64)
+    digits = values[:, np.newaxis] // (36 ** np.arange(_BASE36_MAX_WIDTH - 1, -1, -1, dtype=np.int64)) % 36
+    padded = _BASE36_ALPHABET[digits].view(f'S{_BASE36_MAX_WIDTH}').ravel()
+
+    return np.array([
+        None if value == MISSING_ID else prefix + (id_.decode('ascii').lstrip('0') or '0')
+        for value, id_ in zip(values, padded)
+    ], dtype=object)
+
+def to_compact_schema(df: pd.DataFrame, compact_column_dtypes: Mapping[str, Any]) -> pd.DataFrame:
+    ''':param compact_column_dtypes: e.g. `src.data.constants.COMPACT_COMMENT_COLUMN_DTYPES`.'''
+    df = df.copy()
+
+    for column, prefix in constants.BASE36_ID_COLUMN_PREFIXES.items():
+        if column in df.columns:
+            df[column] = decode_base36(df[column], prefix)
+
+    return df.astype({
+        column: dtype
+        for column, dtype in compact_column_dtypes.items()
+        if column in df.columns
+    })
+
+def concat_compact(dfs: Sequence[pd.DataFrame]) -> pd.DataFrame:
+    '''`pd.concat` of DataFrames in the compact schema that keeps categorical columns categorical, over the union of
+    the categories of every DataFrame, where `pd.concat` would fall back to object columns.
+    '''
+    categorical_columns = [
+        column for column, dtype in dfs[0].dtypes.items() if isinstance(dtype, pd.CategoricalDtype)
+    ]
+    df = pd.concat([chunk_df.drop(columns=categorical_columns) for chunk_df in dfs], ignore_index=True)
+
+    for column in categorical_columns:
+        df[column] = union_categoricals([chunk_df[column] for chunk_df in dfs], sort_categories=True)
+
+    return df[list(dfs[0].columns)]
+
+def to_compact_schema_chunked(
+    chunks: Iterable[pd.DataFrame],
+    compact_column_dtypes: Mapping[str, Any],
+) -> pd.DataFrame:
+    '''`to_compact_schema` of consecutive chunks of a DataFrame, concatenated. If `chunks` is lazy, e.g. while
+    parsing, only one chunk at a time is in the default schema, which bounds the peak memory of a compact load.
+
+    :param chunks: At least one chunk, which may be empty.
+    '''
+    return concat_compact([to_compact_schema(chunk, compact_column_dtypes) for chunk in chunks])
+
+def from_compact_schema(df: pd.DataFrame, column_dtypes: Mapping[str, Any]) -> pd.DataFrame:
+    '''Inverse of `to_compact_schema`.
+
+    :param column_dtypes: e.g. `src.data.constants.COMMENT_COLUMN_DTYPES`.
+    '''
+    df = df.copy()
+
+    for column, prefix in constants.BASE36_ID_COLUMN_PREFIXES.items():
+        if column in df.columns:
+            df[column] = encode_base36(df[column].to_numpy(), prefix)
+
+    # Turn categoricals and Arrow strings back into plain object columns of Python strings.
+    df = df.astype({column: object for column, dtype in column_dtypes.items() if column in df.columns and dtype is str})
+
+    return df.astype({
+        column: dtype
+        for column, dtype in column_dtypes.items()
+        if column in df.columns
+    })
+
+def memory_report(before_df: pd.DataFrame, after_df: pd.DataFrame) -> pd.DataFrame:
+    '''Compare the deep memory usage per column of a DataFrame before and after e.g. `to_compact_schema`.
+
+    :return: A DataFrame indexed by column, plus a 'Total' row, with the dtypes, the bytes before and after and the
+        fraction of memory that remains.
+    '''
+    before_bytes = before_df.memory_usage(index=False, deep=True)
+    after_bytes = after_df.memory_usage(index=False, deep=True)
+
+    report = pd.DataFrame({
+        'dtype_before': before_df.dtypes.astype(str),
+        'dtype_after': after_df.dtypes.astype(str),
+        'bytes_before': before_bytes,
+        'bytes_after': after_bytes,
+    })
+    report.loc['Total'] = ['', '', before_bytes.sum(), after_bytes.sum()]
+    report['ratio'] = report['bytes_after'] / report['bytes_before']
+
+    return report
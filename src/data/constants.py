@@ -1,6 +1,7 @@
 '''Constants related to the subreddit datasets'''
 
 import numpy as np
+import pandas as pd
 import datetime as dt
 from src.utils import infer_types
 from config import config
@@ -71,7 +72,7 @@ SUBMISSION_COLUMN_DTYPES = infer_types({
     # 'link_flair_css_class',
     # 'link_flair_richtext',
     # 'link_flair_template_id',
-    # 'link_flair_text',                                #FLAIRS: Document, News, Technical
+    'link_flair_text': str,                             #FLAIRS: Document, News, Technical
     # 'link_flair_text_color',
     # 'link_flair_type',
     # 'locked',
@@ -220,3 +221,33 @@ DEFAULT_COMMENT_COLUMNS = (frozenset({
     'id',
     'score',
 }))
+
+
+# Opt-in memory-compact schemas, see `src.data.compact`. Low-cardinality strings become categoricals, long texts
+# become Arrow-backed strings and the base-36 ids in `BASE36_ID_COLUMN_PREFIXES` are decoded into integers.
+ARROW_STRING_DTYPE = pd.StringDtype('pyarrow')
+
+# Column -> prefix that is stripped before decoding, e.g. 't3_5lcgjh' -> int('5lcgjh', 36).
+BASE36_ID_COLUMN_PREFIXES = {
+    'id': '',
+    'link_id': 't3_',
+}
+
+COMPACT_SUBMISSION_COLUMN_DTYPES = infer_types({
+    **SUBMISSION_COLUMN_DTYPES,
+    'author': 'category',
+    'id': np.int64,
+    'link_flair_text': 'category',
+    'permalink': ARROW_STRING_DTYPE,
+    'post_hint': 'category',
+    'selftext': ARROW_STRING_DTYPE,
+    'title': ARROW_STRING_DTYPE,
+})
+
+COMPACT_COMMENT_COLUMN_DTYPES = infer_types({
+    **COMMENT_COLUMN_DTYPES,
+    'author': 'category',
+    'body': ARROW_STRING_DTYPE,
+    'id': np.int64,
+    'link_id': np.int64,
+})
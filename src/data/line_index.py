@@ -0,0 +1,145 @@
+'''Sidecar byte-offset index over the raw NDJSON dumps.
+
+The index records the byte offset of every `block_size`-th line and the minimum and maximum `created_utc` of each
+block of lines, so readers can seek straight to a line range or time window instead of scanning from line 0.
+'''
+
+from dataclasses import dataclass
+import datetime as dt
+import json
+import re
+import numpy as np
+from pathlib import Path
+from config import config
+from src.data import cache
+
+LINE_INDEX_DIR = config.PROCESSED_DATA_DIR / 'line_index'
+DEFAULT_BLOCK_SIZE = 20_000
+
+_CREATED_UTC_PATTERN = re.compile(rb'"created_utc"\s*:\s*"?(\d+)')
+
+@dataclass(frozen=True)
+class LineIndex:
+    '''
+    :param block_size: Number of lines per block. The last block may be shorter.
+    :param line_count: Total number of lines in the indexed file.
+    :param offsets: Byte offset of the first line of each block, followed by the file size.
+    :param min_created_utc: Per block, the earliest `created_utc` as UNIX seconds.
+    :param max_created_utc: Per block, the latest `created_utc` as UNIX seconds.
+    :param sha256: Content hash of the indexed file, see `src.data.cache.fingerprint_file`.
+    '''
+    block_size: int
+    line_count: int
+    offsets: np.ndarray
+    min_created_utc: np.ndarray
+    max_created_utc: np.ndarray
+    sha256: str
+
+    @property
+    def block_count(self) -> int:
+        return len(self.offsets) - 1
+
+    def block_lines(self, block: int) -> range:
+        start = block * self.block_size
+        return range(start, min(start + self.block_size, self.line_count))
+
+    def blocks_for_lines(self, start: int, stop: int) -> range:
+        ''':return: The blocks that contain any of the lines in [`start`, `stop`).'''
+        start = max(start, 0)
+        stop = min(stop, self.line_count)
+
+        if start >= stop:
+            return range(0)
+
+        return range(start // self.block_size, (stop - 1) // self.block_size + 1)
+
+    def blocks_for_time_window(self, start: dt.datetime, end: dt.datetime) -> np.ndarray:
+        ''':return: The blocks that may contain posts created in [`start`, `end`], in file order.'''
+        start_utc = _to_unix_seconds(start)
+        end_utc = _to_unix_seconds(end)
+        return np.flatnonzero((self.max_created_utc >= start_utc) & (self.min_created_utc <= end_utc))
+
+def _to_unix_seconds(moment: dt.datetime) -> int:
+    # Naive datetimes are interpreted as UTC, like the `created_utc` column of the loaded DataFrames.
+    return int(np.datetime64(moment, 's').astype(np.int64))
+
+def _parse_created_utc(line: bytes) -> int:
+    match = _CREATED_UTC_PATTERN.search(line)
+
+    if match is not None:
+        return int(match.group(1))
+
+    return int(json.loads(line)['created_utc'])
+
+def build_line_index(ndjson_file: Path, block_size: int = DEFAULT_BLOCK_SIZE) -> LineIndex:
+    '''Scan `ndjson_file` once and index it in blocks of `block_size` lines.'''
+    if block_size <= 0:
+        raise ValueError(f'Expected `block_size` >= 1, got {block_size}.')
+
+    offsets: list[int] = []
+    min_created_utc: list[int] = []
+    max_created_utc: list[int] = []
+    line_count = 0
+    offset = 0
+
+    with open(ndjson_file, 'rb') as file:
+        for line in file:
+            created_utc = _parse_created_utc(line)
+
+            if line_count % block_size == 0:
+                offsets.append(offset)
+                min_created_utc.append(created_utc)
+                max_created_utc.append(created_utc)
+            else:
+                min_created_utc[-1] = min(min_created_utc[-1], created_utc)
+                max_created_utc[-1] = max(max_created_utc[-1], created_utc)
+
+            line_count += 1
+            offset += len(line)
+
+    offsets.append(offset)
+
+    return LineIndex(
+        block_size=block_size,
+        line_count=line_count,
+        offsets=np.array(offsets, dtype=np.int64),
+        min_created_utc=np.array(min_created_utc, dtype=np.int64),
+        max_created_utc=np.array(max_created_utc, dtype=np.int64),
+        sha256=cache.fingerprint_file(ndjson_file).sha256,
+    )
+
+def _line_index_path(ndjson_file: Path, block_size: int) -> Path:
+    return LINE_INDEX_DIR / f'{cache.file_key(ndjson_file)}-{block_size}.npz'
+
+def load_line_index(ndjson_file: Path, block_size: int = DEFAULT_BLOCK_SIZE) -> LineIndex:
+    '''Load the sidecar index of `ndjson_file`, (re)building it if it is missing or the file has changed.'''
+    path = _line_index_path(ndjson_file, block_size)
+    sha256 = cache.fingerprint_file(ndjson_file).sha256
+
+    if path.exists():
+        with np.load(path) as npz:
+            if str(npz['sha256']) == sha256:
+                return LineIndex(
+                    block_size=int(npz['block_size']),
+                    line_count=int(npz['line_count']),
+                    offsets=npz['offsets'],
+                    min_created_utc=npz['min_created_utc'],
+                    max_created_utc=npz['max_created_utc'],
+                    sha256=sha256,
+                )
+
+    line_index = build_line_index(ndjson_file, block_size)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    with open(path, 'wb') as file:
+        np.savez(
+            file,
+            block_size=line_index.block_size,
+            line_count=line_index.line_count,
+            offsets=line_index.offsets,
+            min_created_utc=line_index.min_created_utc,
+            max_created_utc=line_index.max_created_utc,
+            sha256=line_index.sha256,
+        )
+
+    return line_index
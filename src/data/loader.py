@@ -1,11 +1,23 @@
 from collections.abc import Set as ImmutableSet
-from collections.abc import Generator, Callable
-from typing import Any, TypeAlias
+from collections.abc import Generator, Callable, Iterable, Iterator, Mapping, Sequence
+from concurrent.futures import ProcessPoolExecutor
+from typing import TYPE_CHECKING, Any, Literal, TypeAlias
+import datetime as dt
+import io
+import itertools
 import json
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.json as pa_json
 from pathlib import Path
 import warnings
-from src.data import constants
+from src.data import cache, compact, constants, line_index
+from src.instrumentation import instrumented
+
+# Dask is only needed by the out-of-core loaders, so it is imported on first use.
+if TYPE_CHECKING:
+    import dask.dataframe as dd
 
 def stream_ndjson(ndjson_file: Path, limit: int | None = None) -> Generator[dict[str, Any]]:
     '''Stream NDJSON file line by line, parsing each line to a JSON object.
@@ -24,15 +36,325 @@ def stream_ndjson(ndjson_file: Path, limit: int | None = None) -> Generator[dict
             yield json.loads(line)
 
 NdjsonStreamer: TypeAlias = Callable[[Path], Generator[dict[str, Any]]]
+LoaderEngine: TypeAlias = Literal['python', 'pyarrow']
+
+def _to_arrow_type(dtype: Any) -> pa.DataType:
+    '''Map a dtype from `src.data.constants` to the Arrow type the JSON reader should parse into.'''
+    if dtype is str:
+        return pa.string()
+
+    # Timestamps are stored as UNIX seconds, which the JSON reader only accepts as integers.
+    # They are cast to a timestamp after parsing.
+    if np.dtype(dtype).kind == 'M':
+        return pa.int64()
+
+    return pa.from_numpy_dtype(np.dtype(dtype))
+
+def _read_arrow_df(
+    source: Path | io.BytesIO,
+    columns: ImmutableSet[str],
+    column_dtypes: Mapping[str, Any],
+    compact_column_dtypes: Mapping[str, Any] | None = None,
+) -> pd.DataFrame:
+    ordered_columns = list(columns)
+    dtypes = {column: dtype for column, dtype in column_dtypes.items() if column in columns}
+    # Untyped columns are parsed as strings, so pyarrow never has to infer the type of a field. Inference would
+    # cover every field of the file, including mixed-type fields that were not requested, e.g. Reddit's `edited`.
+    schema = pa.schema([
+        (column, _to_arrow_type(dtypes[column]) if column in dtypes else pa.string()) for column in ordered_columns
+    ])
+
+    if isinstance(source, io.BytesIO) and source.getbuffer().nbytes == 0:
+        return _convert_df(_empty_df(columns, column_dtypes), compact_column_dtypes)
+
+    parse_options = pa_json.ParseOptions(explicit_schema=schema, unexpected_field_behavior='ignore')
+
+    try:
+        table = pa_json.read_json(source, parse_options=parse_options)
+    except pa.ArrowInvalid:
+        # A requested untyped column holds values other than strings, e.g. `edited` is false or a timestamp.
+        # Only Python objects can represent it like the 'python' engine does.
+        if isinstance(source, io.BytesIO):
+            source.seek(0)
+            return _rows_to_df(map(json.loads, source), columns, column_dtypes, compact_column_dtypes)
+
+        return _rows_to_df(stream_ndjson(source), columns, column_dtypes, compact_column_dtypes)
+
+    arrays: list[pa.Array | pa.ChunkedArray] = []
+    for column in ordered_columns:
+        array = table[column]
+        if column in dtypes and np.dtype(dtypes[column]).kind == 'M':
+            array = array.cast(pa.from_numpy_dtype(np.dtype(dtypes[column])))
+
+        arrays.append(array)
+
+    table = pa.table(arrays, names=ordered_columns)
+
+    # The remaining `.astype` only touches the string columns, so missing values become 'None' like they do
+    # when pandas converts the Python objects of the 'python' engine.
+    if compact_column_dtypes is None:
+        return table.to_pandas().astype(dtypes)
+
+    return compact.to_compact_schema_chunked(
+        (
+            table.slice(start, compact.CHUNK_SIZE).to_pandas().astype(dtypes)
+            for start in range(0, max(table.num_rows, 1), compact.CHUNK_SIZE)
+        ),
+        compact_column_dtypes,
+    )
+
+def _chunks(rows: Iterable[dict[str, Any]], size: int) -> Iterator[list[dict[str, Any]]]:
+    iterator = iter(rows)
+    while chunk := list(itertools.islice(iterator, size)):
+        yield chunk
+
+def _convert_df(df: pd.DataFrame, compact_column_dtypes: Mapping[str, Any] | None) -> pd.DataFrame:
+    return df if compact_column_dtypes is None else compact.to_compact_schema(df, compact_column_dtypes)
+
+def _rows_to_df(
+    rows: Iterable[dict[str, Any]],
+    columns: ImmutableSet[str],
+    column_dtypes: Mapping[str, Any],
+    compact_column_dtypes: Mapping[str, Any] | None = None,
+) -> pd.DataFrame:
+    ''':param compact_column_dtypes: If given, build and convert `compact.CHUNK_SIZE` rows at a time to this
+        compact schema, so the whole default-schema DataFrame never exists at once.
+    '''
+    if compact_column_dtypes is not None:
+        chunk_dfs = (_rows_to_df(chunk, columns, column_dtypes) for chunk in _chunks(rows, compact.CHUNK_SIZE))
+        first_chunk_df = next(chunk_dfs, None)
+
+        if first_chunk_df is None:
+            return _convert_df(_empty_df(columns, column_dtypes), compact_column_dtypes)
+
+        return compact.to_compact_schema_chunked(
+            itertools.chain((first_chunk_df,), chunk_dfs), compact_column_dtypes,
+        )
+
+    dtypes = {
+        column: dtype
+        for column, dtype in column_dtypes.items()
+        if column in columns
+    }
+
+    return pd.DataFrame(
+        (
+            {column: row.get(column) for column in columns}
+            for row in rows
+        ),
+    ).astype(dtypes) # TODO: this should not be enforced here?
+
+def _empty_df(columns: ImmutableSet[str], column_dtypes: Mapping[str, Any]) -> pd.DataFrame:
+    return pd.DataFrame({
+        column: pd.Series(dtype=column_dtypes.get(column, object))
+        for column in columns
+    })
+
+def read_ndjson_columns(
+    ndjson_file: Path,
+    columns: ImmutableSet[str],
+    column_dtypes: Mapping[str, Any],
+    limit: int | None = None,
+    compact_column_dtypes: Mapping[str, Any] | None = None,
+) -> pd.DataFrame:
+    '''Parse an NDJSON file straight into typed columns using pyarrow's multithreaded JSON reader.
+
+    Only `columns` are materialized; every other field is skipped during parsing. Columns that have a
+    dtype in `column_dtypes` are parsed into that type directly, the remaining columns as strings. If one of those
+    holds other JSON values, e.g. booleans, the file is parsed by the 'python' engine instead.
+
+    :param limit: Maximum number of lines to read. If None, read all lines. Raises a UserWarning if limit is <= 0.
+    :param compact_column_dtypes: If given, convert the parsed columns to this compact schema one chunk of rows at a
+        time, see `src.data.compact.to_compact_schema_chunked`.
+    :return: A DataFrame with the same columns and dtypes as the `'python'` engine produces.
+    '''
+    if limit is not None and limit <= 0:
+        warnings.warn(f'Expected `limit` >= 1, got {limit}. No lines will be read.', UserWarning)
+
+    if limit is None:
+        return _read_arrow_df(ndjson_file, columns, column_dtypes, compact_column_dtypes)
+
+    with open(ndjson_file, 'rb') as file:
+        source = io.BytesIO(b''.join(line for _, line in zip(range(max(limit, 0)), file)))
+
+    return _read_arrow_df(source, columns, column_dtypes, compact_column_dtypes)
+
+def _read_block_df(
+    ndjson_file: Path,
+    start_offset: int,
+    stop_offset: int,
+    lines: slice,
+    columns: ImmutableSet[str],
+    column_dtypes: Mapping[str, Any],
+    engine: LoaderEngine,
+    compact_column_dtypes: Mapping[str, Any] | None = None,
+) -> pd.DataFrame:
+    with open(ndjson_file, 'rb') as file:
+        file.seek(start_offset)
+        block_lines = file.read(stop_offset - start_offset).splitlines(keepends=True)[lines]
+
+    if engine == 'pyarrow':
+        return _read_arrow_df(io.BytesIO(b''.join(block_lines)), columns, column_dtypes, compact_column_dtypes)
+
+    return _rows_to_df(map(json.loads, block_lines), columns, column_dtypes, compact_column_dtypes)
+
+def read_ndjson_partitioned(
+    ndjson_file: Path,
+    columns: ImmutableSet[str],
+    column_dtypes: Mapping[str, Any],
+    engine: LoaderEngine = 'pyarrow',
+    line_range: tuple[int, int] | None = None,
+    time_window: tuple[dt.datetime, dt.datetime] | None = None,
+    processes: int | None = None,
+    block_size: int = line_index.DEFAULT_BLOCK_SIZE,
+    compact_column_dtypes: Mapping[str, Any] | None = None,
+) -> pd.DataFrame:
+    '''Read a line range and/or time window of an NDJSON file by seeking to the relevant blocks of its line index.
+
+    The blocks are parsed in a process pool and concatenated in file order, see `src.data.line_index`.
+
+    :param line_range: Half-open range [start, stop) of line numbers to read. If None, read all lines.
+    :param time_window: Inclusive range of `created_utc` values to read. If None, read all lines.
+    :param processes: Number of worker processes. If None, use `os.cpu_count()`. If 1, parse in this process.
+    :param block_size: Number of lines per block of the line index.
+    :param compact_column_dtypes: If given, every block is converted to this compact schema in its worker, see
+        `src.data.compact`.
+    :return: The same DataFrame as loading the whole file and then selecting the line range and time window,
+        with a fresh `RangeIndex`.
+    '''
+    index = line_index.load_line_index(ndjson_file, block_size)
+    blocks = (
+        index.blocks_for_lines(*line_range)
+        if line_range is not None
+        else range(index.block_count)
+    )
+
+    if time_window is not None:
+        blocks = np.intersect1d(blocks, index.blocks_for_time_window(*time_window))
+
+    parse_columns = columns | {'created_utc'} if time_window is not None else columns
+    tasks: list[tuple[Any, ...]] = []
+
+    for block in blocks:
+        block_lines = index.block_lines(int(block))
+        start, stop = line_range if line_range is not None else (block_lines.start, block_lines.stop)
+        lines = slice(max(start - block_lines.start, 0), max(min(stop, block_lines.stop) - block_lines.start, 0))
 
+        tasks.append((
+            ndjson_file,
+            int(index.offsets[block]),
+            int(index.offsets[block + 1]),
+            lines,
+            parse_columns,
+            column_dtypes,
+            engine,
+            compact_column_dtypes,
+        ))
+
+    if processes == 1 or len(tasks) <= 1:
+        block_dfs = [_read_block_df(*task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            block_dfs = list(executor.map(_read_block_df, *zip(*tasks)))
+
+    if not block_dfs:
+        return _convert_df(_empty_df(columns, column_dtypes), compact_column_dtypes)[list(columns)]
+
+    df = pd.concat(block_dfs, ignore_index=True) if compact_column_dtypes is None else compact.concat_compact(block_dfs)
+
+    if time_window is not None:
+        df = df[df['created_utc'].between(*time_window)].reset_index(drop=True)
+
+    return df[list(columns)]
+
+def _parse_df(
+    ndjson_file: Path,
+    ndjson_streamer: NdjsonStreamer,
+    columns: ImmutableSet[str],
+    column_dtypes: Mapping[str, Any],
+    engine: LoaderEngine,
+    limit: int | None,
+    compact_column_dtypes: Mapping[str, Any] | None = None,
+) -> pd.DataFrame:
+    if engine == 'pyarrow':
+        return read_ndjson_columns(ndjson_file, columns, column_dtypes, limit, compact_column_dtypes)
+
+    if engine != 'python':
+        raise ValueError(f"Expected `engine` to be 'python' or 'pyarrow', got {engine!r}.")
+
+    rows = itertools.islice(ndjson_streamer(ndjson_file), limit)
+    return _rows_to_df(rows, columns, column_dtypes, compact_column_dtypes)
+
+def _load_df(
+    ndjson_file: Path,
+    ndjson_streamer: NdjsonStreamer,
+    columns: ImmutableSet[str],
+    column_dtypes: Mapping[str, Any],
+    engine: LoaderEngine,
+    limit: int | None,
+    use_cache: bool,
+    line_range: tuple[int, int] | None,
+    time_window: tuple[dt.datetime, dt.datetime] | None,
+    processes: int | None,
+    compact_column_dtypes: Mapping[str, Any] | None,
+) -> pd.DataFrame:
+    if line_range is not None or time_window is not None:
+        df = read_ndjson_partitioned(
+            ndjson_file, columns, column_dtypes, engine, line_range, time_window, processes,
+            compact_column_dtypes=compact_column_dtypes,
+        )
+        return df if limit is None else df.head(limit)
+
+    # A custom streamer may filter or transform rows, so only the plain file contents are cached. Columns without a
+    # dtype in `column_dtypes` may mix types, e.g. `edited`, which Feather cannot store, so they are not cached.
+    if not use_cache or ndjson_streamer is not stream_ndjson or not columns <= column_dtypes.keys():
+        return _parse_df(ndjson_file, ndjson_streamer, columns, column_dtypes, engine, limit, compact_column_dtypes)
+
+    df = cache.read_cached_df(ndjson_file, columns, column_dtypes, limit, compact_column_dtypes)
+    if df is not None:
+        return df
+
+    # Populating the cache takes the whole DataFrame in the default schema, which compact loads avoid.
+    if limit is not None or compact_column_dtypes is not None:
+        return _parse_df(ndjson_file, ndjson_streamer, columns, column_dtypes, engine, limit, compact_column_dtypes)
+
+    # Keep the columns that are cached already, so that the new entry serves every earlier request as well. Other
+    # typed columns are not parsed, since a dump may lack one that was not requested.
+    cache_columns = columns | cache.cached_columns(ndjson_file, column_dtypes)
+    df = _parse_df(ndjson_file, ndjson_streamer, cache_columns, column_dtypes, engine, limit)
+    cache.write_cached_df(ndjson_file, df, column_dtypes)
+    return df[list(columns)]
+
+@instrumented()
 def load_submissions_df(
     ndjson_file: Path,
     ndjson_streamer: NdjsonStreamer = stream_ndjson,
     columns: ImmutableSet[str] = frozenset({'author', 'created_utc', 'gilded', 'id', 'score', 'selftext', 'title'}),
+    engine: LoaderEngine = 'python',
+    limit: int | None = None,
+    use_cache: bool = True,
+    line_range: tuple[int, int] | None = None,
+    time_window: tuple[dt.datetime, dt.datetime] | None = None,
+    processes: int | None = None,
+    compact_schema: bool = False,
 ) -> pd.DataFrame:
     '''
     :param columns: The desired columns to load into the dataframe.
     :param ndjson_streamer: Data generator that streams parsed JSON objects from an ndjson file.
+        Only used by the `'python'` engine.
+    :param engine: `'python'` builds the DataFrame from the rows of `ndjson_streamer`, `'pyarrow'` parses
+        the file straight into typed columns, see `read_ndjson_columns`. Both return the same DataFrame.
+    :param limit: Maximum number of rows to load. If None, load all rows.
+    :param use_cache: Whether to consult the parsed data cache in `src.data.cache` first. Full loads through the
+        default `ndjson_streamer` populate it with every column in the dtype map.
+    :param line_range: Half-open range [start, stop) of line numbers to load, e.g. to sample the tail of the file.
+    :param time_window: Inclusive range of `created_utc` values to load, e.g. (`START_DATE`, `END_DATE`) or one race
+        weekend. If this or `line_range` is given, only the relevant blocks are read through the sidecar line index,
+        in parallel, bypassing `ndjson_streamer` and the cache. See `read_ndjson_partitioned`.
+    :param processes: Number of worker processes for `line_range`/`time_window` reads. If None, use all CPUs.
+    :param compact_schema: If true, load into the memory-compact schema, see `src.data.compact`. Rows are converted
+        chunk by chunk while they are parsed or read from the cache, so the whole DataFrame never exists in the
+        default schema. Compact loads therefore do not populate the cache.
     :raises ValueError: If any of the specified columns are not in `src.data.constants.SUBMISSION_COLUMNS`.
     '''
     # TODO: should this be a warning?
@@ -41,28 +363,43 @@ def load_submissions_df(
     #         f'Got unknown submission column(s): {columns - constants.SUBMISSION_COLUMNS}. '
     #         'If the column does exist in the data, add it to src.data.constants.SUBMISSION_COLUMN_DTYPES.'
     #     )
-    
-    dtypes = {
-        column: dtype
-        for column, dtype in constants.SUBMISSION_COLUMN_DTYPES.items()
-        if column in columns
-    }
-    
-    return pd.DataFrame(
-        (
-            {column: row.get(column) for column in columns}
-            for row in ndjson_streamer(ndjson_file)
-        ),
-    ).astype(dtypes) # TODO: this should not be enforced here?
 
+    return _load_df(
+        ndjson_file, ndjson_streamer, columns, constants.SUBMISSION_COLUMN_DTYPES,
+        engine, limit, use_cache, line_range, time_window, processes,
+        constants.COMPACT_SUBMISSION_COLUMN_DTYPES if compact_schema else None,
+    )
+
+@instrumented()
 def load_comments_df(
     ndjson_file: Path,
     ndjson_streamer: NdjsonStreamer = stream_ndjson,
     columns: ImmutableSet[str] = constants.DEFAULT_COMMENT_COLUMNS,
+    engine: LoaderEngine = 'python',
+    limit: int | None = None,
+    use_cache: bool = True,
+    line_range: tuple[int, int] | None = None,
+    time_window: tuple[dt.datetime, dt.datetime] | None = None,
+    processes: int | None = None,
+    compact_schema: bool = False,
 ) -> pd.DataFrame:
     '''
     :param columns: The desired columns to load into the dataframe.
     :param ndjson_streamer: Data generator that streams parsed JSON objects from an ndjson file.
+        Only used by the `'python'` engine.
+    :param engine: `'python'` builds the DataFrame from the rows of `ndjson_streamer`, `'pyarrow'` parses
+        the file straight into typed columns, see `read_ndjson_columns`. Both return the same DataFrame.
+    :param limit: Maximum number of rows to load. If None, load all rows.
+    :param use_cache: Whether to consult the parsed data cache in `src.data.cache` first. Full loads through the
+        default `ndjson_streamer` populate it with every column in the dtype map.
+    :param line_range: Half-open range [start, stop) of line numbers to load, e.g. to sample the tail of the file.
+    :param time_window: Inclusive range of `created_utc` values to load, e.g. (`START_DATE`, `END_DATE`) or one race
+        weekend. If this or `line_range` is given, only the relevant blocks are read through the sidecar line index,
+        in parallel, bypassing `ndjson_streamer` and the cache. See `read_ndjson_partitioned`.
+    :param processes: Number of worker processes for `line_range`/`time_window` reads. If None, use all CPUs.
+    :param compact_schema: If true, load into the memory-compact schema, see `src.data.compact`. Rows are converted
+        chunk by chunk while they are parsed or read from the cache, so the whole DataFrame never exists in the
+        default schema. Compact loads therefore do not populate the cache.
     :raises ValueError: If any of the specified columns are not in `src.data.constants.COMMENT_COLUMNS`.
     '''
     # if not columns <= constants.COMMENT_COLUMNS:
@@ -70,16 +407,105 @@ def load_comments_df(
     #         f'Got unknown comment column(s): {columns - constants.COMMENT_COLUMNS}. '
     #         'If the column does exist in the data, add it to src.data.constants.COMMENT_COLUMN_DTYPES.'
     #     )
-    
-    dtypes = {
-        column: dtype
-        for column, dtype in constants.COMMENT_COLUMN_DTYPES.items()
-        if column in columns
-    }
-    
-    return pd.DataFrame(
+
+    return _load_df(
+        ndjson_file, ndjson_streamer, columns, constants.COMMENT_COLUMN_DTYPES,
+        engine, limit, use_cache, line_range, time_window, processes,
+        constants.COMPACT_COMMENT_COLUMN_DTYPES if compact_schema else None,
+    )
+
+def _read_partition_df(
+    ndjson_file: Path,
+    start_offset: int,
+    stop_offset: int,
+    all_columns: tuple[str, ...],
+    column_dtypes: Mapping[str, Any],
+    engine: LoaderEngine,
+    time_window: tuple[dt.datetime, dt.datetime] | None,
+    columns: Sequence[str] | None = None,
+) -> pd.DataFrame:
+    # Dask passes `columns` when a selection of the DataFrame can be pushed down, so only those are parsed.
+    ordered_columns = list(all_columns if columns is None else columns)
+    parse_columns = frozenset(ordered_columns)
+    if time_window is not None:
+        parse_columns |= {'created_utc'}
+    df = _read_block_df(ndjson_file, start_offset, stop_offset, slice(None), parse_columns, column_dtypes, engine)
+
+    if time_window is not None:
+        df = df[df['created_utc'].between(*time_window)].reset_index(drop=True)
+
+    # The columns are ordered here rather than by iterating a set, whose order differs between worker processes.
+    return df[ordered_columns]
+
+def read_ndjson_ddf(
+    ndjson_file: Path,
+    columns: ImmutableSet[str],
+    column_dtypes: Mapping[str, Any],
+    engine: LoaderEngine = 'pyarrow',
+    time_window: tuple[dt.datetime, dt.datetime] | None = None,
+    blocks_per_partition: int = 5,
+    block_size: int = line_index.DEFAULT_BLOCK_SIZE,
+) -> 'dd.DataFrame':
+    '''Expose an NDJSON file as a lazy Dask DataFrame with one partition per `blocks_per_partition` blocks of its
+    line index, see `src.data.line_index`.
+
+    Nothing is parsed until the result is computed. Each partition is then parsed by the worker that processes it,
+    so the file never has to fit in memory at once, e.g. with `.compute(scheduler='processes')` in local worker
+    processes.
+
+    :param time_window: Inclusive range of `created_utc` values to read. Only the blocks that may contain it become
+        partitions.
+    :return: Partitions with the same columns and dtypes as `read_ndjson_partitioned`, each with its own `RangeIndex`.
+        Columns without a dtype in `column_dtypes` have an object dtype in the metadata. Dask converts object
+        columns of strings to its string dtype unless its 'dataframe.convert-string' option is off.
+    '''
+    import dask.dataframe as dd
+
+    index = line_index.load_line_index(ndjson_file, block_size)
+    blocks = np.arange(index.block_count) if time_window is None else index.blocks_for_time_window(*time_window)
+    ordered_columns = tuple(columns)
+    meta = _empty_df(columns, column_dtypes)[list(ordered_columns)]
+
+    tasks = [
         (
-            {column: row.get(column) for column in columns}
-            for row in ndjson_streamer(ndjson_file)
-        ),
-    ).astype(dtypes)
+            ndjson_file,
+            int(index.offsets[partition_blocks[0]]),
+            int(index.offsets[partition_blocks[-1] + 1]),
+            ordered_columns,
+            column_dtypes,
+            engine,
+            time_window,
+        )
+        for partition_blocks in (
+            blocks[start:start + blocks_per_partition] for start in range(0, len(blocks), blocks_per_partition)
+        )
+    ]
+
+    if not tasks:
+        return dd.from_pandas(meta, npartitions=1)
+
+    return dd.from_map(_read_partition_df, *zip(*tasks), meta=meta, label='read-ndjson')
+
+def load_submissions_ddf(
+    ndjson_file: Path,
+    columns: ImmutableSet[str] = frozenset({'author', 'created_utc', 'gilded', 'id', 'score', 'selftext', 'title'}),
+    engine: LoaderEngine = 'pyarrow',
+    time_window: tuple[dt.datetime, dt.datetime] | None = None,
+    blocks_per_partition: int = 5,
+) -> 'dd.DataFrame':
+    '''Out-of-core `load_submissions_df`: the submissions as a partitioned Dask DataFrame, see `read_ndjson_ddf`.'''
+    return read_ndjson_ddf(
+        ndjson_file, columns, constants.SUBMISSION_COLUMN_DTYPES, engine, time_window, blocks_per_partition,
+    )
+
+def load_comments_ddf(
+    ndjson_file: Path,
+    columns: ImmutableSet[str] = constants.DEFAULT_COMMENT_COLUMNS,
+    engine: LoaderEngine = 'pyarrow',
+    time_window: tuple[dt.datetime, dt.datetime] | None = None,
+    blocks_per_partition: int = 5,
+) -> 'dd.DataFrame':
+    '''Out-of-core `load_comments_df`: the comments as a partitioned Dask DataFrame, see `read_ndjson_ddf`.'''
+    return read_ndjson_ddf(
+        ndjson_file, columns, constants.COMMENT_COLUMN_DTYPES, engine, time_window, blocks_per_partition,
+    )
@@ -1,19 +1,32 @@
-from functools import cache
+from collections.abc import Iterator, Mapping
+from functools import cache, lru_cache
 import pandas as pd
 import numpy as np
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
 import re
+import hashlib
+import json
 import urllib.request
 import sys
-import spacy
-from symspellpy import SymSpell
-import symspellpy
-from nltk.corpus import stopwords
-from nltk.metrics.distance import edit_distance
-from config import config
+from config import config, model_registry
 from src.utils import assert_columns_exist
-import nltk
-nltk.download('wordnet')
-from nltk.stem import WordNetLemmatizer
+from src.instrumentation import instrumented, stage
+from src.data.bk_tree import BKTree
+
+# spaCy, symspellpy, NLTK and Dask are imported on first use, and NLTK resources are only downloaded on first use or
+# by `ensure_resources`, so importing this module is fast and works offline.
+if TYPE_CHECKING:
+    import dask.dataframe as dd
+    from spacy.language import Language
+    from symspellpy import SymSpell
+    from nltk.stem import WordNetLemmatizer
+
+NLTK_RESOURCES = {
+    'wordnet': 'corpora/wordnet',
+    'stopwords': 'corpora/stopwords',
+}
+SPACY_MODEL = 'en_core_web_sm'
 
 
 _ALPHANUMERIC_PATTERN = re.compile(r'\w')
@@ -39,22 +52,61 @@ def concatenate_submissions_and_comments(
     _submissions_df = submissions_df if in_place else submissions_df.copy()
     _comments_df = comments_df if in_place else comments_df.copy()
 
-    titles: pd.Series[str] = _submissions_df['title'].str.rstrip()
-    selftexts: pd.Series[str] = _submissions_df['selftext']
+    _replace_title_and_selftext_with_text(_submissions_df)
+
+    _comments_df = comments_df.copy()
+    _comments_df.rename(columns={'body': 'text'}, inplace=True)
+
+    df = pd.concat((_submissions_df, _comments_df), ignore_index=True)  
+    return df
+
+def _replace_title_and_selftext_with_text(submissions_df: pd.DataFrame) -> None:
+    titles: pd.Series[str] = submissions_df['title'].str.rstrip()
+    selftexts: pd.Series[str] = submissions_df['selftext']
 
     # TODO: still a bit buggy: title='title', selftext='' -> text='title. ' with trailing space
-    _submissions_df['text'] = np.where(
+    submissions_df['text'] = np.where(
         titles.str[-1].map(lambda ch: _ALPHANUMERIC_PATTERN.match(ch) is not None),
         titles + '. ' + selftexts,
         titles + ' ' + selftexts,
     )
-    _submissions_df.drop(columns=['title', 'selftext'], inplace=True)
+    submissions_df.drop(columns=['title', 'selftext'], inplace=True)
 
-    _comments_df = comments_df.copy()
-    _comments_df.rename(columns={'body': 'text'}, inplace=True)
+def _submission_texts_partition(submissions_df: pd.DataFrame) -> pd.DataFrame:
+    submissions_df = submissions_df.copy()
+    _replace_title_and_selftext_with_text(submissions_df)
+    return submissions_df
 
-    df = pd.concat((_submissions_df, _comments_df), ignore_index=True)  
-    return df
+def concatenate_submissions_and_comments_ddf(
+    submissions_ddf: 'dd.DataFrame',
+    comments_ddf: 'dd.DataFrame',
+) -> 'dd.DataFrame':
+    '''Lazy `concatenate_submissions_and_comments` of Dask DataFrames, e.g. of `src.data.loader.load_submissions_ddf`.
+
+    The `text` of the submissions is built partition by partition when the result is computed, and the partitions of
+    the comments follow those of the submissions.
+
+    :raises ValueError: If any of the required columns are missing from the DataFrames.
+    '''
+    import dask.dataframe as dd
+
+    assert_columns_exist({'title', 'selftext'}, submissions_ddf, 'submissions')
+    assert_columns_exist({'body'}, comments_ddf, 'comments')
+
+    submissions_ddf = submissions_ddf.map_partitions(
+        _submission_texts_partition,
+        meta=_submission_texts_partition(submissions_ddf._meta),
+    )
+    return dd.concat([submissions_ddf, comments_ddf.rename(columns={'body': 'text'})])
+
+def submission_text(title: str, selftext: str) -> str:
+    '''The `text` that `concatenate_submissions_and_comments` gives a single submission, for streaming use.'''
+    title = title.rstrip()
+
+    if title and _ALPHANUMERIC_PATTERN.match(title[-1]) is not None:
+        return title + '. ' + selftext
+
+    return title + ' ' + selftext
 
 # TODO: Refactor
 F1_names= {
@@ -169,7 +221,30 @@ Drivers_dict = {
 
 F1_VOCABULARY = F1_DRIVERS
 
-def correct_spelling(word):
+def _max_correction_distance(word: str) -> int:
+    return max(1, len(word) // 3)  # Allow a maximum edit distance of 33%
+
+@cache
+def _load_vocabulary_bk_tree() -> BKTree:
+    # Built from the iteration order of F1_VOCABULARY, so ties are broken like the linear scan in
+    # `correct_spelling_linear` does.
+    return BKTree(F1_VOCABULARY)
+
+@lru_cache(maxsize=2 ** 16)
+def correct_spelling(word: str) -> str:
+    '''Correct `word` to the closest term in `F1_VOCABULARY` within an edit distance of 33% of its length.
+
+    Looks the word up in a BK-tree over the vocabulary and returns the same result as `correct_spelling_linear`.
+    '''
+    if word in F1_VOCABULARY:
+        return word
+
+    corrected_word = _load_vocabulary_bk_tree().nearest(word, _max_correction_distance(word))
+    return corrected_word if corrected_word is not None else word
+
+def correct_spelling_linear(word):
+    from nltk.metrics.distance import edit_distance
+
     if word in F1_VOCABULARY:
         return word
     
@@ -177,12 +252,19 @@ def correct_spelling(word):
     corrected_word = word
     for term in F1_VOCABULARY:
         distance = edit_distance(word, term)
-        if distance < min_distance and distance <= max(1, len(word)//3):  # Allow a maximum edit distance of 33%
+        if distance < min_distance and distance <= _max_correction_distance(word):
             min_distance = distance
             corrected_word = term
     # print(word, corrected_word, min_distance)
     return corrected_word
 
+def correct_spelling_column(words: pd.Series) -> pd.Series:
+    '''Apply `correct_spelling` to a column of words, correcting each unique word only once.'''
+    with stage('correct_spelling_column', len(words), caches=(correct_spelling,)):
+        unique_words = words.dropna().unique()
+        corrections = {word: correct_spelling(word) for word in unique_words}
+        return words.map(corrections)
+
 def download_file(path, url):
     if not path.exists():
         try:
@@ -193,18 +275,24 @@ def download_file(path, url):
             raise Exception(f'Download failed: {error}')
 
 SYM_SPELL_MAX_DICTIONARY_EDIT_DISTANCE = 4
+SYM_SPELL_PREFIX_LENGTH = 7
 
-@cache
-def load_sym_spell():
-    sym_spell = SymSpell(max_dictionary_edit_distance=SYM_SPELL_MAX_DICTIONARY_EDIT_DISTANCE, prefix_length=7)
+ENGLISH_WORDS_DICTIONARY_FILE = config.DATA_DIR / 'english_words_dictionary.txt'
+ENGLISH_WORDS_DICTIONARY_URL = 'https://raw.githubusercontent.com/wolfgarbe/SymSpell/refs/heads/master/SymSpell/frequency_dictionary_en_82_765.txt'
+# ENGLISH_BIGRAMS_DICTIONARY_URL = 'https://raw.githubusercontent.com/wolfgarbe/SymSpell/refs/heads/master/SymSpell/frequency_bigramdictionary_en_243_342.txt'
+
+# Prebuilt SymSpell indices, see `load_sym_spell`.
+SYM_SPELL_ARTIFACTS_DIR = config.MODELS_DIR / 'sym_spell'
 
-    # english_words_dictionary_file = config.DATA_DIR / 'english_words_dictionary.txt'
-    # download_file(english_words_dictionary_file, 'https://raw.githubusercontent.com/wolfgarbe/SymSpell/refs/heads/master/SymSpell/frequency_bigramdictionary_en_243_342.txt')
+def build_sym_spell(dictionary_file: Path = ENGLISH_WORDS_DICTIONARY_FILE) -> 'SymSpell':
+    from symspellpy import SymSpell
 
-    english_words_dictionary_file = config.DATA_DIR / 'english_words_dictionary.txt'
-    download_file(english_words_dictionary_file, 'https://raw.githubusercontent.com/wolfgarbe/SymSpell/refs/heads/master/SymSpell/frequency_dictionary_en_82_765.txt')
+    sym_spell = SymSpell(
+        max_dictionary_edit_distance=SYM_SPELL_MAX_DICTIONARY_EDIT_DISTANCE,
+        prefix_length=SYM_SPELL_PREFIX_LENGTH,
+    )
 
-    with open(english_words_dictionary_file, 'r', encoding='utf-8') as file:
+    with open(dictionary_file, 'r', encoding='utf-8') as file:
         for line in file:
             word, frequency = line.strip().split()
             frequency = int(frequency)
@@ -215,14 +303,156 @@ def load_sym_spell():
 
     return sym_spell
 
+def _sym_spell_settings() -> dict[str, Any]:
+    '''Everything besides the dictionary file that determines the contents of a built SymSpell index.'''
+    from symspellpy import SymSpell
+
+    return {
+        'vocabulary': sorted(F1_VOCABULARY),
+        'max_dictionary_edit_distance': SYM_SPELL_MAX_DICTIONARY_EDIT_DISTANCE,
+        'prefix_length': SYM_SPELL_PREFIX_LENGTH,
+        'data_version': SymSpell.data_version,
+    }
+
+class _SymSpellDeletes(Mapping[str, list[str]]):
+    '''Read-only stand-in for `SymSpell._deletes`, the dictionary words per delete, stored as CSR arrays.
+
+    `SymSpell.lookup` only needs `in` and `[]` on the deletes. Loading these arrays and indexing their keys takes a
+    fraction of the time that unpickling millions of small lists does.
+    '''
+
+    def __init__(self, keys: list[str], indptr: np.ndarray, word_ids: np.ndarray, words: list[str]) -> None:
+        self._positions = dict(zip(keys, range(len(keys))))
+        self._indptr = indptr.tolist()
+        self._word_ids = word_ids
+        self._words = words
+
+    def __getitem__(self, delete: str) -> list[str]:
+        position = self._positions[delete]
+        word_ids = self._word_ids[self._indptr[position]:self._indptr[position + 1]].tolist()
+        return [self._words[word_id] for word_id in word_ids]
+
+    def __contains__(self, delete: object) -> bool:
+        return delete in self._positions
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._positions)
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+def _save_sym_spell_index(sym_spell: 'SymSpell', path: Path) -> None:
+    '''Persist the words and deletes of a built SymSpell index as uncompressed numpy arrays.'''
+    words = list(sym_spell.words)
+    word_ids = {word: word_id for word_id, word in enumerate(words)}
+    deletes = sym_spell.deletes
+
+    lengths = np.fromiter((len(suggestions) for suggestions in deletes.values()), dtype=np.int64, count=len(deletes))
+    indptr = np.zeros(len(deletes) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=indptr[1:])
+    # Deletes may refer to words below the count threshold, which are not in `words`.
+    suggestion_ids = [
+        word_ids.setdefault(word, len(word_ids)) for suggestions in deletes.values() for word in suggestions
+    ]
+
+    with open(path, 'wb') as file:
+        np.savez(
+            file,
+            words=np.array(list(word_ids)),
+            counts=np.array([sym_spell.words[word] for word in words], dtype=np.int64),
+            deletes=np.array(list(deletes)),
+            indptr=indptr,
+            word_ids=np.array(suggestion_ids, dtype=np.int32),
+        )
+
+def _load_sym_spell_index(path: Path) -> 'SymSpell':
+    from symspellpy import SymSpell
+
+    with np.load(path) as arrays:
+        words: list[str] = arrays['words'].tolist()
+        counts: list[int] = arrays['counts'].tolist()
+        deletes = _SymSpellDeletes(arrays['deletes'].tolist(), arrays['indptr'], arrays['word_ids'], words)
+
+    sym_spell = SymSpell(
+        max_dictionary_edit_distance=SYM_SPELL_MAX_DICTIONARY_EDIT_DISTANCE,
+        prefix_length=SYM_SPELL_PREFIX_LENGTH,
+    )
+    # The same attributes that `SymSpell.load_pickle` restores.
+    sym_spell._words = dict(zip(words, counts))
+    sym_spell._deletes = deletes # type: ignore[assignment]
+    sym_spell._max_length = max(map(len, sym_spell._words), default=0)
+    return sym_spell
+
+def _sym_spell_artifact_path(dictionary_sha256: str) -> Path:
+    payload = json.dumps([dictionary_sha256, _sym_spell_settings()], sort_keys=True)
+    version = hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+    return SYM_SPELL_ARTIFACTS_DIR / f'sym_spell-{version}.npz'
+
+def _find_sym_spell_artifact() -> Path | None:
+    '''Find the prebuilt index matching the dictionary file, or any index with matching settings when offline.'''
+    if ENGLISH_WORDS_DICTIONARY_FILE.exists():
+        with open(ENGLISH_WORDS_DICTIONARY_FILE, 'rb') as file:
+            path = _sym_spell_artifact_path(hashlib.file_digest(file, 'sha256').hexdigest())
+        return path if path.exists() else None
+
+    # Without the dictionary file its hash is unknown, so fall back on the manifests of the prebuilt indices.
+    manifests = sorted(SYM_SPELL_ARTIFACTS_DIR.glob('sym_spell-*.json'), key=lambda path: path.stat().st_mtime)
+    for manifest_path in reversed(manifests):
+        manifest = json.loads(manifest_path.read_text(encoding='utf-8'))
+        path = manifest_path.with_suffix('.npz')
+        if manifest['settings'] == _sym_spell_settings() and path.exists():
+            return path
+
+    return None
+
+def prebuild_sym_spell() -> Path:
+    '''Build the SymSpell index and persist it under `SYM_SPELL_ARTIFACTS_DIR`, versioned by the hash of the
+    dictionary file, `F1_VOCABULARY` and the edit distance settings.
+
+    :return: Path of the prebuilt index.
+    '''
+    download_file(ENGLISH_WORDS_DICTIONARY_FILE, ENGLISH_WORDS_DICTIONARY_URL)
+
+    with open(ENGLISH_WORDS_DICTIONARY_FILE, 'rb') as file:
+        dictionary_sha256 = hashlib.file_digest(file, 'sha256').hexdigest()
+
+    path = _sym_spell_artifact_path(dictionary_sha256)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    _save_sym_spell_index(build_sym_spell(ENGLISH_WORDS_DICTIONARY_FILE), path)
+    path.with_suffix('.json').write_text(
+        json.dumps({'dictionary_sha256': dictionary_sha256, 'settings': _sym_spell_settings()}),
+        encoding='utf-8',
+    )
+
+    return path
+
+@cache
+def load_sym_spell() -> 'SymSpell':
+    '''Load the prebuilt SymSpell index, building and persisting it first if there is none.
+
+    If a prebuilt index with matching settings exists, the dictionary file is not downloaded, so this works offline.
+    Loading the index of the default dictionary takes about 0.4 s, against about 2 s for symspellpy's own uncompressed
+    pickle of it.
+    '''
+    return _load_sym_spell_index(_find_sym_spell_artifact() or prebuild_sym_spell())
+
 def correct_spelling_symspell(word):
+    import symspellpy
+
     sym_spell = load_sym_spell()
     suggestions = sym_spell.lookup(word, symspellpy.Verbosity.CLOSEST, max_edit_distance=3)
     return suggestions[0].term if suggestions else word
 
 @cache
-def load_nlp():
-    return spacy.load('en_core_web_sm')
+def load_nlp() -> 'Language':
+    import spacy
+
+    # Prefer the copy in the model registry, which loads offline.
+    if model_registry.is_fetched('spacy'):
+        return model_registry.load('spacy', offline=True).model
+
+    return spacy.load(SPACY_MODEL)
 
 def correct_spelling_in_text_spacy(text, activator=True):
     nlp = load_nlp()
@@ -242,6 +472,33 @@ def correct_spelling_in_text_spacy(text, activator=True):
     else: 
         return corrected_tokens
 
+@instrumented()
+def correct_spelling_column_spacy(texts: pd.Series, batch_size: int = 1000, n_process: int = 1) -> pd.Series:
+    '''Bulk variant of `correct_spelling_in_text_spacy` that returns the same corrected texts.
+
+    Streams the texts through `nlp.pipe` with every pipeline component disabled, since tokenization is all that is
+    needed for `is_alpha` and `whitespace_`, and looks up every unique alphabetic token in SymSpell only once.
+
+    :param n_process: Number of processes for `nlp.pipe`.
+    '''
+    nlp = load_nlp()
+    corrections: dict[str, str] = {}
+
+    def correct(token_text: str) -> str:
+        if token_text not in corrections:
+            corrections[token_text] = correct_spelling_symspell(token_text)
+        return corrections[token_text]
+
+    corrected_texts = [
+        ''.join(
+            (correct(token.text) if token.is_alpha else token.text) + token.whitespace_
+            for token in doc
+        )
+        for doc in nlp.pipe(texts, batch_size=batch_size, n_process=n_process, disable=nlp.pipe_names)
+    ]
+
+    return pd.Series(corrected_texts, index=texts.index, name=texts.name, dtype=object)
+
 def combine_names(tokens):
     combined_tokens = []
     skip_next = False
@@ -268,24 +525,77 @@ def combine_names(tokens):
 
     return combined_tokens
 
+_URL_PATTERN = re.compile(r'http\S+')
+_NON_ALPHANUMERIC_PATTERN = re.compile(r'[^a-z\s\d]')
+
 def normalize(comment):
     comment = comment.lower()
-    comment = re.sub(r'http\S+', '', comment)
-    comment = re.sub(r'[^a-z\s\d]', '', comment)
+    comment = _URL_PATTERN.sub('', comment)
+    comment = _NON_ALPHANUMERIC_PATTERN.sub('', comment)
     return comment
 
+@cache
+def load_english_stop_words() -> frozenset[str]:
+    ensure_nltk_resource('stopwords')
+    from nltk.corpus import stopwords
+
+    return frozenset(stopwords.words('english'))
+
 def remove_stopword(tokens, stop_words=None):
     if stop_words is None:
-        stop_words = set(stopwords.words('english'))
+        stop_words = load_english_stop_words()
     new_tokens = []
     for word in tokens:
         if word not in stop_words:
             new_tokens.append(word)
     return new_tokens
 
+@cache
+def load_lemmatizer() -> 'WordNetLemmatizer':
+    ensure_nltk_resource('wordnet')
+    from nltk.stem import WordNetLemmatizer
+
+    return WordNetLemmatizer()
+
 def lemmatize(tokens):
 
-    lemmatizer = WordNetLemmatizer()
+    lemmatizer = load_lemmatizer()
     lemmatized_words = [lemmatizer.lemmatize(token) for token in tokens]
 
-    return lemmatized_words
\ No newline at end of file
+    return lemmatized_words
+
+def ensure_nltk_resource(name: str, download: bool = True) -> None:
+    '''Make sure the NLTK resource `name` (a key of `NLTK_RESOURCES`) is available, without touching the network
+    if it already is.
+
+    :param download: Whether a missing resource may be downloaded.
+    :raises LookupError: If the resource is missing and could not or may not be downloaded.
+    '''
+    import nltk
+
+    try:
+        nltk.data.find(NLTK_RESOURCES[name])
+        return
+    except LookupError:
+        if not download or not nltk.download(name, quiet=True):
+            raise LookupError(f'NLTK resource {name!r} is not available. Run `ensure_resources()` while online.')
+
+def ensure_resources(download: bool = True) -> None:
+    '''Make sure every resource this module needs is available: the NLTK corpora, the spaCy model and the prebuilt
+    SymSpell index. Resources that are already present are never fetched again, so this works offline.
+
+    :param download: Whether missing resources may be downloaded.
+    :raises LookupError: If a resource is missing and could not or may not be downloaded.
+    '''
+    import spacy.util
+
+    for name in NLTK_RESOURCES:
+        ensure_nltk_resource(name, download)
+
+    if not spacy.util.is_package(SPACY_MODEL):
+        raise LookupError(f'spaCy model {SPACY_MODEL!r} is not installed, see requirements.txt.')
+
+    if _find_sym_spell_artifact() is None:
+        if not download:
+            raise LookupError('No prebuilt SymSpell index is available. Run `ensure_resources()` while online.')
+        prebuild_sym_spell()
@@ -0,0 +1,171 @@
+'''Local store of the FastF1 event schedule and classified race results of a season.
+
+FastF1 is only needed to build the store, e.g.
+
+    python -m src.data.race_results 2022
+
+After that the schedule and results are read from Parquet, without importing FastF1 or touching the network, and
+the results of an event are looked up by its position in the schedule in O(1).
+'''
+
+import argparse
+import datetime as dt
+from collections.abc import Callable
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from config import config
+from src.data import constants
+
+RACE_RESULTS_DIR = config.PROCESSED_DATA_DIR / 'race_results'
+
+SCHEDULE_COLUMNS = (
+    'RoundNumber',
+    'Country',
+    'Location',
+    'EventDate',
+    'EventName',
+    'EventFormat',
+    'Session1DateUtc',
+    'Session2DateUtc',
+    'Session3DateUtc',
+    'Session4DateUtc',
+    'Session5DateUtc',
+)
+RESULT_COLUMNS = ('FullName', 'Abbreviation', 'TeamName', 'Position')
+
+def schedule_path(year: int) -> Path:
+    return RACE_RESULTS_DIR / f'{year}_schedule.parquet'
+
+def results_path(year: int) -> Path:
+    return RACE_RESULTS_DIR / f'{year}_results.parquet'
+
+def load_race_results(event: object) -> pd.DataFrame:
+    '''Load the classified results of a FastF1 event's race, as `get_top20` in research question 2.'''
+    race_session = event.get_session('Race') # type: ignore[reportAttributeAccessIssue]
+    race_session.load(laps=False, telemetry=False, weather=False, messages=False)
+    return race_session.results[list(RESULT_COLUMNS)]
+
+def build_season_store(
+    year: int = constants.YEAR,
+    offline: bool = False,
+    race_results_loader: Callable[[object], pd.DataFrame] = load_race_results,
+) -> 'SeasonResults':
+    '''Load the schedule and the race results of every past, non-testing event of `year` through `config.fastf1`
+    and save them to `RACE_RESULTS_DIR`.
+
+    :param offline: If true, only use FastF1's local HTTP cache.
+    '''
+    from config.fastf1 import fastf1
+
+    if offline:
+        fastf1.Cache.offline_mode(True)
+
+    full_schedule = fastf1.get_event_schedule(year)
+    schedule_df = pd.DataFrame(full_schedule[list(SCHEDULE_COLUMNS)]).reset_index(drop=True)
+
+    results_dfs: list[pd.DataFrame] = []
+    for event_index in range(len(full_schedule)):
+        event = full_schedule.iloc[event_index]
+
+        if event['EventFormat'] == 'testing' or event['EventDate'] > pd.Timestamp.now():
+            continue
+
+        results_df = pd.DataFrame(race_results_loader(event)).reset_index(drop=True)
+        results_df.insert(0, 'event_index', event_index)
+        results_dfs.append(results_df)
+
+    results_df = pd.concat(results_dfs, ignore_index=True) if results_dfs else pd.DataFrame(
+        columns=['event_index', *RESULT_COLUMNS],
+    )
+    season_results = SeasonResults(schedule_df, results_df)
+    season_results.save(year)
+    return season_results
+
+class SeasonResults:
+    '''Schedule and race results of one season.
+
+    :param schedule_df: The event schedule, one row per event, in the order of `fastf1.get_event_schedule`.
+    :param results_df: The classified results, with the `event_index` of each row's event in `schedule_df`.
+    '''
+
+    def __init__(self, schedule_df: pd.DataFrame, results_df: pd.DataFrame) -> None:
+        results_df = results_df.sort_values('event_index', kind='stable', ignore_index=True)
+        results_df = results_df.astype({'event_index': np.int32, 'Position': np.uint8})
+
+        self.schedule_df = schedule_df
+        self.results_df = results_df
+
+        # Row range [_offsets[i], _offsets[i + 1]) of results_df holds the results of event i.
+        self._offsets = np.searchsorted(results_df['event_index'].to_numpy(), np.arange(len(schedule_df) + 1))
+
+    def __len__(self) -> int:
+        return len(self.schedule_df)
+
+    def event(self, event_index: int) -> pd.Series:
+        ''':return: The schedule row of the event at position `event_index`, like `full_schedule.iloc[event_index]`.'''
+        return self.schedule_df.iloc[event_index]
+
+    def has_results(self, event_index: int) -> bool:
+        return self._offsets[event_index] < self._offsets[event_index + 1]
+
+    def results(self, event_index: int) -> pd.DataFrame:
+        ''':return: The classified results of the event at position `event_index`.'''
+        start, stop = self._offsets[event_index], self._offsets[event_index + 1]
+        return self.results_df.iloc[start:stop]
+
+    def top20(self, event_index: int) -> pd.DataFrame:
+        '''`get_top20(full_schedule.iloc[event_index])` of research question 2, without loading the session.'''
+        return self.results(event_index)[['FullName', 'Position']]
+
+    def conventional_events(
+        self,
+        start_date: dt.datetime = constants.START_DATE,
+        end_date: dt.datetime = constants.END_DATE,
+    ) -> pd.DataFrame:
+        ''':return: The conventional (non-sprint) events between the dates, as the `schedule` of research question 2.'''
+        event_dates = self.schedule_df['EventDate']
+        return self.schedule_df[
+            (event_dates >= start_date) &
+            (event_dates <= end_date) &
+            (self.schedule_df['EventFormat'] == 'conventional')
+        ]
+
+    def save(self, year: int) -> None:
+        RACE_RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+        self.schedule_df.to_parquet(schedule_path(year), index=False)
+        self.results_df.to_parquet(results_path(year), index=False)
+
+    @classmethod
+    def load(cls, year: int = constants.YEAR) -> 'SeasonResults':
+        ''':raises FileNotFoundError: If the store of `year` was not built with `build_season_store`.'''
+        if not schedule_path(year).exists() or not results_path(year).exists():
+            raise FileNotFoundError(
+                f'No race results store for {year} in {RACE_RESULTS_DIR}, build it with '
+                f'`python -m src.data.race_results {year}`.'
+            )
+
+        return cls(pd.read_parquet(schedule_path(year)), pd.read_parquet(results_path(year)))
+
+def load_season_results(year: int = constants.YEAR, offline: bool = True) -> SeasonResults:
+    '''Load the store of `year`, building it through FastF1 first if it does not exist and `offline` is false.'''
+    try:
+        return SeasonResults.load(year)
+    except FileNotFoundError:
+        if offline:
+            raise
+
+    return build_season_store(year)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Build the local FastF1 schedule and race results store.')
+    parser.add_argument('years', type=int, nargs='*', default=[constants.YEAR])
+    parser.add_argument('--offline', action='store_true', help="only use FastF1's local HTTP cache")
+    args = parser.parse_args()
+
+    for year in args.years:
+        season_results = build_season_store(year, args.offline)
+        print(f'{year}: {len(season_results)} events, {len(season_results.results_df)} results -> {RACE_RESULTS_DIR}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+'''Column-level text preprocessing.
+
+Each stage maps a whole pandas Series at once and produces the same values as applying the corresponding
+single-comment function of `src.data.preprocessing` row by row. `TextPipeline` chains stages over a Series or a
+stream of texts, optionally in chunks across worker processes, or lazily over the partitions of a Dask Series.
+'''
+
+from collections.abc import Callable, Iterable, Iterator, Sequence
+from concurrent.futures import ProcessPoolExecutor
+import itertools
+from typing import TYPE_CHECKING
+import pandas as pd
+from src.data import preprocessing
+from src.instrumentation import instrumented
+
+if TYPE_CHECKING:
+    import dask.dataframe as dd
+
+ColumnStage = Callable[[pd.Series], pd.Series]
+
+def normalize_column(texts: pd.Series) -> pd.Series:
+    '''Vectorized `preprocessing.normalize`.
+
+    Arrow-backed strings, e.g. of the compact schema or of Dask, are cast to object first: pandas runs their regular
+    expressions with RE2, whose `\\s` and `\\d` only match ASCII, unlike the `re` patterns of `normalize`.
+    '''
+    return (
+        texts.astype(object, copy=False).str.lower()
+        .str.replace(r'http\S+', '', regex=True)
+        .str.replace(r'[^a-z\s\d]', '', regex=True)
+    )
+
+def tokenize_column(texts: pd.Series) -> pd.Series:
+    '''Split normalized texts on whitespace, which is all that is left to split on after `normalize_column`.'''
+    return texts.str.split()
+
+def remove_stopwords_column(tokens: pd.Series) -> pd.Series:
+    '''Vectorized `preprocessing.remove_stopword` with the English stop words.'''
+    stop_words = preprocessing.load_english_stop_words()
+    return tokens.map(lambda row: [token for token in row if token not in stop_words])
+
+def lemmatize_column(tokens: pd.Series) -> pd.Series:
+    '''Vectorized `preprocessing.lemmatize` that lemmatizes every unique token only once.'''
+    lemmatizer = preprocessing.load_lemmatizer()
+    lemmas = {
+        token: lemmatizer.lemmatize(token)
+        for token in set(itertools.chain.from_iterable(tokens))
+    }
+    return tokens.map(lambda row: [lemmas[token] for token in row])
+
+def combine_names_column(tokens: pd.Series) -> pd.Series:
+    return tokens.map(preprocessing.combine_names)
+
+def spacy_lemmatize_column(texts: pd.Series, batch_size: int = 1000, n_process: int = 1) -> pd.Series:
+    '''`[token.lemma_.lower() for token in nlp(text)]` per text, as in research question 3, with the parser and
+    NER disabled since the lemmatizer only depends on the tagger.
+    '''
+    nlp = preprocessing.load_nlp()
+    disabled = [name for name in ('parser', 'ner') if name in nlp.pipe_names]
+    docs = nlp.pipe(texts, batch_size=batch_size, n_process=n_process, disable=disabled)
+    return pd.Series([[token.lemma_.lower() for token in doc] for doc in docs], index=texts.index, name=texts.name)
+
+DEFAULT_STAGES: tuple[ColumnStage, ...] = (
+    normalize_column,
+    tokenize_column,
+    remove_stopwords_column,
+    lemmatize_column,
+)
+
+class TextPipeline:
+    '''Chain of column stages, e.g. `TextPipeline((normalize_column, tokenize_column, combine_names_column))`.
+
+    :param stages: Functions from Series to Series, applied in order. They must be picklable, i.e. defined at
+        module level, to run with `n_process` > 1.
+    :param n_process: Number of worker processes. Texts are split into chunks of `chunk_size` rows per process.
+    '''
+
+    def __init__(
+        self,
+        stages: Sequence[ColumnStage] = DEFAULT_STAGES,
+        n_process: int = 1,
+        chunk_size: int = 50_000,
+    ) -> None:
+        self.stages = tuple(stages)
+        self.n_process = n_process
+        self.chunk_size = chunk_size
+
+    def _run(self, texts: pd.Series) -> pd.Series:
+        for stage in self.stages:
+            texts = stage(texts)
+        return texts
+
+    def _chunks(self, texts: pd.Series) -> Iterator[pd.Series]:
+        for start in range(0, len(texts), self.chunk_size):
+            yield texts.iloc[start:start + self.chunk_size]
+
+    @instrumented()
+    def __call__(self, texts: pd.Series) -> pd.Series:
+        if self.n_process == 1 or len(texts) <= self.chunk_size:
+            return self._run(texts)
+
+        with ProcessPoolExecutor(max_workers=self.n_process) as executor:
+            return pd.concat(executor.map(self._run, self._chunks(texts)))
+
+    def stream(self, texts: Iterable[str]) -> Iterator[object]:
+        ''':yield: The processed value of each text, in input order, holding at most one chunk in memory.'''
+        iterator = iter(texts)
+
+        while chunk := list(itertools.islice(iterator, self.chunk_size)):
+            yield from self._run(pd.Series(chunk, dtype=object))
+
+    def map_partitions(self, texts: 'dd.Series') -> 'dd.Series':
+        '''Lazily apply the stages to every partition of a Dask Series, e.g. the `text` of
+        `preprocessing.concatenate_submissions_and_comments_ddf`, in the workers that compute it.
+        '''
+        return texts.map_partitions(self._run, meta=pd.Series([], dtype=object, name=texts.name))
@@ -0,0 +1,88 @@
+'''Time-window slicing of a posts DataFrame, e.g. per race weekend.
+
+The posts are sorted by `created_utc` once, after which each (start, end) window is located with two binary searches
+and returned as an `iloc` slice, instead of a boolean mask over every post per window.
+'''
+
+from collections.abc import Hashable, Sequence
+import datetime as dt
+import numpy as np
+import pandas as pd
+from src.utils import assert_columns_exist
+
+TimeWindow = tuple[dt.datetime | pd.Timestamp, dt.datetime | pd.Timestamp]
+
+def race_weekend_windows(
+    schedule_df: pd.DataFrame,
+    start_offset: dt.timedelta = dt.timedelta(0),
+    end_offset: dt.timedelta = dt.timedelta(0),
+) -> list[TimeWindow]:
+    '''The (`Session1DateUtc` + `start_offset`, `Session5DateUtc` + `end_offset`) window of each event, as filtered
+    by research question 2, e.g. `start_offset=-dt.timedelta(days=1)` to include the day before.
+    '''
+    assert_columns_exist({'Session1DateUtc', 'Session5DateUtc'}, schedule_df, 'schedule')
+    return list(zip(schedule_df['Session1DateUtc'] + start_offset, schedule_df['Session5DateUtc'] + end_offset))
+
+class TimeWindowIndex:
+    '''Posts sorted by time, sliced by inclusive time windows.
+
+    :param posts_df: e.g. the result of `concatenate_submissions_and_comments`. Sorted once, stably, unless it
+        already is. The original index labels are kept.
+    :param time_column: Column of datetime64 values to slice on.
+    :raises ValueError: If `time_column` is missing from the DataFrame.
+    '''
+
+    def __init__(self, posts_df: pd.DataFrame, time_column: str = 'created_utc') -> None:
+        assert_columns_exist({time_column}, posts_df, 'posts')
+
+        if not posts_df[time_column].is_monotonic_increasing:
+            posts_df = posts_df.iloc[np.argsort(posts_df[time_column].to_numpy(), kind='stable')]
+
+        self.posts_df = posts_df
+        self.time_column = time_column
+        self._times = posts_df[time_column].to_numpy()
+
+    def __len__(self) -> int:
+        return len(self.posts_df)
+
+    def bounds(self, windows: Sequence[TimeWindow]) -> np.ndarray:
+        ''':return: (n_windows, 2) array of the [start, stop) row positions of each window's posts.'''
+        starts = np.array([pd.Timestamp(start).to_datetime64() for start, _ in windows], dtype='datetime64[ns]')
+        ends = np.array([pd.Timestamp(end).to_datetime64() for _, end in windows], dtype='datetime64[ns]')
+        return np.column_stack((
+            np.searchsorted(self._times, starts, side='left'),
+            np.searchsorted(self._times, ends, side='right'),
+        ))
+
+    def window(self, start: dt.datetime | pd.Timestamp, end: dt.datetime | pd.Timestamp) -> pd.DataFrame:
+        ''':return: The posts with `start` <= time <= `end`, as a slice of `posts_df`.'''
+        (row_start, row_stop), = self.bounds([(start, end)])
+        return self.posts_df.iloc[row_start:row_stop]
+
+    def windows(self, windows: Sequence[TimeWindow]) -> list[pd.DataFrame]:
+        ''':return: The posts of each window, as slices of `posts_df`.'''
+        return [self.posts_df.iloc[row_start:row_stop] for row_start, row_stop in self.bounds(windows)]
+
+    def assign(
+        self,
+        windows: Sequence[TimeWindow],
+        labels: Sequence[Hashable] | None = None,
+        missing: Hashable = -1,
+    ) -> pd.Series:
+        '''Label each post with the window it falls in, e.g. the event index of its race weekend.
+
+        :param labels: One label per window, default the window positions.
+        :param missing: Label of posts outside every window.
+        :return: Series aligned with `posts_df`. If windows overlap, the later window's label wins.
+        '''
+        labels = range(len(windows)) if labels is None else labels
+        if len(labels) != len(windows):
+            raise ValueError(f'Expected one label per window, got {len(labels)} labels for {len(windows)} windows.')
+
+        codes = np.full(len(self), -1, dtype=np.int64)
+        for code, (row_start, row_stop) in enumerate(self.bounds(windows)):
+            codes[row_start:row_stop] = code
+
+        # Code -1 takes the last category, i.e. `missing`.
+        categories = pd.Index([*labels, missing])
+        return pd.Series(categories.take(codes), index=self.posts_df.index, name='window')
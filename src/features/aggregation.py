@@ -0,0 +1,129 @@
+'''Aggregation of per-comment scores to the submissions the comments belong to.'''
+
+from collections.abc import Callable, Collection, Sequence
+from typing import TYPE_CHECKING
+import numpy as np
+import pandas as pd
+from src.utils import assert_columns_exist, worker_local
+
+if TYPE_CHECKING:
+    import dask.dataframe as dd
+
+SUBMISSION_LINK_ID_PREFIX = 't3_'
+
+CommentScorer = Callable[[str], float]
+BatchCommentScorer = Callable[[Sequence[str]], Sequence[float]]
+
+def submission_link_ids(submissions_df: pd.DataFrame) -> pd.Series:
+    '''The `link_id` that the comments of each submission have, e.g. id '5lcgjh' -> link_id 't3_5lcgjh'.
+
+    Integer ids of the compact schema (see `src.data.compact`) are decoded without prefix, so they are returned as is.
+    '''
+    ids = submissions_df['id']
+
+    if pd.api.types.is_integer_dtype(ids):
+        return ids
+
+    return SUBMISSION_LINK_ID_PREFIX + ids.astype(str)
+
+def vote_weighted_comment_scores(
+    submissions_df: pd.DataFrame,
+    comments_df: pd.DataFrame,
+    scorer: CommentScorer | BatchCommentScorer,
+    batched: bool = False,
+    text_column: str = 'body',
+) -> pd.Series:
+    '''Score every comment of the given submissions once and compute the vote-weighted mean score per submission.
+
+    The mean of a submission is sum(comment score * comment votes) / sum(|comment votes|) over its comments. It is
+    NaN if the submission has no comments or its comments have zero votes in total. Comments are matched to
+    submissions with a single hash join on `link_id` instead of scanning all comments per submission.
+
+    :param submissions_df: DataFrame containing at least the `id` column.
+    :param comments_df: DataFrame containing at least the `link_id`, `score` and `text_column` columns.
+    :param scorer: Scores one comment text, e.g. VADER's compound score. If `batched`, it scores a list of texts
+        and returns one score per text instead.
+    :raises ValueError: If any of the required columns are missing from the DataFrames.
+    :return: The weighted mean scores, aligned with the index of `submissions_df`.
+    '''
+    assert_columns_exist({'id'}, submissions_df, 'submissions')
+    assert_columns_exist({'link_id', 'score', text_column}, comments_df, 'comments')
+
+    link_ids = submission_link_ids(submissions_df)
+    relevant_comments_df = comments_df[comments_df['link_id'].isin(link_ids)]
+
+    votes = relevant_comments_df['score'].astype(np.int64).abs().groupby(relevant_comments_df['link_id']).sum()
+    votes = votes[votes != 0]
+
+    # Comments of submissions without votes can only contribute NaN, so they are not scored at all.
+    scored_comments_df = relevant_comments_df[relevant_comments_df['link_id'].isin(votes.index)]
+    texts = scored_comments_df[text_column]
+
+    if batched:
+        comment_scores = np.asarray(scorer(texts.tolist()), dtype=np.float64) # type: ignore[reportArgumentType]
+    else:
+        comment_scores = texts.map(scorer).to_numpy(dtype=np.float64)
+
+    weighted_scores = pd.Series(
+        comment_scores * scored_comments_df['score'].to_numpy(dtype=np.float64),
+        index=scored_comments_df['link_id'],
+    ).groupby(level=0).sum()
+
+    return pd.Series(
+        link_ids.map(weighted_scores / votes).to_numpy(dtype=np.float64),
+        index=submissions_df.index,
+    )
+
+def _vote_weighted_sums_partition(
+    comments_df: pd.DataFrame,
+    link_ids: Collection[object],
+    scorer_factory: Callable[[], BatchCommentScorer],
+    text_column: str,
+) -> pd.DataFrame:
+    # Comments without votes add nothing to either sum, so they are not scored.
+    scored_comments_df = comments_df[comments_df['link_id'].isin(link_ids) & (comments_df['score'] != 0)]
+    scorer = worker_local(scorer_factory)
+    comment_scores = np.asarray(scorer(scored_comments_df[text_column].tolist()), dtype=np.float64)
+    votes = scored_comments_df['score'].to_numpy(dtype=np.float64)
+
+    return pd.DataFrame({
+        'link_id': scored_comments_df['link_id'].to_numpy(),
+        'weighted_score': comment_scores * votes,
+        'votes': np.abs(votes),
+    }).groupby('link_id', as_index=False).sum()
+
+def vote_weighted_comment_scores_ddf(
+    submissions_df: pd.DataFrame,
+    comments_ddf: 'dd.DataFrame',
+    scorer_factory: Callable[[], BatchCommentScorer],
+    text_column: str = 'body',
+    scheduler: str = 'processes',
+    num_workers: int | None = None,
+) -> pd.Series:
+    '''Out-of-core `vote_weighted_comment_scores`: every partition of the comments is scored in the worker that
+    loads it, e.g. from `src.data.loader.load_comments_ddf`. Only the per submission sums are materialized.
+
+    :param scorer_factory: Creates a batched scorer once per worker process, e.g.
+        `TransformerSentimentScorer.from_registry`, see `src.utils.worker_local`.
+    :param scheduler: Dask scheduler to compute with, e.g. 'threads' for scorers that release the GIL.
+    :return: The weighted mean scores, aligned with the index of `submissions_df`, as `vote_weighted_comment_scores`
+        up to floating point summation order.
+    '''
+    assert_columns_exist({'id'}, submissions_df, 'submissions')
+    assert_columns_exist({'link_id', 'score', text_column}, comments_ddf, 'comments')
+
+    link_ids = submission_link_ids(submissions_df)
+    meta = pd.DataFrame({
+        'link_id': pd.Series(dtype=comments_ddf['link_id'].dtype),
+        'weighted_score': pd.Series(dtype=np.float64),
+        'votes': pd.Series(dtype=np.float64),
+    })
+    sums = comments_ddf.map_partitions(
+        _vote_weighted_sums_partition, frozenset(link_ids), scorer_factory, text_column, meta=meta,
+    ).groupby('link_id').sum().compute(scheduler=scheduler, num_workers=num_workers)
+
+    sums = sums[sums['votes'] != 0]
+    return pd.Series(
+        link_ids.map(sums['weighted_score'] / sums['votes']).to_numpy(dtype=np.float64),
+        index=submissions_df.index,
+    )
@@ -0,0 +1,454 @@
+'''Persistent inverted index of the terms and driver/team entities of the posts.
+
+The normalized tokens of every post are indexed once into positional posting lists of row ids, so term, phrase and
+entity lookups, their boolean combinations and time-window filters are array operations instead of a regex over
+every title or body, e.g. the steward decision words of research question 1 or the driver mentions of research
+question 2. Rows are numbered in the order the posts were indexed. New posts of the raw dumps are appended with
+`update_post_index`, which only reads the bytes added since the previous update and merges their postings without
+retokenizing the history.
+'''
+
+from collections.abc import Iterable, Iterator, Mapping, Sequence
+import datetime as dt
+from functools import reduce
+import itertools
+import json
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from config import config
+from src.data import preprocessing
+from src.data.text_pipeline import normalize_column, tokenize_column
+from src.instrumentation import stage
+from src.utils import assert_columns_exist
+
+INVERTED_INDEX_DIR = config.PROCESSED_DATA_DIR / 'inverted_index'
+
+# Prefixes of Reddit fullnames, so the ids of submissions and comments cannot collide.
+SUBMISSION_PREFIX = 't3_'
+COMMENT_PREFIX = 't1_'
+
+# Canonical entity -> its surface forms after `preprocessing.normalize`, which drops punctuation, e.g. 'red-bull'
+# -> 'redbull'. The drivers are the names and aliases of `preprocessing.F1_names` and `preprocessing.Drivers_dict`.
+DRIVER_ENTITIES: dict[str, tuple[str, ...]] = {
+    driver: (driver, *sorted(alias for alias, canonical in preprocessing.Drivers_dict.items() if canonical == driver))
+    for driver in sorted(preprocessing.F1_names)
+}
+TEAM_ENTITIES: dict[str, tuple[str, ...]] = {
+    'red bull': ('red bull', 'redbull', 'rbr'),
+    'ferrari': ('ferrari', 'scuderia'),
+    'mercedes': ('mercedes', 'merc'),
+    'mclaren': ('mclaren',),
+    'aston martin': ('aston martin', 'aston', 'amr'),
+    'alpine': ('alpine',),
+    'williams': ('williams',),
+    'haas': ('haas',),
+    'alphatauri': ('alphatauri', 'alpha tauri'),
+    'alfa romeo': ('alfa romeo', 'alfa'),
+    'sauber': ('sauber', 'kick sauber'),
+    'racing point': ('racing point',),
+    'renault': ('renault',),
+}
+DEFAULT_ENTITIES = {**DRIVER_ENTITIES, **TEAM_ENTITIES}
+
+# Row ids and positions are packed into one int64 key to intersect the postings of consecutive phrase terms.
+_POSITION_STRIDE = np.int64(2 ** 32)
+
+def _join(values: Iterable[str]) -> np.ndarray:
+    # Terms and ids contain no whitespace, so one newline-joined string is a compact, pickle-free way to store them.
+    return np.array('\n'.join(values))
+
+def _split(array: np.ndarray) -> list[str]:
+    joined = str(array)
+    return joined.split('\n') if joined else []
+
+def _unique_sorted(rows: np.ndarray) -> np.ndarray:
+    ''':return: The distinct values of an already sorted array.'''
+    if len(rows) == 0:
+        return rows
+
+    return rows[np.concatenate(([True], rows[1:] != rows[:-1]))]
+
+def _to_seconds(time: dt.datetime | pd.Timestamp) -> np.datetime64:
+    return pd.Timestamp(time).to_datetime64().astype('datetime64[s]')
+
+class InvertedIndex:
+    '''Positional posting lists of the tokens of `preprocessing.normalize`d posts, and the rows that mention each
+    entity.
+
+    Postings are stored like a CSR matrix: the postings of term id t are `rows[offsets[t]:offsets[t + 1]]` with the
+    token positions alongside, sorted by row and position.
+
+    :param vocabulary: The terms, indexed by term id.
+    :param offsets: Start of the postings of each term id, followed by the total number of postings.
+    :param rows: Row id of each posting.
+    :param positions: Token position of each posting within its post.
+    :param entities: Canonical entity -> its surface forms, as matched when the rows were indexed.
+    :param entity_offsets: Start of the rows of each entity, in the order of `entities`, followed by their total.
+    :param entity_postings: The sorted, distinct rows that mention each entity, concatenated.
+    :param post_ids: Id of the post of each row.
+    :param created_utc: Time of the post of each row, as datetime64[s].
+    :param sources: Raw dump file name -> number of its bytes indexed so far, see `update_post_index`.
+    '''
+
+    def __init__(
+        self,
+        vocabulary: Sequence[str],
+        offsets: np.ndarray,
+        rows: np.ndarray,
+        positions: np.ndarray,
+        entities: Mapping[str, Sequence[str]],
+        entity_offsets: np.ndarray,
+        entity_postings: np.ndarray,
+        post_ids: Sequence[str],
+        created_utc: np.ndarray,
+        sources: Mapping[str, int] | None = None,
+    ) -> None:
+        self.vocabulary = list(vocabulary)
+        self.offsets = offsets
+        self.rows = rows
+        self.positions = positions
+        self.entities = {entity: tuple(forms) for entity, forms in entities.items()}
+        self.entity_offsets = entity_offsets
+        self.entity_postings = entity_postings
+        self.post_ids = list(post_ids)
+        self.created_utc = created_utc
+        self.sources = dict(sources or {})
+
+        self._term_ids = {term: term_id for term_id, term in enumerate(self.vocabulary)}
+        self._entity_ids = {entity: entity_id for entity_id, entity in enumerate(self.entities)}
+
+    @classmethod
+    def from_posts(
+        cls,
+        posts_df: pd.DataFrame,
+        text_column: str = 'text',
+        id_column: str = 'id',
+        time_column: str = 'created_utc',
+        entities: Mapping[str, Sequence[str]] = DEFAULT_ENTITIES,
+    ) -> 'InvertedIndex':
+        '''Index the posts in the order of `posts_df`, e.g. of `concatenate_submissions_and_comments`.
+
+        :raises ValueError: If any of the columns are missing from the DataFrame.
+        '''
+        assert_columns_exist({text_column, id_column, time_column}, posts_df, 'posts')
+
+        tokens = tokenize_column(normalize_column(posts_df[text_column].fillna('').astype(str)))
+        lengths = tokens.map(len).to_numpy(dtype=np.int64)
+        term_ids, vocabulary = pd.factorize(np.array(list(itertools.chain.from_iterable(tokens)), dtype=object))
+
+        token_rows = np.repeat(np.arange(len(posts_df), dtype=np.int64), lengths)
+        starts = np.cumsum(lengths) - lengths
+        token_positions = (np.arange(lengths.sum(), dtype=np.int64) - np.repeat(starts, lengths)).astype(np.int32)
+
+        # A stable sort by term keeps the postings of each term sorted by row and position.
+        order = np.argsort(term_ids, kind='stable')
+        offsets = np.concatenate(([0], np.cumsum(np.bincount(term_ids, minlength=len(vocabulary))))).astype(np.int64)
+
+        index = cls(
+            vocabulary.tolist(),
+            offsets,
+            token_rows[order],
+            token_positions[order],
+            {},
+            np.zeros(1, dtype=np.int64),
+            np.empty(0, dtype=np.int64),
+            posts_df[id_column].astype(str).tolist(),
+            posts_df[time_column].to_numpy().astype('datetime64[s]'),
+        )
+        return index.with_entities(entities)
+
+    @classmethod
+    def empty(cls, entities: Mapping[str, Sequence[str]] = DEFAULT_ENTITIES) -> 'InvertedIndex':
+        return cls.from_posts(pd.DataFrame({
+            'text': pd.Series(dtype=object),
+            'id': pd.Series(dtype=object),
+            'created_utc': pd.Series(dtype='datetime64[s]'),
+        }), entities=entities)
+
+    def __len__(self) -> int:
+        return len(self.post_ids)
+
+    def with_entities(self, entities: Mapping[str, Sequence[str]]) -> 'InvertedIndex':
+        ''':return: This index with the entity rows of `entities` instead, matched as phrases of the indexed terms.'''
+        entity_rows = [
+            reduce(np.union1d, (self.phrase_rows(form) for form in forms), np.empty(0, dtype=np.int64))
+            for forms in entities.values()
+        ]
+        entity_offsets = np.concatenate(([0], np.cumsum([len(rows) for rows in entity_rows]))).astype(np.int64)
+
+        return InvertedIndex(
+            self.vocabulary,
+            self.offsets,
+            self.rows,
+            self.positions,
+            entities,
+            entity_offsets,
+            np.concatenate(entity_rows).astype(np.int64) if entity_rows else np.empty(0, dtype=np.int64),
+            self.post_ids,
+            self.created_utc,
+            self.sources,
+        )
+
+    def _postings(self, term: str) -> tuple[np.ndarray, np.ndarray]:
+        ''':return: The rows and positions of every occurrence of `term`.'''
+        term_id = self._term_ids.get(term)
+
+        if term_id is None:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int32)
+
+        start, stop = self.offsets[term_id], self.offsets[term_id + 1]
+        return self.rows[start:stop], self.positions[start:stop]
+
+    def term_rows(self, term: str) -> np.ndarray:
+        ''':return: The sorted rows that contain the normalized token `term`.'''
+        return _unique_sorted(self._postings(term)[0])
+
+    def phrase_rows(self, phrase: str | Sequence[str]) -> np.ndarray:
+        ''':param phrase: A text, normalized and split like the posts, or its tokens.
+        :return: The sorted rows that contain the tokens of `phrase` consecutively.
+        '''
+        terms = preprocessing.normalize(phrase).split() if isinstance(phrase, str) else list(phrase)
+
+        if not terms:
+            return np.empty(0, dtype=np.int64)
+
+        if len(terms) == 1:
+            return self.term_rows(terms[0])
+
+        keys = None
+        for offset, term in enumerate(terms):
+            rows, positions = self._postings(term)
+            starts = positions.astype(np.int64) - offset
+            term_keys = rows[starts >= 0] * _POSITION_STRIDE + starts[starts >= 0]
+            keys = term_keys if keys is None else np.intersect1d(keys, term_keys, assume_unique=True)
+
+        return _unique_sorted(keys // _POSITION_STRIDE)
+
+    def entity_rows(self, entity: str) -> np.ndarray:
+        ''':return: The sorted rows that mention any surface form of `entity`, e.g. 'max verstappen' or 'red bull'.
+        :raises KeyError: If `entity` was not indexed.
+        '''
+        entity_id = self._entity_ids[entity]
+        return self.entity_postings[self.entity_offsets[entity_id]:self.entity_offsets[entity_id + 1]]
+
+    def query_rows(self, query: str) -> np.ndarray:
+        ''':return: The rows of `query` as an indexed entity if it is one, e.g. 'fernando alonso' also matches
+            'alonso', and as a phrase otherwise.
+        '''
+        if query in self._entity_ids:
+            return self.entity_rows(query)
+
+        return self.phrase_rows(query)
+
+    def window_rows(
+        self,
+        rows: np.ndarray,
+        start: dt.datetime | pd.Timestamp | None = None,
+        end: dt.datetime | pd.Timestamp | None = None,
+    ) -> np.ndarray:
+        ''':return: The `rows` of posts with `start` <= `created_utc` <= `end`, where None is unbounded.'''
+        times = self.created_utc[rows]
+        mask = np.ones(len(rows), dtype=bool)
+
+        if start is not None:
+            mask &= times >= _to_seconds(start)
+        if end is not None:
+            mask &= times <= _to_seconds(end)
+
+        return rows[mask]
+
+    def search(
+        self,
+        all_of: Iterable[str] = (),
+        any_of: Iterable[str] = (),
+        none_of: Iterable[str] = (),
+        start: dt.datetime | pd.Timestamp | None = None,
+        end: dt.datetime | pd.Timestamp | None = None,
+    ) -> np.ndarray:
+        '''Boolean query of terms, phrases and entities, see `query_rows`, e.g. the steward decision posts about
+        Verstappen: `search(all_of=['max verstappen'], any_of=steward_decision_related_words)`.
+
+        :param all_of: Queries that every row has to match.
+        :param any_of: Queries of which every row has to match at least one. Ignored if empty.
+        :param none_of: Queries that no row may match.
+        :return: The sorted matching rows within the time window.
+        '''
+        row_sets = [self.query_rows(query) for query in all_of]
+
+        if any_of := list(any_of):
+            row_sets.append(_unique_sorted(np.sort(np.concatenate([self.query_rows(query) for query in any_of]))))
+
+        if row_sets:
+            rows = reduce(lambda left, right: np.intersect1d(left, right, assume_unique=True), row_sets)
+        else:
+            rows = np.arange(len(self), dtype=np.int64)
+
+        for query in none_of:
+            rows = np.setdiff1d(rows, self.query_rows(query), assume_unique=True)
+
+        return self.window_rows(rows, start, end)
+
+    def ids(self, rows: np.ndarray) -> list[str]:
+        ''':return: The post ids of `rows`, e.g. to select them with `posts_df[posts_df['id'].isin(...)]`.'''
+        return [self.post_ids[row] for row in rows]
+
+    def merge(self, *others: 'InvertedIndex') -> 'InvertedIndex':
+        ''':return: This index followed by the rows of the others, over the union of their vocabularies. The rows of
+            each other index are renumbered after the rows before it.
+        :raises ValueError: If the indexes matched different entities.
+        '''
+        if any(other.entities != self.entities for other in others):
+            raise ValueError('Cannot merge indexes of different entities, rebuild them with the same entities.')
+
+        term_ids = dict(self._term_ids)
+        term_id_parts, row_parts, position_parts = [], [], []
+        entity_id_parts, entity_row_parts = [], []
+        row_offset = 0
+
+        for index in (self, *others):
+            remap = np.array([term_ids.setdefault(term, len(term_ids)) for term in index.vocabulary], dtype=np.int64)
+            term_id_parts.append(np.repeat(remap, np.diff(index.offsets)))
+            row_parts.append(index.rows + row_offset)
+            position_parts.append(index.positions)
+
+            entity_id_parts.append(np.repeat(np.arange(len(index.entities)), np.diff(index.entity_offsets)))
+            entity_row_parts.append(index.entity_postings + row_offset)
+            row_offset += len(index)
+
+        # Stable sorts keep the postings of each term and entity ordered by row, as the parts are in row order.
+        term_id_array = np.concatenate(term_id_parts)
+        order = np.argsort(term_id_array, kind='stable')
+        entity_id_array = np.concatenate(entity_id_parts)
+        entity_order = np.argsort(entity_id_array, kind='stable')
+
+        return InvertedIndex(
+            list(term_ids),
+            np.concatenate(([0], np.cumsum(np.bincount(term_id_array, minlength=len(term_ids))))).astype(np.int64),
+            np.concatenate(row_parts)[order],
+            np.concatenate(position_parts)[order],
+            self.entities,
+            np.concatenate((
+                [0], np.cumsum(np.bincount(entity_id_array, minlength=len(self.entities))),
+            )).astype(np.int64),
+            np.concatenate(entity_row_parts)[entity_order],
+            list(itertools.chain(self.post_ids, *(other.post_ids for other in others))),
+            np.concatenate([self.created_utc, *(other.created_utc for other in others)]),
+            self.sources,
+        )
+
+    def save(self, path: Path) -> None:
+        # Saved uncompressed, so that loading costs little more than reading the file.
+        with open(path, 'wb') as file:
+            np.savez(
+                file,
+                vocabulary=_join(self.vocabulary),
+                offsets=self.offsets,
+                rows=self.rows,
+                positions=self.positions,
+                entities=np.array(json.dumps(self.entities)),
+                entity_offsets=self.entity_offsets,
+                entity_postings=self.entity_postings,
+                post_ids=_join(self.post_ids),
+                created_utc=self.created_utc.astype(np.int64),
+                sources=np.array(json.dumps(self.sources)),
+            )
+
+    @classmethod
+    def load(cls, path: Path) -> 'InvertedIndex':
+        with np.load(path) as npz:
+            return cls(
+                _split(npz['vocabulary']),
+                npz['offsets'],
+                npz['rows'],
+                npz['positions'],
+                json.loads(str(npz['entities'])),
+                npz['entity_offsets'],
+                npz['entity_postings'],
+                _split(npz['post_ids']),
+                npz['created_utc'].astype('datetime64[s]'),
+                json.loads(str(npz['sources'])),
+            )
+
+def index_path(name: str) -> Path:
+    return INVERTED_INDEX_DIR / f'{name}.npz'
+
+def _read_new_posts(ndjson_file: Path, start_offset: int, chunk_size: int) -> Iterator[tuple[pd.DataFrame, int]]:
+    ''':yield: The `text`, `id` and `created_utc` of each consecutive `chunk_size` complete lines after byte
+        `start_offset`, and the byte offset after them. A trailing line without newline, e.g. one that is still
+        being written, is left for the next update.
+    '''
+    is_submission = 'submissions' in ndjson_file.stem
+    offset = start_offset
+
+    with open(ndjson_file, 'rb') as file:
+        file.seek(start_offset)
+
+        while lines := [line for line in itertools.islice(file, chunk_size) if line.endswith(b'\n')]:
+            posts = [json.loads(line) for line in lines]
+            offset += sum(len(line) for line in lines)
+
+            if is_submission:
+                texts = [preprocessing.submission_text(post['title'], post['selftext']) for post in posts]
+            else:
+                texts = [post['body'] for post in posts]
+
+            prefix = SUBMISSION_PREFIX if is_submission else COMMENT_PREFIX
+            yield pd.DataFrame({
+                'text': pd.Series(texts, dtype=object),
+                'id': [prefix + str(post['id']) for post in posts],
+                'created_utc': np.array([int(post['created_utc']) for post in posts], dtype='datetime64[s]'),
+            }), offset
+
+            if len(lines) < chunk_size:
+                break
+
+def update_post_index(
+    name: str,
+    ndjson_files: Sequence[Path],
+    entities: Mapping[str, Sequence[str]] = DEFAULT_ENTITIES,
+    chunk_size: int = 100_000,
+    overwrite: bool = False,
+) -> InvertedIndex:
+    '''Index the posts of the raw dumps that were appended since the saved index `name` was last updated, and save
+    it, e.g. `update_post_index('formula1', (RawFile.FORMULA1_SUBMISSIONS, RawFile.FORMULA1_COMMENTS))` with
+    `src.data.constants.RawFile`.
+
+    The dumps are assumed to only grow by appending lines. Post ids are Reddit fullnames, e.g. 't3_5lcgjh' for a
+    submission, which is recognized by 'submissions' in its file name.
+
+    :param overwrite: Whether to reindex the dumps from scratch instead, e.g. after they were replaced.
+    :raises ValueError: If a dump is shorter than the part that was indexed before, so it was not appended to.
+    '''
+    path = index_path(name)
+    index = InvertedIndex.load(path) if path.exists() and not overwrite else InvertedIndex.empty(entities)
+
+    if index.entities != {entity: tuple(forms) for entity, forms in entities.items()}:
+        index = index.with_entities(entities)
+
+    sources = dict(index.sources)
+    new_indexes: list[InvertedIndex] = []
+
+    with stage('update_post_index') as record:
+        for ndjson_file in ndjson_files:
+            start_offset = sources.get(ndjson_file.name, 0)
+
+            if ndjson_file.stat().st_size < start_offset:
+                raise ValueError(
+                    f'{ndjson_file.name} is shorter than its {start_offset} indexed bytes. '
+                    'Update with `overwrite=True` to reindex it.',
+                )
+
+            for posts_df, stop_offset in _read_new_posts(ndjson_file, start_offset, chunk_size):
+                new_indexes.append(InvertedIndex.from_posts(posts_df, entities=entities))
+                sources[ndjson_file.name] = stop_offset
+                record.items += len(posts_df)
+
+    index = index.merge(*new_indexes)
+    index.sources = sources
+
+    INVERTED_INDEX_DIR.mkdir(parents=True, exist_ok=True)
+    temporary_path = path.with_suffix('.tmp')
+    index.save(temporary_path)
+    temporary_path.replace(path)
+    return index
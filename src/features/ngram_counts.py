@@ -0,0 +1,96 @@
+'''Streaming n-gram counting over the raw subreddit dumps.
+
+Posts flow from `stream_ndjson` through a `TextPipeline` into shard count tables, one chunk at a time, so memory is
+bounded by the chunk size plus the distinct n-grams instead of by the tokenized corpus. Shards are saved per name,
+e.g. per subreddit or per week of new comments, and merged without retokenizing the history.
+'''
+
+from collections.abc import Callable, Iterable, Iterator, Sequence
+from pathlib import Path
+from typing import Any
+import itertools
+from config import config
+from src.data import preprocessing
+from src.data.loader import stream_ndjson
+from src.data.text_pipeline import TextPipeline, normalize_column, spacy_lemmatize_column
+from src.instrumentation import instrumented
+from src.models.ngram import NgramCounts
+
+NGRAM_COUNTS_DIR = config.PROCESSED_DATA_DIR / 'ngram_counts'
+
+# Research question 3: `preprocessing.normalize`, then the lowercased spaCy lemma of every token.
+LEMMATIZED_TOKENS_PIPELINE = TextPipeline((normalize_column, spacy_lemmatize_column), chunk_size=10_000)
+
+def stream_post_texts(
+    submissions_file: Path,
+    comments_file: Path,
+    ndjson_streamer: Callable[[Path], Iterable[dict[str, Any]]] = stream_ndjson,
+) -> Iterator[str]:
+    ''':yield: The `text` of every submission, then of every comment, as `concatenate_submissions_and_comments`.'''
+    for submission in ndjson_streamer(submissions_file):
+        yield preprocessing.submission_text(submission['title'], submission['selftext'])
+
+    for comment in ndjson_streamer(comments_file):
+        yield comment['body']
+
+def count_shards(sentences: Iterable[Sequence[str]], n: int = 3, shard_size: int = 100_000) -> Iterator[NgramCounts]:
+    ''':yield: The n-gram counts of each consecutive `shard_size` sentences.'''
+    iterator = iter(sentences)
+
+    while chunk := list(itertools.islice(iterator, shard_size)):
+        yield NgramCounts.from_sentences(chunk, n)
+
+def count_ngrams_streaming(sentences: Iterable[Sequence[str]], n: int = 3, shard_size: int = 100_000) -> NgramCounts:
+    ''':return: The n-gram counts of all sentences, counted shard by shard and merged into a running total.'''
+    counts = NgramCounts.from_sentences((), n)
+    for shard in count_shards(sentences, n, shard_size):
+        counts = counts.merge(shard)
+    return counts
+
+@instrumented(count=lambda counts: counts.sentence_count)
+def count_post_ngrams(
+    submissions_file: Path,
+    comments_file: Path,
+    n: int = 3,
+    pipeline: TextPipeline = LEMMATIZED_TOKENS_PIPELINE,
+    ndjson_streamer: Callable[[Path], Iterable[dict[str, Any]]] = stream_ndjson,
+    shard_size: int = 100_000,
+) -> NgramCounts:
+    '''Stream the posts of a subreddit through `pipeline` and count the n-grams of the resulting tokens.
+
+    :param ndjson_streamer: Streamer of raw objects, e.g. `partial(stream_ndjson, limit=500_000)`.
+    '''
+    texts = stream_post_texts(submissions_file, comments_file, ndjson_streamer)
+    tokens: Iterator[Sequence[str]] = pipeline.stream(texts) # type: ignore[reportAssignmentType]
+    return count_ngrams_streaming(tokens, n, shard_size)
+
+def shard_path(name: str) -> Path:
+    return NGRAM_COUNTS_DIR / f'{name}.npz'
+
+def build_count_shard(
+    name: str,
+    submissions_file: Path,
+    comments_file: Path,
+    n: int = 3,
+    pipeline: TextPipeline = LEMMATIZED_TOKENS_PIPELINE,
+    ndjson_streamer: Callable[[Path], Iterable[dict[str, Any]]] = stream_ndjson,
+    overwrite: bool = False,
+) -> NgramCounts:
+    '''Count the n-grams of the given dumps and save them as shard `name`, e.g. 'formula1' or 'formula1_2024w10'.
+
+    An existing shard is loaded instead of recounted unless `overwrite` is true.
+    '''
+    path = shard_path(name)
+
+    if path.exists() and not overwrite:
+        return NgramCounts.load(path)
+
+    counts = count_post_ngrams(submissions_file, comments_file, n, pipeline, ndjson_streamer)
+    NGRAM_COUNTS_DIR.mkdir(parents=True, exist_ok=True)
+    counts.save(path)
+    return counts
+
+def load_count_shards(names: Iterable[str]) -> NgramCounts:
+    ''':return: The merged counts of the saved shards, e.g. `load_count_shards(('formula1', 'formula1point5'))`.'''
+    first, *rest = (NgramCounts.load(shard_path(name)) for name in names)
+    return first.merge(*rest)
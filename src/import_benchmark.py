@@ -0,0 +1,65 @@
+'''Import-time regression check for the modules that the data loading path depends on.
+
+Imports each module in a fresh interpreter with `python -X importtime`, takes the fastest of a few runs and fails if
+it exceeds its budget or pulls in one of `HEAVY_MODULES`, e.g.:
+
+    python -m src.import_benchmark
+'''
+
+import argparse
+import json
+import subprocess
+import sys
+from config import config
+
+IMPORT_TIME_BUDGETS_SECONDS = {
+    'src.data.loader': 1.5,
+    'src.data.preprocessing': 1.5,
+}
+
+# Modules that should only be imported on first use.
+HEAVY_MODULES = frozenset({'torch', 'transformers', 'spacy', 'nltk', 'symspellpy', 'gliner', 'fastf1', 'jinja2'})
+
+def measure_import(module: str) -> tuple[float, frozenset[str]]:
+    ''':return: The cumulative import time of `module` in seconds and the heavy modules it imported.'''
+    code = f'import sys, json, {module}; print(json.dumps(sorted(sys.modules)))'
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=config.ROOT_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    # Lines look like 'import time:  self [us] | cumulative | imported package'.
+    cumulative_us = next(
+        int(line.split('|')[1])
+        for line in result.stderr.splitlines()
+        if line.startswith('import time:') and line.split('|')[-1].strip() == module
+    )
+    imported_modules = {name.split('.')[0] for name in json.loads(result.stdout.splitlines()[-1])}
+
+    return cumulative_us / 10 ** 6, frozenset(imported_modules & HEAVY_MODULES)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5, help='Number of runs per module, the fastest one counts.')
+    args = parser.parse_args()
+
+    failed = False
+    for module, budget in IMPORT_TIME_BUDGETS_SECONDS.items():
+        measurements = [measure_import(module) for _ in range(args.repeat)]
+        seconds = min(seconds for seconds, _ in measurements)
+        heavy_modules = measurements[0][1]
+
+        ok = seconds <= budget and not heavy_modules
+        failed |= not ok
+        print(
+            f'{"OK  " if ok else "FAIL"} {module}: {seconds:.3f} s (budget {budget:.1f} s)'
+            + (f', imports {", ".join(sorted(heavy_modules))}' if heavy_modules else '')
+        )
+
+    sys.exit(1 if failed else 0)
+
+if __name__ == '__main__':
+    main()
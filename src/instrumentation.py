@@ -0,0 +1,284 @@
+'''Per-stage timing, throughput, memory and cache instrumentation of the pipeline.
+
+Stages are recorded with the `stage` context manager or the `instrumented` decorator into the process-wide
+`REGISTRY`. Instrumentation is off by default, in which case both cost one flag check. Enable it, run the pipeline
+and save a report, e.g.:
+
+    instrumentation.enable(profile_dir=config.REPORTS_DIR / 'profiles')
+    ...
+    instrumentation.REGISTRY.save(config.REPORTS_DIR / 'instrumentation' / 'run.json')
+
+Setting the environment variable `F1_NLP_INSTRUMENT=1` enables it at import time. With `profile_dir`, every
+outermost stage call also runs under cProfile and dumps pstats files, e.g. for snakeviz; stages nested in it show up
+in its profile. `add_hook` registers callbacks at stage boundaries, e.g. to place markers for py-spy or another
+sampling profiler.
+'''
+
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+import csv
+import functools
+import json
+import os
+from pathlib import Path
+import sys
+import threading
+import time
+from typing import Any, Literal, ParamSpec, Protocol, TypeVar
+
+_P = ParamSpec('_P')
+_R = TypeVar('_R')
+
+StageEvent = Literal['start', 'end']
+StageHook = Callable[[StageEvent, str], None]
+
+class _HitCounter(Protocol):
+    hits: int
+    misses: int
+
+@dataclass
+class StageStats:
+    '''Totals over every call of one stage.'''
+
+    name: str
+    calls: int = 0
+    seconds: float = 0.0
+    items: int = 0
+    peak_rss_bytes: int = 0
+    cache_hits: int = 0
+    cache_misses: int = 0
+
+    @property
+    def items_per_second(self) -> float:
+        return self.items / self.seconds if self.seconds > 0 else 0.0
+
+    @property
+    def cache_hit_rate(self) -> float | None:
+        lookups = self.cache_hits + self.cache_misses
+        return self.cache_hits / lookups if lookups else None
+
+    def to_dict(self) -> dict[str, Any]:
+        return {**asdict(self), 'items_per_second': self.items_per_second, 'cache_hit_rate': self.cache_hit_rate}
+
+@dataclass
+class StageRecord:
+    '''Handle of one running stage, to report what it processed, e.g. `record.items += len(batch)`.'''
+
+    items: int = 0
+    cache_hits: int = 0
+    cache_misses: int = 0
+    caches: list[Any] = field(default_factory=list)
+
+    def track_cache(self, cache: Any) -> None:
+        '''Attribute the lookups of a cache during the stage to it: an object with `hits` and `misses`, such as
+        `InferenceCache`, or an `lru_cache`d function.
+        '''
+        self.caches.append((cache, _cache_counts(cache)))
+
+# Shared by all stages while instrumentation is disabled, so that `record.items += n` stays valid and cheap.
+_DISABLED_RECORD = StageRecord()
+
+def _cache_counts(cache: _HitCounter | Any) -> tuple[int, int]:
+    if hasattr(cache, 'cache_info'):
+        info = cache.cache_info()
+        return info.hits, info.misses
+
+    return cache.hits, cache.misses
+
+def _peak_rss_bytes() -> int:
+    '''Peak resident set size of the process so far.'''
+    import psutil
+
+    memory_info = psutil.Process().memory_info()
+    if hasattr(memory_info, 'peak_wset'): # Windows
+        return memory_info.peak_wset
+
+    import resource
+
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes.
+    return max_rss if sys.platform == 'darwin' else max_rss * 1024
+
+class StageRegistry:
+    '''Collects the `StageStats` of every stage of a run.'''
+
+    def __init__(self) -> None:
+        self.enabled = os.environ.get('F1_NLP_INSTRUMENT') == '1'
+        self.profile_dir: Path | None = None
+        self.hooks: list[StageHook] = []
+        self.stats: dict[str, StageStats] = {}
+        self._lock = threading.Lock()
+        # Only one cProfile profiler can be active at a time: Python 3.12 refuses to enable a second one, and before
+        # that disabling an inner one stops the outer one too.
+        self._profiling = False
+
+    def start_profiler(self) -> Any:
+        ''':return: An enabled cProfile profiler, or None if profiling is off or another stage is already profiled.'''
+        if self.profile_dir is None:
+            return None
+
+        with self._lock:
+            if self._profiling:
+                return None
+            self._profiling = True
+
+        import cProfile
+
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except BaseException:
+            self._profiling = False
+            raise
+
+        return profiler
+
+    def stop_profiler(self, profiler: Any, name: str) -> None:
+        '''Disable `profiler` and dump its stats as `<name>.<n>.prof` in `profile_dir`.'''
+        profiler.disable()
+        self._profiling = False
+
+        if self.profile_dir is not None:
+            self.profile_dir.mkdir(parents=True, exist_ok=True)
+            call_number = self.stats[name].calls if name in self.stats else 0
+            profiler.dump_stats(self.profile_dir / f'{name}.{call_number}.prof')
+
+    def record(self, name: str, seconds: float, stage_record: StageRecord, peak_rss_bytes: int) -> None:
+        with self._lock:
+            stats = self.stats.setdefault(name, StageStats(name))
+            stats.calls += 1
+            stats.seconds += seconds
+            stats.items += stage_record.items
+            stats.peak_rss_bytes = max(stats.peak_rss_bytes, peak_rss_bytes)
+            stats.cache_hits += stage_record.cache_hits
+            stats.cache_misses += stage_record.cache_misses
+
+    def reset(self) -> None:
+        with self._lock:
+            self.stats.clear()
+
+    def report(self) -> list[dict[str, Any]]:
+        ''':return: One row per stage, slowest first.'''
+        return [stats.to_dict() for stats in sorted(self.stats.values(), key=lambda stats: -stats.seconds)]
+
+    def save(self, path: Path) -> Path:
+        '''Write the report as JSON, or as CSV if `path` ends in '.csv'.'''
+        path.parent.mkdir(parents=True, exist_ok=True)
+        rows = self.report()
+
+        if path.suffix == '.csv':
+            with open(path, 'w', newline='', encoding='utf-8') as file:
+                writer = csv.DictWriter(file, fieldnames=list(StageStats('').to_dict()))
+                writer.writeheader()
+                writer.writerows(rows)
+        else:
+            path.write_text(json.dumps({'created_at': time.time(), 'stages': rows}, indent=4))
+
+        return path
+
+REGISTRY = StageRegistry()
+
+def enable(profile_dir: Path | None = None) -> None:
+    ''':param profile_dir: If given, profile every outermost stage call with cProfile and dump `<stage>.<n>.prof`
+        files there. Nested stages are part of the profile of the stage they run in.
+    '''
+    REGISTRY.enabled = True
+    REGISTRY.profile_dir = profile_dir
+
+def disable() -> None:
+    REGISTRY.enabled = False
+    REGISTRY.profile_dir = None
+
+def add_hook(hook: StageHook) -> None:
+    '''Call `hook('start' | 'end', stage name)` at the boundaries of every stage while enabled.'''
+    REGISTRY.hooks.append(hook)
+
+@contextmanager
+def stage(name: str, items: int = 0, caches: tuple[Any, ...] = ()) -> Iterator[StageRecord]:
+    '''Record the wall time, items, peak RSS and cache lookups of the enclosed code as stage `name`.
+
+    :param items: Number of items processed, if known upfront. Otherwise increment `record.items` inside.
+    :param caches: Caches whose lookups to attribute to the stage, see `StageRecord.track_cache`.
+    '''
+    if not REGISTRY.enabled:
+        yield _DISABLED_RECORD
+        return
+
+    stage_record = StageRecord(items=items)
+    for cache in caches:
+        stage_record.track_cache(cache)
+
+    for hook in REGISTRY.hooks:
+        hook('start', name)
+
+    profiler = REGISTRY.start_profiler()
+    started_at = time.perf_counter()
+    try:
+        yield stage_record
+    finally:
+        seconds = time.perf_counter() - started_at
+
+        if profiler is not None:
+            REGISTRY.stop_profiler(profiler, name)
+
+        for cache, (hits_before, misses_before) in stage_record.caches:
+            hits, misses = _cache_counts(cache)
+            stage_record.cache_hits += hits - hits_before
+            stage_record.cache_misses += misses - misses_before
+
+        REGISTRY.record(name, seconds, stage_record, _peak_rss_bytes())
+
+        for hook in REGISTRY.hooks:
+            hook('end', name)
+
+def _count_items(result: Any) -> int:
+    return len(result) if hasattr(result, '__len__') else 0
+
+def instrumented(
+    name: str | None = None,
+    count: Callable[[Any], int] = _count_items,
+) -> Callable[[Callable[_P, _R]], Callable[_P, _R]]:
+    '''Record every call of the decorated function as a stage.
+
+    :param name: Stage name, default the function's qualified name, e.g. 'TextPipeline.__call__'.
+    :param count: Number of items processed, given the function's result. Default its length, if it has one.
+    '''
+    def decorator(function: Callable[_P, _R]) -> Callable[_P, _R]:
+        stage_name = name or function.__qualname__
+
+        @functools.wraps(function)
+        def wrapper(*args: _P.args, **kwargs: _P.kwargs) -> _R:
+            if not REGISTRY.enabled:
+                return function(*args, **kwargs)
+
+            with stage(stage_name) as stage_record:
+                result = function(*args, **kwargs)
+                stage_record.items += count(result)
+                return result
+
+        return wrapper
+
+    return decorator
+
+def compare_reports(before_path: Path, after_path: Path) -> list[dict[str, Any]]:
+    ''':return: Per stage in both JSON reports, the seconds and items/second before and after and their ratios, e.g.
+        to spot regressions between two runs.
+    '''
+    before, after = (
+        {row['name']: row for row in json.loads(path.read_text())['stages']}
+        for path in (before_path, after_path)
+    )
+
+    return [
+        {
+            'name': name,
+            'seconds_before': before[name]['seconds'],
+            'seconds_after': after[name]['seconds'],
+            'seconds_ratio': after[name]['seconds'] / before[name]['seconds'] if before[name]['seconds'] else None,
+            'items_per_second_before': before[name]['items_per_second'],
+            'items_per_second_after': after[name]['items_per_second'],
+        }
+        for name in before
+        if name in after
+    ]
@@ -0,0 +1,267 @@
+'''Aspect-based sentiment analysis (ABSA) of drivers mentioned in posts.'''
+
+from collections.abc import Callable, Iterable, Mapping, Sequence
+import re
+from typing import TYPE_CHECKING, Any
+import numpy as np
+import pandas as pd
+import torch
+from transformers import AutoModelForSequenceClassification, AutoTokenizer
+from config import model_registry
+from src.instrumentation import stage
+from src.models.inference_cache import InferenceCache
+from src.utils import worker_local
+
+if TYPE_CHECKING:
+    import dask.dataframe as dd
+
+ABSA_MODEL = 'yangheng/deberta-v3-base-absa-v1.1'
+
+DriverSentiment = dict[str, float]
+
+class DriverMentionDetector:
+    '''Finds which drivers a text mentions with one compiled regex instead of one substring scan per driver.
+
+    Mentions are case-sensitive substring matches, like `driver in comment`, so lowercase names such as
+    `src.data.preprocessing.F1_names` only match lowercased texts.
+
+    :param drivers: The driver names to detect, e.g. `src.data.preprocessing.F1_names`.
+    :param aliases: Optional extra surface forms mapped to a driver, e.g. `src.data.preprocessing.Drivers_dict`.
+    '''
+
+    def __init__(self, drivers: Iterable[str], aliases: Mapping[str, str] | None = None) -> None:
+        self.drivers = tuple(drivers)
+        self._canonical = {driver: driver for driver in self.drivers}
+        self._canonical.update(aliases or {})
+
+        # The lookahead finds overlapping matches as well, so every driver that `driver in text` would find is found.
+        alternation = '|'.join(re.escape(form) for form in sorted(self._canonical, key=len, reverse=True))
+        self._pattern = re.compile(f'(?=({alternation}))')
+
+    def find(self, text: str) -> list[str]:
+        ''':return: The mentioned drivers, in the order of `drivers`.'''
+        mentioned = {self._canonical[match.group(1)] for match in self._pattern.finditer(text)}
+        return [driver for driver in self.drivers if driver in mentioned]
+
+    def find_many(self, texts: Iterable[str]) -> list[list[str]]:
+        return [self.find(text) for text in texts]
+
+class AbsaEngine:
+    '''Loads an ABSA model once and scores (text, aspect) pairs in batches.
+
+    :param batch_size: Number of pairs per forward pass. Pairs are sorted by length before batching.
+    :param inference_cache: If given, pairs that this model revision has scored before are not run again, see
+        `src.models.inference_cache`.
+    :param tokenizer: An already loaded tokenizer and model, see `from_registry`. If None, load `model_name`.
+    '''
+
+    def __init__(
+        self,
+        model_name: str = ABSA_MODEL,
+        device: torch.device | None = None,
+        batch_size: int = 32,
+        revision: str = 'main',
+        inference_cache: InferenceCache | None = None,
+        tokenizer: Any | None = None,
+        model: Any | None = None,
+    ) -> None:
+        self.device = device if device is not None else torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+        self.batch_size = batch_size
+        self.model_name = model_name
+        self.inference_cache = inference_cache
+
+        if tokenizer is None or model is None:
+            tokenizer = AutoTokenizer.from_pretrained(model_name, revision=revision)
+            model = AutoModelForSequenceClassification.from_pretrained(model_name, revision=revision)
+            # The commit hash pins the exact weights when the model was resolved through the Hugging Face Hub.
+            revision = getattr(model.config, '_commit_hash', None) or revision
+
+        self.tokenizer = tokenizer
+        self.model = model
+        self.model.to(self.device)
+        self.model.eval()
+        self.revision = revision
+
+    @classmethod
+    def from_registry(
+        cls,
+        name: str = 'deberta-absa',
+        variant: 'model_registry.ModelVariant' = 'default',
+        offline: bool = False,
+        **kwargs: Any,
+    ) -> 'AbsaEngine':
+        '''Use the shared instance of a model in `config.model_registry`, e.g. its 'int8' or 'onnx' variant on CPU.'''
+        loaded_model = model_registry.load(name, variant, offline)
+        return cls(
+            model_name=model_registry.MODEL_SPECS[name].source,
+            revision=loaded_model.revision,
+            tokenizer=loaded_model.tokenizer,
+            model=loaded_model.model,
+            **kwargs,
+        )
+
+    def _predict_uncached(self, texts: Sequence[str], aspects: Sequence[str]) -> np.ndarray:
+        probabilities = np.empty((len(texts), 3), dtype=np.float32)
+        order = sorted(range(len(texts)), key=lambda index: len(texts[index]) + len(aspects[index]))
+
+        for start in range(0, len(order), self.batch_size):
+            batch_indices = order[start:start + self.batch_size]
+            inputs = self.tokenizer(
+                [texts[index] for index in batch_indices],
+                [aspects[index] for index in batch_indices],
+                return_tensors='pt',
+                truncation=True,
+                padding=True,
+            ).to(self.device)
+
+            with torch.inference_mode():
+                logits = self.model(**inputs).logits
+
+            probabilities[batch_indices] = torch.softmax(logits.float(), dim=1).cpu().numpy()
+
+        return probabilities
+
+    def predict(self, texts: Sequence[str], aspects: Sequence[str]) -> np.ndarray:
+        ''':return: Array of shape (len(texts), 3) with the negative, neutral and positive probability of each pair.'''
+        caches = (self.inference_cache,) if self.inference_cache is not None else ()
+        with stage('AbsaEngine.predict', len(texts), caches):
+            return self._predict(texts, aspects)
+
+    def _predict(self, texts: Sequence[str], aspects: Sequence[str]) -> np.ndarray:
+        if self.inference_cache is None:
+            return self._predict_uncached(texts, aspects)
+
+        keys = [
+            InferenceCache.make_key(self.model_name, self.revision, text, aspect=aspect)
+            for text, aspect in zip(texts, aspects)
+        ]
+        cached = self.inference_cache.get_many(keys)
+        missing = [index for index, key in enumerate(keys) if key not in cached]
+
+        if missing:
+            computed = self._predict_uncached([texts[index] for index in missing], [aspects[index] for index in missing])
+            self.inference_cache.put_many({keys[index]: row.tolist() for index, row in zip(missing, computed)})
+            cached.update((keys[index], row) for index, row in zip(missing, computed))
+
+        return np.array([cached[key] for key in keys], dtype=np.float32).reshape(-1, 3)
+
+def _driver_sentiment_sums(
+    engine: AbsaEngine,
+    detector: DriverMentionDetector,
+    comments: Sequence[str],
+    scores: Sequence[float],
+) -> tuple[np.ndarray, np.ndarray]:
+    ''':return: Per driver of `detector.drivers`, the weighted sums of the negative, neutral and positive
+        probabilities, and the total weight.
+    '''
+    pair_comments: list[int] = []
+    pair_drivers: list[int] = []
+    driver_indices = {driver: index for index, driver in enumerate(detector.drivers)}
+
+    for comment_index, mentioned_drivers in enumerate(detector.find_many(comments)):
+        for driver in mentioned_drivers:
+            pair_comments.append(comment_index)
+            pair_drivers.append(driver_indices[driver])
+
+    probabilities = engine.predict(
+        [comments[index] for index in pair_comments],
+        [detector.drivers[index] for index in pair_drivers],
+    ).astype(np.float64)
+    weights = np.asarray(scores, dtype=np.float64)[np.asarray(pair_comments, dtype=np.intp)]
+    pair_driver_indices = np.asarray(pair_drivers, dtype=np.intp)
+
+    driver_count = len(detector.drivers)
+    counts = np.bincount(pair_driver_indices, weights=weights, minlength=driver_count).astype(np.float64)
+    sums = np.stack([
+        np.bincount(pair_driver_indices, weights=probabilities[:, label] * weights, minlength=driver_count)
+        for label in range(3)
+    ], axis=1).astype(np.float64)
+    return sums, counts
+
+def _driver_sentiments(drivers: Sequence[str], sums: np.ndarray, counts: np.ndarray) -> dict[str, DriverSentiment]:
+    means = np.divide(sums, counts[:, np.newaxis], out=sums.copy(), where=counts[:, np.newaxis] > 0)
+
+    return {
+        driver: {
+            'positive': float(means[index, 2]),
+            'neutral': float(means[index, 1]),
+            'negative': float(means[index, 0]),
+            'count': float(counts[index]),
+        }
+        for index, driver in enumerate(drivers)
+    }
+
+def driver_sentiment(
+    engine: AbsaEngine,
+    detector: DriverMentionDetector,
+    comments: Sequence[str],
+    scores: Sequence[float],
+) -> dict[str, DriverSentiment]:
+    '''Score-weighted sentiment towards each driver, over every (comment, mentioned driver) pair.
+
+    :param scores: Weight of each comment, e.g. its votes.
+    :return: Per driver of `detector.drivers`, the weighted mean 'positive', 'neutral' and 'negative' probability
+        and the total weight 'count', i.e. the structure that `final_scores` in research question 2 consumes.
+        Drivers with a total weight <= 0 keep unnormalized sums.
+    '''
+    return _driver_sentiments(detector.drivers, *_driver_sentiment_sums(engine, detector, comments, scores))
+
+_SENTIMENT_SUM_COLUMNS = ('negative', 'neutral', 'positive')
+
+def _driver_sentiment_sums_partition(
+    posts_df: pd.DataFrame,
+    engine_factory: Callable[[], AbsaEngine],
+    detector: DriverMentionDetector,
+    text_column: str,
+    score_column: str,
+) -> pd.DataFrame:
+    sums, counts = _driver_sentiment_sums(
+        worker_local(engine_factory), detector, posts_df[text_column].tolist(), posts_df[score_column].to_numpy(),
+    )
+    return pd.DataFrame({
+        'driver': list(detector.drivers),
+        **{column: sums[:, label] for label, column in enumerate(_SENTIMENT_SUM_COLUMNS)},
+        'count': counts,
+    })
+
+def driver_sentiment_ddf(
+    posts_ddf: 'dd.DataFrame',
+    engine_factory: Callable[[], AbsaEngine],
+    detector: DriverMentionDetector,
+    text_column: str = 'text',
+    score_column: str = 'score',
+    scheduler: str = 'processes',
+    num_workers: int | None = None,
+) -> dict[str, DriverSentiment]:
+    '''Out-of-core `driver_sentiment`: every partition of the posts is scored in the worker that loads it, e.g. from
+    `src.data.preprocessing.concatenate_submissions_and_comments_ddf`. Only the per driver sums are materialized.
+
+    :param engine_factory: Creates the engine once per worker process, e.g. `AbsaEngine.from_registry`, see
+        `src.utils.worker_local`.
+    :return: As `driver_sentiment`, up to floating point summation order.
+    '''
+    meta = pd.DataFrame({
+        'driver': pd.Series(dtype=object),
+        **{column: pd.Series(dtype=np.float64) for column in (*_SENTIMENT_SUM_COLUMNS, 'count')},
+    })
+    sums_df = posts_ddf.map_partitions(
+        _driver_sentiment_sums_partition, engine_factory, detector, text_column, score_column, meta=meta,
+    ).groupby('driver').sum().compute(scheduler=scheduler, num_workers=num_workers)
+    sums_df = sums_df.reindex(list(detector.drivers), fill_value=0.0)
+
+    return _driver_sentiments(
+        detector.drivers, sums_df[list(_SENTIMENT_SUM_COLUMNS)].to_numpy(), sums_df['count'].to_numpy(),
+    )
+
+def final_scores(results: Mapping[str, DriverSentiment]) -> list[tuple[str, float]]:
+    '''Rank the mentioned drivers by positive - negative sentiment, highest first.
+
+    :return: (title-cased driver name, score) tuples.
+    '''
+    ranking = [
+        (driver.title(), sentiment['positive'] - sentiment['negative'])
+        for driver, sentiment in results.items()
+        if sentiment['count'] > 0
+    ]
+    ranking.sort(key=lambda item: item[1], reverse=True)
+    return ranking
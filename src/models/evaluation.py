@@ -0,0 +1,224 @@
+'''Evaluation of sentiment models on the labeled validation sets.
+
+All label files are read into one frame and joined to the corpus through an id index, every model scores the
+labeled texts in one batch (only the texts it has not scored before, with an inference cache), and the metrics and
+confusion matrices of all models come from one `np.bincount`.
+'''
+
+from collections.abc import Callable, Mapping, Sequence
+from dataclasses import dataclass
+import ast
+from pathlib import Path
+from typing import TYPE_CHECKING
+import numpy as np
+import pandas as pd
+from config import config
+from src.data import compact
+from src.models.inference_cache import InferenceCache, cached_batch
+from src.utils import assert_columns_exist
+
+# Only the GPT comparison needs the ABSA model, so torch is not imported to evaluate other models.
+if TYPE_CHECKING:
+    from src.models.absa import AbsaEngine, DriverMentionDetector
+
+VALIDATION_LABELS_DIR = config.ROOT_DIR / 'validation_labels' / 'steward_decision_submissions'
+GPT_SENTIMENT_FILE = config.ROOT_DIR / 'validation_labels' / 'sentiment_analysis_output.csv'
+
+SENTIMENT_LABELS = ('Positive', 'Neutral', 'Negative')
+NEUTRAL_RANGE = (-0.05, 0.05)
+
+BatchScorer = Callable[[Sequence[str]], Sequence[float]]
+
+def load_validation_labels(labels_dir: Path = VALIDATION_LABELS_DIR) -> pd.DataFrame:
+    ''':return: The `comment_id`, `sentiment` and source `label_file` of every labeled comment of every file.'''
+    labels_dfs = [
+        pd.read_json(file, lines=True, dtype={'comment_id': str, 'sentiment': str}).assign(label_file=file.name)
+        for file in sorted(labels_dir.glob('*.ndjson'))
+    ]
+    labels_df = pd.concat(labels_dfs, ignore_index=True)
+    labels_df['sentiment'] = pd.Categorical(labels_df['sentiment'], categories=SENTIMENT_LABELS)
+    return labels_df
+
+def join_texts(labels_df: pd.DataFrame, comments_df: pd.DataFrame, text_column: str = 'body') -> pd.DataFrame:
+    '''Add the text of each labeled comment, looked up through an index on the comment ids.
+
+    :param comments_df: Comments with `id` and `text_column`, in the plain or the compact schema.
+    :raises ValueError: If a labeled comment is not in `comments_df`.
+    '''
+    assert_columns_exist({'id', text_column}, comments_df, 'comments')
+
+    comment_ids = labels_df['comment_id']
+    if pd.api.types.is_integer_dtype(comments_df['id']):
+        comment_ids = pd.Series(compact.decode_base36(comment_ids), index=labels_df.index)
+
+    texts = comments_df.set_index('id')[text_column]
+    positions = texts.index.get_indexer(comment_ids)
+    if (positions == -1).any():
+        missing = labels_df.loc[positions == -1, 'comment_id']
+        raise ValueError(f'{len(missing)} labeled comments are not in the comments, e.g. {missing.iloc[0]!r}.')
+
+    return labels_df.assign(**{text_column: texts.to_numpy()[positions]})
+
+def to_sentiment_category(scores: Sequence[float] | np.ndarray) -> pd.Categorical:
+    '''Scores >= 0.05 are positive, <= -0.05 negative and the rest neutral.
+
+    This is `to_sentiment_category` of research question 1 with its threshold bug fixed: the notebook compares with
+    `<= -neutral_range[0]`, i.e. <= 0.05, so it never returns Neutral. Confusion matrices computed with this function
+    therefore differ from the ones published in the notebook.
+    '''
+    scores = np.asarray(scores, dtype=np.float64)
+    codes = np.select(
+        (scores >= NEUTRAL_RANGE[1], scores <= NEUTRAL_RANGE[0]),
+        (SENTIMENT_LABELS.index('Positive'), SENTIMENT_LABELS.index('Negative')),
+        SENTIMENT_LABELS.index('Neutral'),
+    )
+    return pd.Categorical.from_codes(codes, categories=SENTIMENT_LABELS)
+
+def score_texts(
+    texts: Sequence[str],
+    scorers: Mapping[str, BatchScorer],
+    inference_cache: InferenceCache | None = None,
+    revisions: Mapping[str, str] | None = None,
+) -> pd.DataFrame:
+    '''Score the texts with every model, one batch per model.
+
+    :param scorers: Batch scorer per model name, e.g. a `TransformerSentimentScorer`. Scores are mapped to
+        categories with `to_sentiment_category`.
+    :param inference_cache: If given, each model only scores the texts it has not scored before, so adding a model
+        only costs its own inference.
+    :param revisions: Revision per model name for the cache keys, default 'main'.
+    :return: One column of scores per model.
+    '''
+    texts = list(texts)
+    revisions = revisions or {}
+    scores: dict[str, Sequence[float]] = {}
+
+    for name, scorer in scorers.items():
+        if inference_cache is None:
+            scores[name] = scorer(texts)
+        else:
+            scores[name] = cached_batch(inference_cache, texts, scorer, name, revisions.get(name, 'main'))
+
+    return pd.DataFrame(scores, dtype=np.float64)
+
+@dataclass(frozen=True)
+class EvaluationReport:
+    '''
+    :param metrics: Per model and label: precision, recall, f1 and support, as `sklearn.metrics` with
+        `labels=[label]` and `zero_division=0`.
+    :param accuracy: Per model.
+    :param confusion_matrices: [model, true label, predicted label] counts, in the order of `SENTIMENT_LABELS`.
+    '''
+
+    models: tuple[str, ...]
+    metrics: pd.DataFrame
+    accuracy: pd.Series
+    confusion_matrices: np.ndarray
+
+    def confusion_matrix(self, model: str) -> pd.DataFrame:
+        return pd.DataFrame(
+            self.confusion_matrices[self.models.index(model)],
+            index=pd.Index(SENTIMENT_LABELS, name='true'),
+            columns=pd.Index(SENTIMENT_LABELS, name='predicted'),
+        )
+
+def evaluate(
+    y_true: pd.Categorical | pd.Series,
+    predictions: Mapping[str, pd.Categorical | pd.Series],
+) -> EvaluationReport:
+    '''Metrics and confusion matrices of every model's predicted categories against the true categories.'''
+    label_count = len(SENTIMENT_LABELS)
+    models = tuple(predictions)
+    true_codes = pd.Categorical(y_true, categories=SENTIMENT_LABELS).codes.astype(np.int64)
+    predicted_codes = np.stack([
+        pd.Categorical(predictions[model], categories=SENTIMENT_LABELS).codes.astype(np.int64) for model in models
+    ]) if models else np.empty((0, len(true_codes)), dtype=np.int64)
+
+    if (true_codes < 0).any() or (predicted_codes < 0).any():
+        raise ValueError(f'Expected only the categories {SENTIMENT_LABELS}.')
+
+    # One bincount over (model, true, predicted) cells.
+    cells = np.arange(len(models))[:, None] * label_count ** 2 + true_codes * label_count + predicted_codes
+    confusion_matrices = np.bincount(cells.ravel(), minlength=len(models) * label_count ** 2).reshape(
+        len(models), label_count, label_count,
+    )
+
+    true_positives = np.diagonal(confusion_matrices, axis1=1, axis2=2).astype(np.float64)
+    support = confusion_matrices.sum(axis=2)
+    predicted = confusion_matrices.sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        precision = np.where(predicted > 0, true_positives / predicted, 0.0)
+        recall = np.where(support > 0, true_positives / support, 0.0)
+        f1 = np.where(precision + recall > 0, 2 * precision * recall / (precision + recall), 0.0)
+
+    metrics = pd.DataFrame({
+        'model': np.repeat(models, label_count),
+        'label': np.tile(SENTIMENT_LABELS, len(models)),
+        'precision': precision.ravel(),
+        'recall': recall.ravel(),
+        'f1': f1.ravel(),
+        'support': support.ravel(),
+    })
+    accuracy = pd.Series(true_positives.sum(axis=1) / max(len(true_codes), 1), index=pd.Index(models, name='model'))
+    return EvaluationReport(models, metrics, accuracy, confusion_matrices)
+
+def evaluate_scorers(
+    labeled_df: pd.DataFrame,
+    scorers: Mapping[str, BatchScorer],
+    inference_cache: InferenceCache | None = None,
+    revisions: Mapping[str, str] | None = None,
+    text_column: str = 'body',
+) -> EvaluationReport:
+    '''Score the texts of `join_texts` with every model and evaluate them against the `sentiment` labels.'''
+    scores_df = score_texts(labeled_df[text_column].tolist(), scorers, inference_cache, revisions)
+    return evaluate(labeled_df['sentiment'], {name: to_sentiment_category(scores_df[name]) for name in scorers})
+
+def load_gpt_sentiments(gpt_file: Path = GPT_SENTIMENT_FILE) -> pd.DataFrame:
+    ''':return: The `text` of each row of the GPT labels, and per (row, driver) the GPT `gpt_score`, positive -
+        negative, of each driver with a count > 0.
+    '''
+    gpt_df = pd.read_csv(gpt_file, usecols=['text', 'sentiments'])
+    sentiments = gpt_df['sentiments'].map(lambda value: ast.literal_eval(value) if isinstance(value, str) else {})
+
+    pairs = pd.DataFrame(
+        [
+            (row, driver, sentiment['positive'] - sentiment['negative'])
+            for row, driver_sentiments in enumerate(sentiments)
+            for driver, sentiment in driver_sentiments.items()
+            if sentiment['count'] > 0
+        ],
+        columns=['row', 'driver', 'gpt_score'],
+    )
+    return gpt_df[['text']].assign(row=np.arange(len(gpt_df))).merge(pairs, on='row', how='left')
+
+def compare_with_gpt(
+    engine: 'AbsaEngine',
+    detector: 'DriverMentionDetector',
+    gpt_file: Path = GPT_SENTIMENT_FILE,
+) -> pd.DataFrame:
+    '''Score every (row, mentioned driver) pair of the GPT labels in one ABSA batch, as research question 2 does with
+    `driver_sentiment` on each row alone.
+
+    :return: Per (row, driver) mentioned by either: `model_score` and `gpt_score` (positive - negative, 0 if that
+        side found no sentiment) and their absolute `error`. Its mean is the MAE.
+    '''
+    gpt_pairs = load_gpt_sentiments(gpt_file)
+    texts = gpt_pairs.drop_duplicates('row')['text'].fillna('').tolist()
+
+    pairs = [(row, driver) for row, mentioned in enumerate(detector.find_many(texts)) for driver in mentioned]
+    rows, drivers = zip(*pairs) if pairs else ((), ())
+    probabilities = (
+        engine.predict([texts[row] for row in rows], list(drivers)).astype(np.float64)
+        if pairs else np.empty((0, 3), dtype=np.float64)
+    )
+    model_pairs = pd.DataFrame({
+        'row': np.asarray(rows, dtype=np.int64),
+        'driver': list(drivers),
+        'model_score': probabilities[:, 2] - probabilities[:, 0],
+    })
+
+    gpt_pairs = gpt_pairs.dropna(subset=['driver']).drop(columns='text')
+    comparison = model_pairs.merge(gpt_pairs, on=['row', 'driver'], how='outer')
+    comparison[['model_score', 'gpt_score']] = comparison[['model_score', 'gpt_score']].fillna(0.0)
+    comparison['error'] = (comparison['model_score'] - comparison['gpt_score']).abs()
+    return comparison.sort_values(['row', 'driver'], ignore_index=True)
@@ -0,0 +1,191 @@
+'''Persistent, content-addressed cache of model inference results.
+
+Results are stored in SQLite under `INFERENCE_CACHE_PATH`, keyed on the model name, the model revision, the hash of
+the input text and any parameters that change the output (aspect, labels, threshold, ...). Re-running an analysis
+therefore only runs inference on inputs that have not been scored by the same model and parameters before.
+'''
+
+from collections.abc import Callable, Iterable, Mapping, Sequence
+from functools import cache
+from typing import Any, TypeVar
+import hashlib
+import json
+import sqlite3
+import time
+from pathlib import Path
+from config import config
+
+INFERENCE_CACHE_PATH = config.DATA_DIR / '.cache' / 'inference.sqlite3'
+DEFAULT_MAX_ENTRIES = 5_000_000
+
+# SQLite limits the number of parameters per statement.
+_SQLITE_BATCH_SIZE = 500
+
+_T = TypeVar('_T')
+
+def _batched(items: Sequence[_T], size: int = _SQLITE_BATCH_SIZE) -> Iterable[Sequence[_T]]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+class InferenceCache:
+    '''SQLite-backed key-value store with least-recently-used eviction and hit/miss counters.
+
+    :param max_entries: Maximum number of cached results. The least recently used results are evicted beyond it.
+    '''
+
+    def __init__(self, path: Path = INFERENCE_CACHE_PATH, max_entries: int = DEFAULT_MAX_ENTRIES) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        self._connection = sqlite3.connect(path)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute(
+            'CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, value TEXT NOT NULL, last_used INTEGER NOT NULL)'
+        )
+        self._connection.execute('CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used)')
+        self._connection.commit()
+        self._create_entry_count()
+
+    def _create_entry_count(self) -> None:
+        '''Keep the number of results in a one-row table, maintained by triggers, so that every connection to the file,
+        e.g. of the worker processes of a Dask scorer, sees the inserts of the others without a COUNT(*) scan.
+        '''
+        self._connection.execute('BEGIN IMMEDIATE')
+        try:
+            self._connection.execute('CREATE TABLE IF NOT EXISTS result_count (entries INTEGER NOT NULL)')
+            if self._connection.execute('SELECT COUNT(*) FROM result_count').fetchone()[0] == 0:
+                # Counted once, for files that were created before the count table.
+                self._connection.execute('INSERT INTO result_count (entries) SELECT COUNT(*) FROM results')
+            self._connection.execute(
+                'CREATE TRIGGER IF NOT EXISTS results_insert AFTER INSERT ON results '
+                'BEGIN UPDATE result_count SET entries = entries + 1; END'
+            )
+            self._connection.execute(
+                'CREATE TRIGGER IF NOT EXISTS results_delete AFTER DELETE ON results '
+                'BEGIN UPDATE result_count SET entries = entries - 1; END'
+            )
+        except BaseException:
+            self._connection.rollback()
+            raise
+
+        self._connection.commit()
+
+    @staticmethod
+    def make_key(model: str, revision: str, text: str, **params: Any) -> str:
+        '''Content address of one inference result.
+
+        :param params: Anything else that changes the result, e.g. `aspect='max verstappen'` or `threshold=0.45`.
+        '''
+        text_hash = hashlib.sha256(text.encode('utf-8')).hexdigest()
+        payload = json.dumps([model, revision, text_hash, params], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get_many(self, keys: Sequence[str]) -> dict[str, Any]:
+        ''':return: The cached results of the keys that are present. Updates the hit/miss counters.'''
+        found: dict[str, Any] = {}
+
+        for batch in _batched(list(dict.fromkeys(keys))):
+            placeholders = ','.join('?' * len(batch))
+            rows = self._connection.execute(f'SELECT key, value FROM results WHERE key IN ({placeholders})', batch)
+            found.update((key, json.loads(value)) for key, value in rows)
+
+        if found:
+            now = time.time_ns()
+            self._connection.executemany('UPDATE results SET last_used = ? WHERE key = ?', ((now, key) for key in found))
+            self._connection.commit()
+
+        hits = sum(key in found for key in keys)
+        self.hits += hits
+        self.misses += len(keys) - hits
+        return found
+
+    def put_many(self, results: Mapping[str, Any]) -> None:
+        '''Store JSON-serializable results and evict the least recently used ones beyond `max_entries`.'''
+        now = time.time_ns()
+        # An upsert rather than INSERT OR REPLACE, whose implicit delete would not fire the delete trigger.
+        self._connection.executemany(
+            'INSERT INTO results (key, value, last_used) VALUES (?, ?, ?) '
+            'ON CONFLICT (key) DO UPDATE SET value = excluded.value, last_used = excluded.last_used',
+            ((key, json.dumps(value), now) for key, value in results.items()),
+        )
+
+        # Read within the transaction of the insert, so it includes the inserts of other connections.
+        excess = len(self) - self.max_entries
+        if excess > 0:
+            self._connection.execute(
+                'DELETE FROM results WHERE key IN (SELECT key FROM results ORDER BY last_used LIMIT ?)',
+                (excess,),
+            )
+
+        self._connection.commit()
+
+    def __len__(self) -> int:
+        return self._connection.execute('SELECT entries FROM result_count').fetchone()[0]
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self) -> dict[str, Any]:
+        return {'hits': self.hits, 'misses': self.misses, 'hit_rate': self.hit_rate, 'entries': len(self)}
+
+    def clear(self) -> None:
+        self._connection.execute('DELETE FROM results')
+        self._connection.commit()
+
+    def close(self) -> None:
+        self._connection.close()
+
+@cache
+def get_inference_cache() -> InferenceCache:
+    '''The process-wide inference cache at `INFERENCE_CACHE_PATH`.'''
+    return InferenceCache()
+
+def cached_batch(
+    inference_cache: InferenceCache,
+    texts: Sequence[str],
+    compute: Callable[[Sequence[str]], Sequence[Any]],
+    model: str,
+    revision: str,
+    **params: Any,
+) -> list[Any]:
+    '''Look up the results of `texts` in the cache and only run `compute` on the unique texts that are missing.
+
+    :param compute: Batched inference, returning one JSON-serializable result per text.
+    :return: One result per text, in input order.
+    '''
+    keys = [InferenceCache.make_key(model, revision, text, **params) for text in texts]
+    results = inference_cache.get_many(keys)
+
+    missing = {key: text for key, text in zip(keys, texts) if key not in results}
+    if missing:
+        computed = dict(zip(missing, compute(list(missing.values()))))
+        inference_cache.put_many(computed)
+        results.update(computed)
+
+    return [results[key] for key in keys]
+
+def cached_scorer(
+    scorer: Callable[[Sequence[str]], Sequence[Any]],
+    model: str,
+    revision: str,
+    inference_cache: InferenceCache | None = None,
+    **params: Any,
+) -> Callable[[Sequence[str]], list[Any]]:
+    '''Put the inference cache in front of a batched scorer, e.g.
+
+    `cached_scorer(lambda texts: [vader_analyzer.polarity_scores(text)['compound'] for text in texts], 'vader', '3.3.2')`
+
+    :param inference_cache: If None, use `get_inference_cache()`.
+    '''
+    def scorer_with_cache(texts: Sequence[str]) -> list[Any]:
+        return cached_batch(
+            inference_cache if inference_cache is not None else get_inference_cache(),
+            texts, scorer, model, revision, **params,
+        )
+
+    return scorer_with_cache
@@ -0,0 +1,347 @@
+'''Sparse, array-backed n-gram language model for next-word (e.g. next team) prediction.
+
+Tokens are integer-encoded and the n-grams of every order are stored as sorted int64 keys with their counts, so
+memory grows with the number of distinct n-grams instead of with prefixes x vocabulary. Smoothed probabilities are
+computed on the fly, only for the words that a query asks for.
+'''
+
+from collections.abc import Iterable, Sequence
+from typing import Literal, TypeAlias
+import numpy as np
+from pathlib import Path
+
+SENTENCE_START = '<s>'
+SENTENCE_END = '</s>'
+UNKNOWN = '<unk>'
+
+SmoothingMethod: TypeAlias = Literal['mle', 'laplace', 'kneser_ney']
+
+# Absolute discount of the interpolated Kneser-Ney estimate.
+KNESER_NEY_DISCOUNT = 0.75
+
+def encode_sentences(
+    sentences: Iterable[Sequence[str]],
+    n: int,
+    vocabulary: dict[str, int],
+) -> tuple[np.ndarray, np.ndarray]:
+    '''Pad each sentence with n - 1 `SENTENCE_START` tokens and one `SENTENCE_END` token and integer-encode it.
+
+    :param vocabulary: Token -> id mapping, extended in place with new tokens.
+    :return: The concatenated token ids and, per token, the index of the sentence it belongs to.
+    '''
+    token_ids: list[int] = []
+    sentence_ids: list[int] = []
+
+    for sentence_id, sentence in enumerate(sentences):
+        padded = [SENTENCE_START] * (n - 1) + list(sentence) + [SENTENCE_END]
+        token_ids.extend(vocabulary.setdefault(token, len(vocabulary)) for token in padded)
+        sentence_ids.extend([sentence_id] * len(padded))
+
+    return np.array(token_ids, dtype=np.int64), np.array(sentence_ids, dtype=np.int64)
+
+def count_ngrams(token_ids: np.ndarray, sentence_ids: np.ndarray, order: int) -> tuple[np.ndarray, np.ndarray]:
+    ''':return: The distinct n-grams of `order` that lie within one sentence, as rows of token ids, and their counts.'''
+    if len(token_ids) < order:
+        return np.empty((0, order), dtype=np.int64), np.empty(0, dtype=np.int64)
+
+    windows = np.lib.stride_tricks.sliding_window_view(token_ids, order)
+    within_sentence = sentence_ids[:len(windows)] == sentence_ids[order - 1:]
+    ngrams, counts = np.unique(windows[within_sentence], axis=0, return_counts=True)
+    return ngrams, counts.astype(np.int64)
+
+def count_distinct_left_extensions(ngrams: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    ''':return: For each distinct suffix of the given (k + 1)-grams, i.e. each k-gram, the number of distinct tokens
+        that precede it.
+    '''
+    suffixes, counts = np.unique(ngrams[:, 1:], axis=0, return_counts=True)
+    return suffixes, counts.astype(np.int64)
+
+def _merge_rows(ngrams: np.ndarray, counts: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    ''':return: The distinct rows of `ngrams` with the summed counts of their duplicates.'''
+    if len(ngrams) == 0:
+        return ngrams, counts
+
+    distinct, inverse = np.unique(ngrams, axis=0, return_inverse=True)
+    return distinct, np.bincount(inverse.ravel(), weights=counts, minlength=len(distinct)).astype(np.int64)
+
+class NgramCounts:
+    '''Counts of the n-grams of orders 1..n over their own vocabulary.
+
+    Count tables of separate shards, e.g. one per week of comments or per subreddit, are combined with `merge`
+    without retokenizing the texts they were counted from.
+
+    :param vocabulary: The tokens, indexed by id.
+    :param ngrams: Per order 1..n, the distinct n-grams as rows of token ids.
+    :param counts: Per order 1..n, the count of each n-gram.
+    '''
+
+    def __init__(self, vocabulary: Sequence[str], ngrams: Sequence[np.ndarray], counts: Sequence[np.ndarray]) -> None:
+        self.n = len(ngrams)
+        self.vocabulary = list(vocabulary)
+        self.ngrams = list(ngrams)
+        self.counts = list(counts)
+
+    @classmethod
+    def from_sentences(cls, sentences: Iterable[Sequence[str]], n: int = 3) -> 'NgramCounts':
+        ''':param sentences: Tokenized sentences, e.g. lemmatized comments.'''
+        vocabulary: dict[str, int] = {}
+        token_ids, sentence_ids = encode_sentences(sentences, n, vocabulary)
+        ngrams, counts = zip(*(count_ngrams(token_ids, sentence_ids, order) for order in range(1, n + 1)))
+        return cls(list(vocabulary), ngrams, counts)
+
+    @property
+    def sentence_count(self) -> int:
+        ''':return: Number of counted sentences, i.e. occurrences of `SENTENCE_END`.'''
+        if SENTENCE_END not in self.vocabulary:
+            return 0
+
+        end_id = self.vocabulary.index(SENTENCE_END)
+        return int(self.counts[0][self.ngrams[0][:, 0] == end_id].sum())
+
+    def merge(self, *others: 'NgramCounts') -> 'NgramCounts':
+        ''':return: The summed counts of this and the other tables, over the union of their vocabularies.'''
+        if any(other.n != self.n for other in others):
+            raise ValueError(f'Cannot merge counts of different orders, expected n={self.n}.')
+
+        token_ids = {token: index for index, token in enumerate(self.vocabulary)}
+        ngrams = [[table] for table in self.ngrams]
+        counts = [[table] for table in self.counts]
+
+        for other in others:
+            remap = np.array([token_ids.setdefault(token, len(token_ids)) for token in other.vocabulary], dtype=np.int64)
+
+            for order in range(self.n):
+                ngrams[order].append(remap[other.ngrams[order]])
+                counts[order].append(other.counts[order])
+
+        merged = [_merge_rows(np.concatenate(ngrams[order]), np.concatenate(counts[order])) for order in range(self.n)]
+        return NgramCounts(list(token_ids), *zip(*merged))
+
+    def save(self, path: Path) -> None:
+        arrays = {f'ngrams_{order}': ngrams for order, ngrams in enumerate(self.ngrams, start=1)}
+        arrays.update({f'counts_{order}': counts for order, counts in enumerate(self.counts, start=1)})
+        np.savez_compressed(path, vocabulary=np.array(self.vocabulary, dtype=str), **arrays)
+
+    @classmethod
+    def load(cls, path: Path) -> 'NgramCounts':
+        with np.load(path) as npz:
+            n = sum(name.startswith('ngrams_') for name in npz.files)
+            return cls(
+                npz['vocabulary'].tolist(),
+                [npz[f'ngrams_{order}'] for order in range(1, n + 1)],
+                [npz[f'counts_{order}'] for order in range(1, n + 1)],
+            )
+
+class _NgramTable:
+    '''The n-grams of one order, encoded as mixed-radix int64 keys in sorted order.'''
+
+    def __init__(self, ngrams: np.ndarray, counts: np.ndarray, radix: int) -> None:
+        order = ngrams.shape[1]
+        weights = radix ** np.arange(order - 1, -1, -1, dtype=np.int64)
+        keys = ngrams.astype(np.int64) @ weights
+        sort_order = np.argsort(keys, kind='stable')
+
+        self.radix = radix
+        self.keys = keys[sort_order]
+        self.counts = counts[sort_order].astype(np.float64)
+
+    def continuation_range(self, prefix_key: int) -> slice:
+        '''The entries whose first order - 1 tokens encode to `prefix_key`.'''
+        start, stop = np.searchsorted(self.keys, (prefix_key * self.radix, (prefix_key + 1) * self.radix))
+        return slice(int(start), int(stop))
+
+    def lookup(self, prefix_key: int, word_ids: np.ndarray) -> np.ndarray:
+        ''':return: The count of each (prefix, word) n-gram, 0 if it does not occur.'''
+        if len(self.keys) == 0:
+            return np.zeros(len(word_ids))
+
+        keys = prefix_key * self.radix + word_ids
+        positions = np.minimum(np.searchsorted(self.keys, keys), len(self.keys) - 1)
+        return np.where(self.keys[positions] == keys, self.counts[positions], 0.0)
+
+class NgramModel:
+    '''n-gram language model over integer-encoded tokens.
+
+    Supports maximum likelihood ('mle'), add-one ('laplace', like `train_trigram_model_with_smoothing` in research
+    question 3) and interpolated Kneser-Ney ('kneser_ney') estimates. Sentences are padded with n - 1 start tokens,
+    whereas `train_ngram_model` of research question 3 pads with one, so 'mle' only agrees with it on the prefixes
+    that do not repeat the start token.
+
+    :param counts: The n-gram counts to estimate from.
+    '''
+
+    def __init__(self, counts: NgramCounts) -> None:
+        self.n = counts.n
+        self.vocabulary = counts.vocabulary
+        self.token_ids = {token: index for index, token in enumerate(self.vocabulary)}
+        self.ngrams = counts.ngrams
+        self.counts = counts.counts
+        self.ngram_counts = counts
+
+        radix = max(len(self.vocabulary), 1)
+        if radix ** self.n >= 2 ** 63:
+            raise ValueError(f'A vocabulary of {radix} tokens is too large to encode {self.n}-grams as int64 keys.')
+
+        # _tables[k - 1] holds the k-grams with their raw counts.
+        self._tables = [_NgramTable(ngrams_, counts_, radix) for ngrams_, counts_ in zip(self.ngrams, self.counts)]
+
+        # _continuation_tables[k - 1] holds, for k < n, the number of distinct words that precede each k-gram.
+        self._continuation_tables = [
+            _NgramTable(*count_distinct_left_extensions(self.ngrams[order]), radix)
+            for order in range(1, self.n)
+        ]
+
+    @classmethod
+    def fit(cls, sentences: Iterable[Sequence[str]], n: int = 3) -> 'NgramModel':
+        ''':param sentences: Tokenized sentences, e.g. lemmatized comments.'''
+        return cls(NgramCounts.from_sentences(sentences, n))
+
+    @property
+    def vocabulary_size(self) -> int:
+        return len(self.vocabulary)
+
+    def _encode_context(self, context: Sequence[str]) -> np.ndarray | None:
+        ''':return: The ids of the context tokens, or None if any of them is out of vocabulary.'''
+        ids = [self.token_ids.get(token) for token in context]
+        return None if None in ids else np.array(ids, dtype=np.int64)
+
+    def _prefix_key(self, prefix_ids: np.ndarray) -> int:
+        key = 0
+        for token_id in prefix_ids:
+            key = key * self.vocabulary_size + int(token_id)
+        return key
+
+    def _context(self, prefix: Sequence[str] | str) -> list[str]:
+        tokens = prefix.lower().split() if isinstance(prefix, str) else list(prefix)
+        return tokens[len(tokens) - (self.n - 1):] if self.n > 1 else []
+
+    def context_count(self, prefix: Sequence[str] | str) -> float:
+        ''':return: How often the last n - 1 tokens of `prefix` occur followed by any word.'''
+        context = self._context(prefix)
+        prefix_ids = self._encode_context(context)
+
+        if prefix_ids is None or len(context) < self.n - 1:
+            return 0.0
+
+        table = self._tables[self.n - 1]
+        return float(table.counts[table.continuation_range(self._prefix_key(prefix_ids))].sum())
+
+    def _encode_tokens(self, context: Sequence[str]) -> list[int | None]:
+        ''':return: The id of each context token, None for out-of-vocabulary ones.'''
+        return [self.token_ids.get(token) for token in context]
+
+    def _kneser_ney(self, context_ids: Sequence[int | None], word_ids: np.ndarray, order: int) -> np.ndarray:
+        '''The estimate of `order` given the last order - 1 context tokens. Where those are too few or include an
+        out-of-vocabulary token, the estimate backs off to the next lower order, whose context is one token shorter.
+        '''
+        if order == 1:
+            table = self._continuation_tables[0] if self.n > 1 else self._tables[0]
+            counts = table.lookup(0, word_ids)
+            total = table.counts.sum()
+            uniform = 1 / self.vocabulary_size
+            seen = len(table.keys)
+            return np.maximum(counts - KNESER_NEY_DISCOUNT, 0) / total + KNESER_NEY_DISCOUNT * seen / total * uniform
+
+        lower = self._kneser_ney(context_ids, word_ids, order - 1)
+
+        order_context = context_ids[len(context_ids) - (order - 1):]
+        if len(context_ids) < order - 1 or None in order_context:
+            return lower
+
+        # The highest order uses raw counts, the lower orders the number of distinct words preceding the n-gram.
+        table = self._tables[order - 1] if order == self.n else self._continuation_tables[order - 1]
+        prefix_key = self._prefix_key(np.array(order_context, dtype=np.int64))
+        continuations = table.continuation_range(prefix_key)
+        total = table.counts[continuations].sum()
+
+        if total == 0:
+            return lower
+
+        distinct = continuations.stop - continuations.start
+        counts = table.lookup(prefix_key, word_ids)
+        return np.maximum(counts - KNESER_NEY_DISCOUNT, 0) / total + KNESER_NEY_DISCOUNT * distinct / total * lower
+
+    def probabilities(
+        self,
+        prefix: Sequence[str] | str,
+        candidates: Sequence[str] | None = None,
+        method: SmoothingMethod = 'mle',
+    ) -> tuple[list[str], np.ndarray]:
+        '''Probability of each candidate word following the last n - 1 tokens of `prefix`.
+
+        :param prefix: Tokens, or a text that is lowercased and split on whitespace.
+        :param candidates: Words to score. If None, score the whole vocabulary. Out-of-vocabulary candidates are skipped.
+        :return: The scored words and their probabilities.
+        '''
+        words = self.vocabulary if candidates is None else [word for word in candidates if word in self.token_ids]
+        word_ids = np.array([self.token_ids[word] for word in words], dtype=np.int64)
+        context = self._context(prefix)
+
+        if method == 'kneser_ney':
+            return words, self._kneser_ney(self._encode_tokens(context), word_ids, self.n)
+
+        context_ids = self._encode_context(context) if len(context) == self.n - 1 else None
+
+        table = self._tables[self.n - 1]
+        if context_ids is None:
+            counts, total = np.zeros(len(word_ids)), 0.0
+        else:
+            prefix_key = self._prefix_key(context_ids)
+            counts = table.lookup(prefix_key, word_ids)
+            total = float(table.counts[table.continuation_range(prefix_key)].sum())
+
+        if method == 'laplace':
+            return words, (counts + 1) / (total + self.vocabulary_size)
+
+        if method == 'mle':
+            return words, counts / total if total > 0 else np.zeros(len(word_ids))
+
+        raise ValueError(f"Expected `method` to be 'mle', 'laplace' or 'kneser_ney', got {method!r}.")
+
+    def top_k(
+        self,
+        prefix: Sequence[str] | str,
+        k: int = 5,
+        candidates: Sequence[str] | None = None,
+        method: SmoothingMethod = 'mle',
+    ) -> list[tuple[str, float]]:
+        '''The k most probable next words, highest first, selected with `np.argpartition` instead of a full sort.
+
+        With 'mle', only words that were seen after the prefix are returned.
+        '''
+        words, probabilities = self.probabilities(prefix, candidates, method)
+
+        if method == 'mle':
+            seen = np.flatnonzero(probabilities > 0)
+        else:
+            seen = np.arange(len(words))
+
+        k = min(k, len(seen))
+        if k == 0:
+            return []
+
+        top = seen[np.argpartition(-probabilities[seen], k - 1)[:k]]
+        top = top[np.argsort(-probabilities[top], kind='stable')]
+        return [(words[index], float(probabilities[index])) for index in top]
+
+    def predict_next(
+        self,
+        prefix: Sequence[str] | str,
+        candidates: Sequence[str] | None = None,
+        method: SmoothingMethod = 'mle',
+    ) -> str:
+        '''The most probable next word, restricted to `candidates` if given, e.g. the team names as in
+        `predict_next_team`. Returns `UNKNOWN` if the prefix was never seen or, with 'mle', no candidate follows it.
+        '''
+        if self.context_count(prefix) == 0:
+            return UNKNOWN
+
+        top = self.top_k(prefix, 1, candidates, method)
+        return top[0][0] if top else UNKNOWN
+
+    def save(self, path: Path) -> None:
+        self.ngram_counts.save(path)
+
+    @classmethod
+    def load(cls, path: Path) -> 'NgramModel':
+        return cls(NgramCounts.load(path))
@@ -0,0 +1,187 @@
+'''Race result prediction from sentiment and recent results, vectorized over drivers x events.
+
+The `prediction` function of research question 2 per event, as matrices: the historical score of a driver at event
+e is the mean over the previous `n_events` races of 1 - 2 * (position - 1) / 19 (a missing race counts as 0). The
+combined score blends it with the driver's sentiment score, if any, and the drivers are ranked by it. A whole grid
+of `n_events` x `historical_score_contribution` settings is evaluated in one pass.
+'''
+
+from collections.abc import Mapping, Sequence
+from dataclasses import dataclass
+import numpy as np
+import pandas as pd
+from src.data.race_results import SeasonResults
+from src.instrumentation import instrumented
+
+@dataclass(frozen=True)
+class SeasonMatrices:
+    '''Finishing positions of a season as a drivers x events matrix.
+
+    :param drivers: Full names of the drivers, indexing the rows.
+    :param positions: Finishing position of each driver at each event, NaN if the driver has no result.
+    '''
+
+    drivers: tuple[str, ...]
+    positions: np.ndarray
+
+    @classmethod
+    def from_season_results(cls, season_results: SeasonResults) -> 'SeasonMatrices':
+        results_df = season_results.results_df
+        driver_codes, drivers = pd.factorize(results_df['FullName'])
+        positions = np.full((len(drivers), len(season_results)), np.nan)
+        positions[driver_codes, results_df['event_index'].to_numpy()] = results_df['Position'].to_numpy()
+        return cls(tuple(drivers), positions)
+
+    @property
+    def event_count(self) -> int:
+        return self.positions.shape[1]
+
+    def sentiment_matrix(self, scores_by_event: Mapping[int, Sequence[tuple[str, float]]]) -> np.ndarray:
+        '''Drivers x events matrix of sentiment scores, NaN where a driver has none.
+
+        :param scores_by_event: Per event index, the (driver name, score) tuples of `src.models.absa.final_scores`.
+            Drivers without results in the season are ignored.
+        '''
+        driver_rows = {driver: row for row, driver in enumerate(self.drivers)}
+        sentiment = np.full(self.positions.shape, np.nan)
+
+        for event_index, scores in scores_by_event.items():
+            for driver, score in scores:
+                if driver in driver_rows:
+                    sentiment[driver_rows[driver], event_index] = score
+
+        return sentiment
+
+def position_scores(positions: np.ndarray) -> np.ndarray:
+    ''':return: 1 for first place down to -1 for twentieth, 0 for a missing result.'''
+    return np.nan_to_num(1 - ((positions - 1) / 19) * 2, nan=0.0)
+
+def _trailing_sums(values: np.ndarray, window: int) -> np.ndarray:
+    ''':return: Per event e, the sum of `values` over events e - 1 down to e - window, along the last axis.
+
+    Summed most recent event first, like research question 2, rather than as a difference of cumulative sums, so
+    equal scores stay exactly equal and ties rank the same.
+    '''
+    sums = np.zeros(values.shape)
+    for shift in range(1, min(window, values.shape[-1]) + 1):
+        sums[..., shift:] += values[..., :-shift]
+    return sums
+
+def historical_scores(positions: np.ndarray, n_events: int) -> tuple[np.ndarray, np.ndarray]:
+    '''The historical score of each driver at each event, and whether the driver is ranked at that event: i.e. has a
+    result at the event itself or at one of the previous `n_events` events.
+    '''
+    has_result = ~np.isnan(positions)
+    scores = _trailing_sums(position_scores(positions), n_events) / n_events
+    ranked = has_result | (_trailing_sums(has_result.astype(np.float64), n_events) > 0)
+    return scores, ranked
+
+@dataclass(frozen=True)
+class PredictionGrid:
+    '''Predictions for every (`n_events`, `historical_score_contribution`) setting.
+
+    Arrays are indexed [n_events, contribution, driver, event], or [n_events, contribution, event] for `mae`.
+    Predicted positions are NaN for drivers that are not ranked at an event.
+    '''
+
+    drivers: tuple[str, ...]
+    n_events: tuple[int, ...]
+    contributions: tuple[float, ...]
+    true_positions: np.ndarray
+    sentiment_scores: np.ndarray
+    historical_scores: np.ndarray
+    combined_scores: np.ndarray
+    predicted_positions: np.ndarray
+    mae: np.ndarray
+
+    def mae_frame(self, event_indices: Sequence[int] | None = None) -> pd.DataFrame:
+        ''':return: The MAE per setting and event, in long format, to e.g. group by setting.'''
+        event_indices = range(self.mae.shape[-1]) if event_indices is None else event_indices
+        index = pd.MultiIndex.from_product(
+            (self.n_events, self.contributions, event_indices),
+            names=('n_events', 'historical_score_contribution', 'event_index'),
+        )
+        return pd.DataFrame({'mae': self.mae[:, :, event_indices].ravel()}, index=index).reset_index()
+
+    def prediction_frame(
+        self,
+        event_index: int,
+        n_events: int = 5,
+        historical_score_contribution: float = 0.4,
+    ) -> pd.DataFrame:
+        '''The `prediction_df` of research question 2 for one event and setting.'''
+        setting = (self.n_events.index(n_events), self.contributions.index(historical_score_contribution))
+        predicted = self.predicted_positions[setting][:, event_index]
+        rows = np.flatnonzero(~np.isnan(predicted))
+        rows = rows[np.argsort(predicted[rows], kind='stable')]
+        true_positions = self.true_positions[rows, event_index]
+
+        return pd.DataFrame({
+            'driver_name': [self.drivers[row] for row in rows],
+            'predicted_position': predicted[rows].astype(np.int64),
+            'true_position': true_positions,
+            'error': np.abs(predicted[rows] - true_positions),
+            'combined_score': self.combined_scores[setting][rows, event_index],
+            'sentiment_score': self.sentiment_scores[rows, event_index],
+            'historical_score': self.historical_scores[setting[0]][rows, event_index],
+        })
+
+@instrumented(count=lambda grid: grid.mae.size)
+def predict_grid(
+    season_matrices: SeasonMatrices,
+    sentiment: np.ndarray,
+    n_events: Sequence[int] = (5,),
+    historical_score_contributions: Sequence[float] = (0.4,),
+) -> PredictionGrid:
+    '''Rank the drivers at every event for every setting and compute the MAE against the true positions.
+
+    Ties in the combined score are broken by true position, then by driver order.
+
+    :param sentiment: Drivers x events sentiment scores, NaN where a driver has none, see
+        `SeasonMatrices.sentiment_matrix`.
+    '''
+    positions = season_matrices.positions
+    driver_count, event_count = positions.shape
+    contributions = np.asarray(historical_score_contributions, dtype=np.float64)[:, None, None]
+
+    historical, ranked = zip(*(historical_scores(positions, window) for window in n_events))
+    historical = np.stack(historical)[:, None]
+    ranked = np.stack(ranked)[:, None]
+
+    # [n_events, contribution, driver, event]
+    combined = np.where(
+        np.isnan(sentiment),
+        historical,
+        (1 - contributions) * sentiment + contributions * historical,
+    )
+    combined = np.broadcast_to(combined, (len(n_events), len(contributions), driver_count, event_count))
+    sort_keys = np.where(ranked, -combined, np.inf)
+
+    # Sort the drivers of each event, i.e. along a last axis of drivers.
+    sorted_shape = sort_keys.shape[:2] + (event_count, driver_count)
+    tie_breakers = np.broadcast_to(np.nan_to_num(positions, nan=np.inf).T, sorted_shape)
+    driver_order = np.broadcast_to(np.arange(driver_count), tie_breakers.shape)
+    order = np.lexsort((driver_order, tie_breakers, np.swapaxes(sort_keys, -1, -2)))
+
+    predicted = np.empty(order.shape)
+    np.put_along_axis(predicted, order, np.arange(1, driver_count + 1, dtype=np.float64), axis=-1)
+    predicted = np.swapaxes(predicted, -1, -2)
+    predicted = np.where(ranked, predicted, np.nan)
+
+    errors = np.abs(predicted - positions)
+    has_result = ~np.isnan(positions)
+    error_counts = has_result.sum(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mae = np.where(has_result, errors, 0).sum(axis=-2) / error_counts
+
+    return PredictionGrid(
+        drivers=season_matrices.drivers,
+        n_events=tuple(n_events),
+        contributions=tuple(historical_score_contributions),
+        true_positions=positions,
+        sentiment_scores=sentiment,
+        historical_scores=historical[:, 0],
+        combined_scores=np.array(combined),
+        predicted_positions=predicted,
+        mae=mae,
+    )
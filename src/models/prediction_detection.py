@@ -0,0 +1,218 @@
+'''Detection of posts that predict race results, with GLiNER entity recognition.
+
+`has_prediction` of research question 2 as a batched stage: a keyword regex first skips posts that cannot state a
+position, long posts are split into overlapping word-bounded chunks instead of being truncated by GLiNER, and the
+chunks of many posts are run through GLiNER's batch API together.
+'''
+
+from collections.abc import Sequence
+from dataclasses import dataclass
+import re
+import time
+from typing import TYPE_CHECKING, Any
+import numpy as np
+import pandas as pd
+from config import model_registry
+from src.instrumentation import instrumented
+from src.models.inference_cache import InferenceCache, cached_batch
+
+GLINER_MODEL = model_registry.MODEL_SPECS['gliner'].source
+PREDICTION_LABELS = ('driver', 'position')
+
+# Words that a prediction of a position has to contain in some form, e.g. 'P1', 'podium', 'finish 7th', 'top 3'.
+PREDICTION_KEYWORD_PATTERN = re.compile(
+    r'\b(?:'
+    r'p\d{1,2}|\d{1,2}(?:st|nd|rd|th)|top\s*\d{1,2}|\d\s*-\s*\d|'
+    r'first|second|third|fourth|fifth|sixth|seventh|eighth|ninth|tenth|last|'
+    r'positions?|finish\w*|podiums?|win\w*|pole|points?|dnf|behind|ahead|beat\w*'
+    r')\b',
+    re.IGNORECASE,
+)
+
+# GLiNER's default word splitter, so chunk boundaries fall on the words that GLiNER counts.
+_WORD_PATTERN = re.compile(r'\w+(?:[-_]\w+)*|\S')
+
+# torch is only imported to run GLiNER, so the chunking and the keyword prefilter work without it.
+if TYPE_CHECKING:
+    import torch
+
+Entity = dict[str, Any]
+
+@dataclass(frozen=True)
+class DetectionReport:
+    posts: int
+    candidate_posts: int
+    chunks: int
+    seconds: float
+
+    @property
+    def posts_per_second(self) -> float:
+        return self.posts / self.seconds if self.seconds > 0 else float('inf')
+
+    def __str__(self) -> str:
+        return (
+            f'{self.posts} posts ({self.candidate_posts} after keyword prefilter, {self.chunks} chunks) in '
+            f'{self.seconds:.2f} s: {self.posts_per_second:.1f} posts/s'
+        )
+
+def _check_chunk_size(max_words: int, overlap_words: int) -> None:
+    if max_words <= 0:
+        raise ValueError(f'max_words has to be positive, not {max_words}.')
+    if not 0 <= overlap_words < max_words:
+        raise ValueError(
+            f'overlap_words has to be at least 0 and less than max_words ({max_words}), not {overlap_words}, or '
+            f'consecutive chunks would not advance.'
+        )
+
+def chunk_spans(text: str, max_words: int, overlap_words: int) -> list[tuple[int, int]]:
+    ''':return: The (start, end) character offsets of chunks of at most `max_words` words, where consecutive chunks
+        share `overlap_words` words.
+    :raises ValueError: If `max_words` is not positive, or `overlap_words` is not less than it.
+    '''
+    _check_chunk_size(max_words, overlap_words)
+    words = [match.span() for match in _WORD_PATTERN.finditer(text)]
+
+    if len(words) <= max_words:
+        return [(0, len(text))]
+
+    step = max_words - overlap_words
+    return [
+        (words[start][0], words[min(start + max_words, len(words)) - 1][1])
+        for start in range(0, max(len(words) - overlap_words, 1), step)
+    ]
+
+class PredictionDetector:
+    '''Finds the posts that GLiNER tags with a 'position' entity.
+
+    :param threshold: Minimum entity score, 0.45 as in research question 2.
+    :param batch_size: Number of chunks per GLiNER forward pass. Chunks are sorted by length before batching.
+    :param num_threads: Number of intra-op threads torch may use on CPU. If None, keep torch's default.
+    :param max_words: Maximum number of words per chunk. If None, GLiNER's maximum input length.
+    :param overlap_words: Number of words that consecutive chunks of a post share, so entities on a chunk boundary
+        are still seen whole. Has to be less than `max_words`.
+    :param keyword_pattern: Posts without a match are not run through GLiNER. If None, run every post.
+    :param revision: Revision of `model_name`, or of `model` if given. Loading the default model through
+        `config.model_registry` uses the registry's revision instead.
+    :param inference_cache: If given, chunks that this model revision has tagged before with the same labels and
+        threshold are not run again, see `src.models.inference_cache`.
+    :param model: An already loaded GLiNER model. If None, load `model_name`, through `config.model_registry` if it is
+        the default model.
+    '''
+
+    def __init__(
+        self,
+        model_name: str = GLINER_MODEL,
+        labels: Sequence[str] = PREDICTION_LABELS,
+        threshold: float = 0.45,
+        device: 'torch.device | None' = None,
+        batch_size: int = 8,
+        num_threads: int | None = None,
+        max_words: int | None = None,
+        overlap_words: int = 32,
+        keyword_pattern: re.Pattern[str] | None = PREDICTION_KEYWORD_PATTERN,
+        revision: str = 'main',
+        inference_cache: InferenceCache | None = None,
+        model: Any | None = None,
+    ) -> None:
+        if max_words is not None:
+            _check_chunk_size(max_words, overlap_words)
+
+        import torch
+
+        if num_threads is not None:
+            torch.set_num_threads(num_threads)
+
+        if model is None and model_name == GLINER_MODEL:
+            loaded_model = model_registry.load('gliner')
+            model = loaded_model.model
+            revision = loaded_model.revision
+        elif model is None:
+            from gliner import GLiNER
+
+            model = GLiNER.from_pretrained(model_name, revision=revision)
+
+        self.device = device if device is not None else torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+        self.model = model
+        self.model.to(self.device)
+        self.model.eval()
+        self.model_name = model_name
+        self.revision = revision
+        self.inference_cache = inference_cache
+
+        self.labels = tuple(labels)
+        self.threshold = threshold
+        self.batch_size = batch_size
+        self.max_words = max_words if max_words is not None else getattr(self.model.config, 'max_len', 384)
+        self.overlap_words = overlap_words
+        _check_chunk_size(self.max_words, self.overlap_words)
+        self.keyword_pattern = keyword_pattern
+        self.last_report: DetectionReport | None = None
+
+    def _predict_chunks(self, chunks: Sequence[str]) -> list[list[Entity]]:
+        if self.inference_cache is None:
+            return self._predict_chunks_uncached(chunks)
+
+        return cached_batch(
+            self.inference_cache, chunks, self._predict_chunks_uncached, self.model_name, self.revision,
+            labels=list(self.labels), threshold=self.threshold,
+        )
+
+    def _predict_chunks_uncached(self, chunks: Sequence[str]) -> list[list[Entity]]:
+        import torch
+
+        entities: list[list[Entity]] = [[] for _ in chunks]
+        order = sorted(range(len(chunks)), key=lambda index: len(chunks[index]))
+
+        for start in range(0, len(order), self.batch_size):
+            batch_indices = order[start:start + self.batch_size]
+
+            with torch.inference_mode():
+                batch_entities = self.model.batch_predict_entities(
+                    [chunks[index] for index in batch_indices], list(self.labels), threshold=self.threshold,
+                )
+
+            for index, chunk_entities in zip(batch_indices, batch_entities):
+                entities[index] = chunk_entities
+
+        return entities
+
+    @instrumented()
+    def entities(self, texts: Sequence[str]) -> list[list[Entity]]:
+        '''The entities of each text, with character offsets into the whole text. Entities found in two overlapping
+        chunks are merged, keeping the highest score.
+        '''
+        started_at = time.perf_counter()
+        candidates = [
+            index for index, text in enumerate(texts)
+            if self.keyword_pattern is None or self.keyword_pattern.search(text) is not None
+        ]
+
+        chunk_owners: list[tuple[int, int]] = []
+        chunks: list[str] = []
+        for index in candidates:
+            for chunk_start, chunk_end in chunk_spans(texts[index], self.max_words, self.overlap_words):
+                chunk_owners.append((index, chunk_start))
+                chunks.append(texts[index][chunk_start:chunk_end])
+
+        merged: list[dict[tuple[int, int, str], Entity]] = [{} for _ in texts]
+        for (index, offset), chunk_entities in zip(chunk_owners, self._predict_chunks(chunks)):
+            for entity in chunk_entities:
+                start, end = entity['start'] + offset, entity['end'] + offset
+                key = (start, end, entity['label'])
+
+                if key not in merged[index] or entity['score'] > merged[index][key]['score']:
+                    merged[index][key] = {**entity, 'start': start, 'end': end, 'text': texts[index][start:end]}
+
+        self.last_report = DetectionReport(len(texts), len(candidates), len(chunks), time.perf_counter() - started_at)
+        return [sorted(post_entities.values(), key=lambda entity: entity['start']) for post_entities in merged]
+
+    def has_prediction(self, texts: Sequence[str]) -> np.ndarray:
+        ''':return: Boolean mask of the texts with at least one 'position' entity.'''
+        return np.array(
+            [any(entity['label'] == 'position' for entity in post_entities) for post_entities in self.entities(texts)],
+            dtype=bool,
+        )
+
+    def __call__(self, texts: pd.Series) -> pd.Series:
+        '''`texts.apply(has_prediction)`, e.g. `posts_df[detector(posts_df['text'])]`.'''
+        return pd.Series(self.has_prediction(texts.tolist()), index=texts.index, name=texts.name)
@@ -0,0 +1,129 @@
+'''Batched transformer sentiment scoring of comments.'''
+
+from collections.abc import Iterable, Iterator, Sequence
+import itertools
+from typing import Any
+import torch
+from transformers import AutoModelForSequenceClassification, AutoTokenizer
+from config import model_registry
+from src.instrumentation import stage
+from src.models.inference_cache import InferenceCache, cached_batch
+
+ROBERTA_SENTIMENT_MODEL = 'cardiffnlp/twitter-roberta-base-sentiment-latest'
+
+class TransformerSentimentScorer:
+    '''Scores texts with a 3-class (negative, neutral, positive) sequence classification model.
+
+    The model is loaded once. Texts are tokenized without padding, sorted into buckets of similar length and run
+    through the model in dynamically padded mini-batches, so short comments are not padded to the longest one.
+    Scores are -1 (negative), 0 (neutral) or 1 (positive), like `bert_sentiment` in research question 1.
+
+    :param batch_size: Number of texts per forward pass.
+    :param max_length: Maximum number of tokens per text; longer texts are truncated.
+    :param num_threads: Number of intra-op threads torch may use on CPU. If None, keep torch's default.
+    :param chunk_size: Number of texts that are sorted by length together. Larger chunks pad less, smaller chunks
+        stream the first results back sooner.
+    :param inference_cache: If given, only texts that this model revision has not scored before are run through the
+        model, see `src.models.inference_cache`.
+    '''
+
+    def __init__(
+        self,
+        model_name: str = ROBERTA_SENTIMENT_MODEL,
+        device: torch.device | None = None,
+        batch_size: int = 32,
+        max_length: int = 512,
+        num_threads: int | None = None,
+        chunk_size: int = 2048,
+        revision: str = 'main',
+        inference_cache: InferenceCache | None = None,
+        tokenizer: Any | None = None,
+        model: Any | None = None,
+    ) -> None:
+        if num_threads is not None:
+            torch.set_num_threads(num_threads)
+
+        self.device = device if device is not None else torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self.chunk_size = chunk_size
+        self.model_name = model_name
+        self.inference_cache = inference_cache
+
+        if tokenizer is None or model is None:
+            tokenizer = AutoTokenizer.from_pretrained(model_name, revision=revision)
+            model = AutoModelForSequenceClassification.from_pretrained(model_name, revision=revision)
+            # The commit hash pins the exact weights when the model was resolved through the Hugging Face Hub.
+            revision = getattr(model.config, '_commit_hash', None) or revision
+
+        self.tokenizer = tokenizer
+        self.model = model
+        self.model.to(self.device)
+        self.model.eval()
+        self.revision = revision
+
+    @classmethod
+    def from_registry(
+        cls,
+        name: str = 'roberta-sentiment',
+        variant: 'model_registry.ModelVariant' = 'default',
+        offline: bool = False,
+        **kwargs: Any,
+    ) -> 'TransformerSentimentScorer':
+        '''Use the shared instance of a model in `config.model_registry`, e.g. its 'int8' or 'onnx' variant on CPU.'''
+        loaded_model = model_registry.load(name, variant, offline)
+        return cls(
+            model_name=model_registry.MODEL_SPECS[name].source,
+            revision=loaded_model.revision,
+            tokenizer=loaded_model.tokenizer,
+            model=loaded_model.model,
+            **kwargs,
+        )
+
+    def _predict_batch(self, encodings: list[dict[str, list[int]]]) -> list[int]:
+        inputs = self.tokenizer.pad(encodings, return_tensors='pt').to(self.device)
+
+        with torch.inference_mode():
+            logits = self.model(**inputs).logits
+
+        # 0: negative, 1: neutral, 2: positive -> -1: negative, 0: neutral, 1: positive
+        return (torch.argmax(logits, dim=1) - 1).tolist()
+
+    def _score_chunk(self, texts: Sequence[str]) -> list[int]:
+        if self.inference_cache is not None:
+            return cached_batch(
+                self.inference_cache, texts, self._score_uncached, self.model_name, self.revision,
+                max_length=self.max_length,
+            )
+
+        return self._score_uncached(texts)
+
+    def _score_uncached(self, texts: Sequence[str]) -> list[int]:
+        encodings = self.tokenizer(list(texts), truncation=True, max_length=self.max_length)['input_ids']
+        order = sorted(range(len(texts)), key=lambda index: len(encodings[index]))
+        scores = [0] * len(texts)
+
+        for start in range(0, len(order), self.batch_size):
+            batch_indices = order[start:start + self.batch_size]
+            batch_scores = self._predict_batch([{'input_ids': encodings[index]} for index in batch_indices])
+
+            for index, score in zip(batch_indices, batch_scores):
+                scores[index] = score
+
+        return scores
+
+    def score_stream(self, texts: Iterable[str]) -> Iterator[int]:
+        ''':yield: The score of each text, in input order.'''
+        iterator = iter(texts)
+
+        while chunk := tuple(itertools.islice(iterator, self.chunk_size)):
+            yield from self._score_chunk(chunk)
+
+    def __call__(self, texts: Sequence[str]) -> list[int]:
+        '''Score a batch of texts, e.g. as the batched scorer of `src.features.aggregation`.'''
+        caches = (self.inference_cache,) if self.inference_cache is not None else ()
+        with stage('TransformerSentimentScorer.__call__', len(texts), caches):
+            return list(self.score_stream(texts))
+
+    def score(self, text: str) -> int:
+        return self._score_chunk((text,))[0]
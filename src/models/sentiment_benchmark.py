@@ -0,0 +1,78 @@
+'''Benchmark `TransformerSentimentScorer` against the per-comment scoring of research question 1.
+
+Scores the labeled validation comments with both and reports comments/second, e.g.:
+
+    python -m src.models.sentiment_benchmark --batch-size 32 --num-threads 8
+'''
+
+import argparse
+import time
+from typing import Any
+import torch
+from src.data import constants
+from src.data.loader import load_comments_df, stream_ndjson
+from src.models.evaluation import VALIDATION_LABELS_DIR
+from src.models.sentiment import TransformerSentimentScorer
+
+def load_validation_texts(limit: int | None = None) -> list[str]:
+    comment_ids = {
+        labeled_comment['comment_id']
+        for file in VALIDATION_LABELS_DIR.glob('*.ndjson')
+        for labeled_comment in stream_ndjson(file)
+    }
+    comments_df = load_comments_df(constants.RawFile.FORMULA1_COMMENTS, columns=frozenset({'id', 'body'}))
+    texts = comments_df.loc[comments_df['id'].isin(comment_ids), 'body'].tolist()
+
+    return texts[:limit]
+
+def score_per_comment(texts: list[str], tokenizer: Any, model: Any, device: torch.device) -> list[int]:
+    '''The unbatched path: one forward pass per comment, padded to its own length.'''
+    scores: list[int] = []
+    for text in texts:
+        inputs = tokenizer(text, return_tensors='pt', truncation=True, padding=True, max_length=512).to(device)
+
+        with torch.no_grad():
+            outputs = model(**inputs)
+
+        scores.append(int(torch.argmax(outputs.logits, dim=1).item()) - 1)
+
+    return scores
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--limit', type=int, default=None, help='Maximum number of validation comments to score.')
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--max-length', type=int, default=512)
+    parser.add_argument('--num-threads', type=int, default=None)
+    parser.add_argument('--device', default='cuda' if torch.cuda.is_available() else 'cpu')
+    args = parser.parse_args()
+
+    device = torch.device(args.device)
+    texts = load_validation_texts(args.limit)
+    print(f'Scoring {len(texts)} validation comments on {device}')
+
+    # The model is loaded once, for both paths, and excluded from their timings.
+    scorer = TransformerSentimentScorer(
+        device=device,
+        batch_size=args.batch_size,
+        max_length=args.max_length,
+        num_threads=args.num_threads,
+    )
+
+    start = time.perf_counter()
+    per_comment_scores = score_per_comment(texts, scorer.tokenizer, scorer.model, device)
+    per_comment_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batched_scores = scorer(texts)
+    batched_seconds = time.perf_counter() - start
+
+    agreement = sum(a == b for a, b in zip(per_comment_scores, batched_scores)) / max(len(texts), 1)
+
+    print(f'per-comment: {len(texts) / per_comment_seconds:8.1f} comments/s ({per_comment_seconds:.2f} s)')
+    print(f'batched:     {len(texts) / batched_seconds:8.1f} comments/s ({batched_seconds:.2f} s)')
+    print(f'speedup:     {per_comment_seconds / batched_seconds:8.2f}x')
+    print(f'agreement:   {agreement:8.2%}')
+
+if __name__ == '__main__':
+    main()
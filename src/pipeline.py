@@ -0,0 +1,701 @@
+'''Resumable, checkpointed runner of the research workloads.
+
+Each workload is a DAG of stages, e.g. load -> filter -> preprocess -> score -> aggregate -> predict. The output of
+every stage is checkpointed as an artifact under `PIPELINE_DIR`, or `FINAL_PIPELINE_DIR` for the final results, whose
+file name contains a key of the stage's parameters, the keys of its input stages and the content hashes of the raw
+files it reads. A re-run skips every stage whose artifact is up to date and only loads the artifacts that a stage it
+does run needs. Partitioned stages, e.g. the per race weekend stages of research question 2, checkpoint each partition
+on its own, so an interrupted run resumes at the first event that was not completed:
+
+    python -m src.pipeline steward-sentiment
+    python -m src.pipeline race-prediction --n-events 3 5 --contributions 0.4 0.75
+    python -m src.pipeline transfer-ngrams --limit 500000
+    python -m src.pipeline race-prediction --status
+    python -m src.pipeline race-prediction --force preprocess
+
+The key does not cover the code of a stage; after changing it, re-run the stage with `--force`, which re-runs the
+stages that depend on it as well.
+'''
+
+from collections.abc import Callable, Collection, Mapping, Sequence
+from dataclasses import dataclass, field
+import argparse
+import datetime as dt
+import hashlib
+import json
+from pathlib import Path
+import re
+import time
+from typing import Any, Literal
+import pandas as pd
+from config import config, model_registry
+from src import instrumentation
+from src.data import cache, constants
+from src.models.ngram import NgramCounts, NgramModel
+
+PIPELINE_DIR = config.PROCESSED_DATA_DIR / 'pipeline'
+FINAL_PIPELINE_DIR = config.FINAL_DATA_DIR / 'pipeline'
+
+_MANIFEST_FILE = '_complete.json'
+
+@dataclass(frozen=True)
+class ArtifactFormat:
+    suffix: str
+    save: Callable[[Any, Path], None]
+    load: Callable[[Path], Any]
+
+def _save_parquet(df: pd.DataFrame, path: Path) -> None:
+    df.to_parquet(path)
+
+def _save_ngram_counts(counts: NgramCounts, path: Path) -> None:
+    counts.save(path)
+
+PARQUET = ArtifactFormat('.parquet', _save_parquet, pd.read_parquet)
+NGRAM_COUNTS = ArtifactFormat('.npz', _save_ngram_counts, NgramCounts.load)
+
+@dataclass(frozen=True)
+class Stage:
+    '''
+    :param run: Called with the output of each input stage and the params, as keyword arguments.
+    :param inputs: Names of the stages whose outputs `run` takes, as keyword arguments of the same name.
+    :param params: JSON-serializable keyword arguments of `run`. Paths are keyed relative to the repository, other
+        values such as dates by their `str`.
+    :param sources: Raw files that `run` reads, whose content hashes are part of the key.
+    :param artifact: Format the output is checkpointed in. If None, it is not stored but recomputed whenever a later
+        stage needs it, e.g. for loads that `src.data.cache` already serves from a memory-mapped file.
+    :param partition_column: If given, `run` is called once per distinct value of this column of the first input,
+        with only the rows of that value, and each partition is checkpointed on its own. The output is the
+        concatenation of the partitions' DataFrames.
+    :param final: Store the artifact under `FINAL_PIPELINE_DIR` instead of `PIPELINE_DIR`.
+    '''
+
+    name: str
+    run: Callable[..., Any]
+    inputs: tuple[str, ...] = ()
+    params: Mapping[str, Any] = field(default_factory=dict)
+    sources: tuple[Path, ...] = ()
+    artifact: ArtifactFormat | None = PARQUET
+    partition_column: str | None = None
+    final: bool = False
+
+@dataclass(frozen=True)
+class Workload:
+    ''':param stages: In topological order, i.e. every stage after its inputs.'''
+
+    name: str
+    stages: tuple[Stage, ...]
+
+    def stage(self, name: str) -> Stage:
+        for stage in self.stages:
+            if stage.name == name:
+                return stage
+
+        raise KeyError(f'Unknown stage {name!r} of {self.name!r}, expected one of {[s.name for s in self.stages]}.')
+
+StageStatus = Literal['up to date', 'loaded', 'ran', 'resumed']
+
+@dataclass(frozen=True)
+class StageRun:
+    stage: str
+    status: StageStatus
+    seconds: float
+    partitions_run: int = 0
+
+def _key_value(value: Any) -> str:
+    # Paths are keyed relative to the repository, so moving the repository does not invalidate its artifacts.
+    if isinstance(value, Path) and value.is_relative_to(config.ROOT_DIR):
+        return value.relative_to(config.ROOT_DIR).as_posix()
+
+    return str(value)
+
+def _partition_label(column: str, value: Any) -> str:
+    return re.sub(r'[^\w.=-]', '_', f'{column}={value}')
+
+class PipelineRunner:
+    '''Runs the stages of a workload that are not up to date.
+
+    :param force: Names of stages to re-run even if their artifacts are up to date, together with every stage that
+        depends on them.
+    :param log: Called with a progress message per stage and partition.
+    '''
+
+    def __init__(
+        self,
+        workload: Workload,
+        force: Collection[str] = (),
+        log: Callable[[str], None] = print,
+    ) -> None:
+        self.workload = workload
+        self.log = log
+        self.keys: dict[str, str] = {}
+        self.forced: set[str] = set()
+        self.runs: list[StageRun] = []
+        self._outputs: dict[str, Any] = {}
+
+        for name in force:
+            workload.stage(name)
+
+        for stage in workload.stages:
+            if missing := [name for name in stage.inputs if name not in self.keys]:
+                raise ValueError(f'Stage {stage.name!r} comes before its inputs {missing} in {workload.name!r}.')
+
+            self.keys[stage.name] = self._key(stage)
+            if stage.name in force or any(name in self.forced for name in stage.inputs):
+                self.forced.add(stage.name)
+
+    def _key(self, stage: Stage) -> str:
+        description = {
+            'stage': stage.name,
+            'params': stage.params,
+            'inputs': [self.keys[name] for name in stage.inputs],
+            'sources': [cache.fingerprint_file(source).sha256 for source in stage.sources],
+            'partition_column': stage.partition_column,
+        }
+        return hashlib.sha256(json.dumps(description, sort_keys=True, default=_key_value).encode('utf-8')).hexdigest()
+
+    def artifact_path(self, name: str) -> Path:
+        '''The artifact of a stage, a directory of partitions if it is partitioned.'''
+        stage = self.workload.stage(name)
+        if stage.artifact is None:
+            raise ValueError(f'Stage {name!r} does not store an artifact.')
+
+        directory = (FINAL_PIPELINE_DIR if stage.final else PIPELINE_DIR) / self.workload.name
+        suffix = '' if stage.partition_column is not None else stage.artifact.suffix
+        return directory / f'{name}-{self.keys[name][:16]}{suffix}'
+
+    def is_up_to_date(self, name: str) -> bool:
+        stage = self.workload.stage(name)
+        if stage.artifact is None or name in self.forced:
+            return False
+
+        path = self.artifact_path(name)
+        return (path / _MANIFEST_FILE).exists() if stage.partition_column is not None else path.exists()
+
+    def _load(self, stage: Stage) -> Any:
+        assert stage.artifact is not None
+        path = self.artifact_path(stage.name)
+
+        if stage.partition_column is None:
+            return stage.artifact.load(path)
+
+        labels = json.loads((path / _MANIFEST_FILE).read_text())['partitions']
+        return pd.concat(
+            [stage.artifact.load(path / f'{label}{stage.artifact.suffix}') for label in labels],
+            ignore_index=True,
+        )
+
+    def _save(self, stage: Stage, output: Any, path: Path) -> None:
+        assert stage.artifact is not None
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        # Written next to the artifact and renamed, so an interrupted write never leaves a complete-looking artifact.
+        temporary_path = path.with_name(f'{path.stem}.tmp{path.suffix}')
+        stage.artifact.save(output, temporary_path)
+        temporary_path.replace(path)
+
+    def _run_partitioned(self, stage: Stage, inputs: dict[str, Any]) -> tuple[pd.DataFrame, int, int]:
+        ''':return: The output, the number of partitions run and the total number of partitions.'''
+        assert stage.artifact is not None and stage.partition_column is not None
+        path = self.artifact_path(stage.name)
+        first_input = stage.inputs[0]
+        partitions_df: pd.DataFrame = inputs[first_input]
+
+        groups = [
+            (_partition_label(stage.partition_column, value), group_df)
+            for value, group_df in partitions_df.groupby(stage.partition_column, sort=True)
+        ]
+        # An empty input still yields an (empty) output, so later stages see its columns.
+        groups = groups or [(_partition_label(stage.partition_column, 'none'), partitions_df)]
+
+        outputs: list[pd.DataFrame] = []
+        partitions_run = 0
+        for position, (label, group_df) in enumerate(groups, start=1):
+            partition_path = path / f'{label}{stage.artifact.suffix}'
+
+            if partition_path.exists() and stage.name not in self.forced:
+                outputs.append(stage.artifact.load(partition_path))
+                continue
+
+            self.log(f'[{self.workload.name}] {stage.name}: {label} ({position}/{len(groups)})')
+            output = stage.run(**{**inputs, first_input: group_df}, **stage.params)
+            self._save(stage, output, partition_path)
+            outputs.append(output)
+            partitions_run += 1
+
+        (path / _MANIFEST_FILE).write_text(json.dumps({'partitions': [label for label, _ in groups]}, indent=4))
+        return pd.concat(outputs, ignore_index=True), partitions_run, len(groups)
+
+    def output(self, name: str) -> Any:
+        '''The output of a stage, loaded from its artifact if it is up to date and computed otherwise.'''
+        if name in self._outputs:
+            return self._outputs[name]
+
+        stage = self.workload.stage(name)
+        started_at = time.perf_counter()
+
+        if self.is_up_to_date(name):
+            output = self._load(stage)
+            self.runs.append(StageRun(name, 'loaded', time.perf_counter() - started_at))
+            self._outputs[name] = output
+            return output
+
+        inputs = {input_name: self.output(input_name) for input_name in stage.inputs}
+        started_at = time.perf_counter()
+
+        with instrumentation.stage(f'{self.workload.name}.{name}') as stage_record:
+            if stage.partition_column is not None:
+                output, partitions_run, partition_count = self._run_partitioned(stage, inputs)
+                status: StageStatus = 'resumed' if partitions_run < partition_count else 'ran'
+            else:
+                self.log(f'[{self.workload.name}] {name}')
+                output = stage.run(**inputs, **stage.params)
+                partitions_run = 0
+                status = 'ran'
+
+                if stage.artifact is not None:
+                    self._save(stage, output, self.artifact_path(name))
+
+            stage_record.items += len(output) if hasattr(output, '__len__') else 0
+
+        self.runs.append(StageRun(name, status, time.perf_counter() - started_at, partitions_run))
+        self._outputs[name] = output
+        return output
+
+    def run(self, targets: Sequence[str] | None = None) -> list[StageRun]:
+        '''Bring the target stages up to date, default the stages that no other stage depends on.
+
+        :return: What happened to every stage that was touched, in the order it finished.
+        '''
+        if targets is None:
+            dependencies = {name for stage in self.workload.stages for name in stage.inputs}
+            targets = [stage.name for stage in self.workload.stages if stage.name not in dependencies]
+
+        for name in targets:
+            if self.is_up_to_date(name):
+                self.runs.append(StageRun(name, 'up to date', 0.0))
+            else:
+                self.output(name)
+
+        return self.runs
+
+# Load stages, shared by the workloads. Parsed files are already cached by `src.data.cache`, so they are not stored.
+
+def _load_submissions(ndjson_file: Path, columns: Sequence[str], limit: int | None) -> pd.DataFrame:
+    from src.data.loader import load_submissions_df
+
+    return load_submissions_df(ndjson_file, columns=frozenset(columns), engine='pyarrow', limit=limit)
+
+def _load_comments(ndjson_file: Path, columns: Sequence[str], limit: int | None) -> pd.DataFrame:
+    from src.data.loader import load_comments_df
+
+    return load_comments_df(ndjson_file, columns=frozenset(columns), engine='pyarrow', limit=limit)
+
+def _load_stages(
+    submission_columns: Collection[str],
+    comment_columns: Collection[str],
+    limit: int | None,
+    submissions_file: Path = constants.RawFile.FORMULA1_SUBMISSIONS,
+    comments_file: Path = constants.RawFile.FORMULA1_COMMENTS,
+) -> tuple[Stage, Stage]:
+    return (
+        Stage(
+            'load_submissions',
+            _load_submissions,
+            params={'ndjson_file': submissions_file, 'columns': sorted(submission_columns), 'limit': limit},
+            sources=(submissions_file,),
+            artifact=None,
+        ),
+        Stage(
+            'load_comments',
+            _load_comments,
+            params={'ndjson_file': comments_file, 'columns': sorted(comment_columns), 'limit': limit},
+            sources=(comments_file,),
+            artifact=None,
+        ),
+    )
+
+# Research question 1: vote-weighted sentiment of the comments on steward decisions.
+
+STEWARD_DECISION_WORDS = (
+    'penalty', 'steward', 'decision', 'appeal', 'review', 'ruling', 'investigation', 'regulation',
+    'seconds', 'sec',
+    'collision', 'crash', 'incident', 'overtake', 'virtual safety car', 'blocking', 'brake test', 'contact',
+    'red flag', 'yellow flag',
+    'controversial', 'rigged', 'corrupt', 'bias', 'protest', 'FIA', 'document', 'infringement',
+)
+STEWARD_DECISION_FLAIRS = (':post-technical: Technical', ':post-news: News')
+# Manually excluded posts that are unrelated to steward decisions.
+EXCLUDED_STEWARD_DECISION_SUBMISSIONS = ('vdr1c6', 'w7z5aj', 'wf87e0', 'x1zd5z', 'x3y140')
+REMOVED_BODIES = ('[removed]', '[deleted]')
+
+def _filter_steward_decisions(
+    load_submissions: pd.DataFrame,
+    words: Sequence[str],
+    flairs: Sequence[str],
+    excluded_ids: Sequence[str],
+) -> pd.DataFrame:
+    '''The image posts with a news or technical flair whose title mentions a steward decision.'''
+    pattern = '|'.join(fr'\b{word}\b' for word in words)
+    submissions_df = load_submissions
+
+    return submissions_df[
+        submissions_df['title'].str.contains(pattern, flags=re.IGNORECASE, regex=True) &
+        submissions_df['link_flair_text'].isin(flairs) &
+        (submissions_df['post_hint'] == 'image') &
+        ~submissions_df['id'].isin(excluded_ids)
+    ].reset_index(drop=True)
+
+def _filter_steward_decision_comments(
+    load_comments: pd.DataFrame,
+    filter_submissions: pd.DataFrame,
+    removed_bodies: Sequence[str],
+) -> pd.DataFrame:
+    from src.features.aggregation import submission_link_ids
+
+    comments_df = load_comments
+    return comments_df[
+        ~comments_df['body'].isin(removed_bodies) &
+        comments_df['link_id'].isin(submission_link_ids(filter_submissions))
+    ].reset_index(drop=True)
+
+def _score_comments(
+    filter_comments: pd.DataFrame,
+    model: str,
+    variant: model_registry.ModelVariant,
+    offline: bool,
+    batch_size: int,
+) -> pd.DataFrame:
+    from src.models.inference_cache import get_inference_cache
+    from src.models.sentiment import TransformerSentimentScorer
+
+    scorer = TransformerSentimentScorer.from_registry(
+        model, variant, offline, batch_size=batch_size, inference_cache=get_inference_cache(),
+    )
+    return filter_comments.assign(sentiment=scorer(filter_comments['body'].tolist()))
+
+def _aggregate_submission_sentiment(filter_submissions: pd.DataFrame, score: pd.DataFrame) -> pd.DataFrame:
+    from src.features.aggregation import vote_weighted_comment_scores
+
+    # Equal texts have equal scores, so the scores of the `score` stage are looked up by text.
+    sentiment_by_text = dict(zip(score['body'], score['sentiment']))
+    return filter_submissions.assign(average_sentiment_bert=vote_weighted_comment_scores(
+        filter_submissions,
+        score,
+        lambda texts: [sentiment_by_text[text] for text in texts],
+        batched=True,
+    ))
+
+def steward_sentiment_workload(
+    limit: int | None = None,
+    variant: model_registry.ModelVariant = 'default',
+    offline: bool = False,
+    batch_size: int = 32,
+) -> Workload:
+    '''Research question 1: the vote-weighted RoBERTa sentiment of the comments on each steward decision post.
+
+    :param limit: Maximum number of submissions and comments to load, e.g. for a quick trial run.
+    '''
+    return Workload('steward-sentiment', (
+        *_load_stages(
+            constants.DEFAULT_SUBMISSION_COLUMNS | {'permalink', 'post_hint', 'link_flair_text'},
+            constants.DEFAULT_COMMENT_COLUMNS | {'link_id'},
+            limit,
+        ),
+        Stage('filter_submissions', _filter_steward_decisions, ('load_submissions',), {
+            'words': STEWARD_DECISION_WORDS,
+            'flairs': STEWARD_DECISION_FLAIRS,
+            'excluded_ids': EXCLUDED_STEWARD_DECISION_SUBMISSIONS,
+        }),
+        Stage(
+            'filter_comments',
+            _filter_steward_decision_comments,
+            ('load_comments', 'filter_submissions'),
+            {'removed_bodies': REMOVED_BODIES},
+        ),
+        Stage('score', _score_comments, ('filter_comments',), {
+            'model': 'roberta-sentiment', 'variant': variant, 'offline': offline, 'batch_size': batch_size,
+        }),
+        Stage('aggregate', _aggregate_submission_sentiment, ('filter_submissions', 'score'), final=True),
+    ))
+
+# Research question 2: race result prediction from the sentiment of the predictions made during each race weekend.
+
+def _conventional_events(year: int, start_date: dt.datetime, end_date: dt.datetime) -> pd.DataFrame:
+    from src.data.race_results import load_season_results
+
+    schedule_df = load_season_results(year).conventional_events(start_date, end_date)
+    return schedule_df.rename_axis('event_index').reset_index()
+
+def _race_weekend_posts(
+    load_submissions: pd.DataFrame,
+    load_comments: pd.DataFrame,
+    schedule: pd.DataFrame,
+    start_offset_hours: float,
+) -> pd.DataFrame:
+    '''The posts made during a race weekend, labeled with the `event_index` of the weekend.'''
+    from src.data.preprocessing import concatenate_submissions_and_comments
+    from src.data.time_windows import TimeWindowIndex, race_weekend_windows
+
+    posts_df = concatenate_submissions_and_comments(load_submissions, load_comments)
+    window_index = TimeWindowIndex(posts_df)
+    windows = race_weekend_windows(schedule, start_offset=dt.timedelta(hours=start_offset_hours))
+    event_indices = window_index.assign(windows, schedule['event_index'].tolist())
+
+    posts_df = window_index.posts_df.assign(event_index=event_indices.astype('int64'))
+    return posts_df[posts_df['event_index'] != -1].reset_index(drop=True)
+
+def _correct_spelling(filter_posts: pd.DataFrame) -> pd.DataFrame:
+    from src.data.preprocessing import correct_spelling_column_spacy
+
+    return filter_posts.assign(text=correct_spelling_column_spacy(filter_posts['text']))
+
+def _detect_predictions(preprocess: pd.DataFrame, threshold: float) -> pd.DataFrame:
+    from src.models.inference_cache import get_inference_cache
+    from src.models.prediction_detection import PredictionDetector
+
+    posts_df = preprocess
+    detector = PredictionDetector(threshold=threshold, inference_cache=get_inference_cache())
+    return posts_df[detector(posts_df['text'])].reset_index(drop=True)
+
+def _score_drivers(
+    detect: pd.DataFrame,
+    model: str,
+    variant: model_registry.ModelVariant,
+    offline: bool,
+) -> pd.DataFrame:
+    from src.data.preprocessing import F1_names
+    from src.models.absa import AbsaEngine, DriverMentionDetector, driver_sentiment, final_scores
+    from src.models.inference_cache import get_inference_cache
+
+    engine = AbsaEngine.from_registry(model, variant, offline, inference_cache=get_inference_cache())
+    sentiment = driver_sentiment(engine, DriverMentionDetector(F1_names), detect['text'].tolist(), detect['score'])
+    scores = final_scores(sentiment)
+
+    return pd.DataFrame({
+        'event_index': pd.Series(detect['event_index'].iloc[:1].tolist() * len(scores), dtype='int64'),
+        'driver': pd.Series([driver for driver, _ in scores], dtype=object),
+        'sentiment_score': pd.Series([score for _, score in scores], dtype='float64'),
+    })
+
+def _predict_positions(
+    schedule: pd.DataFrame,
+    score: pd.DataFrame,
+    year: int,
+    n_events: Sequence[int],
+    contributions: Sequence[float],
+) -> pd.DataFrame:
+    '''The `prediction_df` of every event and setting, replacing the `predictions.xlsx` of research question 2.'''
+    from src.data.race_results import load_season_results
+    from src.models.prediction import SeasonMatrices, predict_grid
+
+    season_matrices = SeasonMatrices.from_season_results(load_season_results(year))
+    scores_by_event = {
+        int(event_index): list(zip(event_scores['driver'], event_scores['sentiment_score']))
+        for event_index, event_scores in score.groupby('event_index')
+    }
+    grid = predict_grid(
+        season_matrices, season_matrices.sentiment_matrix(scores_by_event), n_events, contributions,
+    )
+
+    return pd.concat([
+        grid.prediction_frame(event_index, n, contribution).assign(
+            n_events=n, historical_score_contribution=contribution, event_index=event_index,
+        )
+        for n in n_events
+        for contribution in contributions
+        for event_index in schedule['event_index']
+    ], ignore_index=True)
+
+def race_prediction_workload(
+    year: int = constants.YEAR,
+    start_date: dt.datetime = constants.START_DATE,
+    end_date: dt.datetime = constants.END_DATE,
+    limit: int | None = None,
+    variant: model_registry.ModelVariant = 'default',
+    offline: bool = False,
+    threshold: float = 0.45,
+    n_events: Sequence[int] = (5,),
+    contributions: Sequence[float] = (0.4,),
+    start_offset_hours: float = 0.0,
+) -> Workload:
+    '''Research question 2: per conventional race weekend, the spelling-corrected posts that GLiNER finds a
+    prediction in, their ABSA sentiment towards each driver and the predicted results. The per weekend stages are
+    partitioned by `event_index`, so an interrupted season resumes at the first event that was not completed. The
+    season's results are read from the store of `src.data.race_results`.
+
+    :param start_offset_hours: Offset of the start of each weekend from its first session, e.g. -24 for the day before.
+    '''
+    return Workload('race-prediction', (
+        *_load_stages(
+            {'author', 'created_utc', 'gilded', 'id', 'score', 'selftext', 'title'},
+            constants.DEFAULT_COMMENT_COLUMNS,
+            limit,
+        ),
+        Stage('schedule', _conventional_events, params={'year': year, 'start_date': start_date, 'end_date': end_date}),
+        Stage(
+            'filter_posts',
+            _race_weekend_posts,
+            ('load_submissions', 'load_comments', 'schedule'),
+            {'start_offset_hours': start_offset_hours},
+        ),
+        Stage('preprocess', _correct_spelling, ('filter_posts',), partition_column='event_index'),
+        Stage('detect', _detect_predictions, ('preprocess',), {'threshold': threshold}, partition_column='event_index'),
+        Stage(
+            'score',
+            _score_drivers,
+            ('detect',),
+            {'model': 'deberta-absa', 'variant': variant, 'offline': offline},
+            partition_column='event_index',
+        ),
+        Stage('predict', _predict_positions, ('schedule', 'score'), {
+            'year': year, 'n_events': list(n_events), 'contributions': list(contributions),
+        }, final=True),
+    ))
+
+# Research question 3: driver transfer prediction with an n-gram model of the posts that mention a transfer.
+
+TRANSFER_DRIVERS = (
+    ('max', 'verstappen'), ('charles', 'leclerc'), ('sergio', 'perez'), ('george', 'russell'),
+    ('carlos', 'sainz'), ('lewis', 'hamilton'), ('lando', 'norris'), ('esteban', 'ocon'),
+    ('fernando', 'alonso'), ('valtteri', 'bottas'), ('daniel', 'ricciardo'), ('sebastian', 'vettel'),
+    ('kevin', 'magnussen'), ('pierre', 'gasly'), ('lance', 'stroll'), ('mick', 'schumacher'),
+    ('yuki', 'tsunoda'), ('zhou', 'guanyu'), ('alexander', 'albon'), ('nicholas', 'latifi'),
+    ('nyck', 'vries'), ('nico', 'hulkenberg'), ('oscar', 'piastri'), ('logan', 'sargeant'),
+)
+TRANSFER_TEAMS = (
+    'mercedes', 'ferrari', 'red', 'bull', 'alpine', 'renault', 'mclaren', 'aston', 'martin', 'racing', 'point',
+    'alphatauri', 'alpha', 'tauri', 'haas', 'alfa', 'romeo', 'williams', 'kick', 'sauber',
+)
+TRANSFER_ACTION_WORDS = (
+    'to', 'go', 'goes', 'leave', 'leaves', 'join', 'joins', 'sign', 'signs', 'extend', 'extends', 'move', 'moves',
+    'replace', 'replaces', 'return', 'returns', 'stay', 'stays',
+)
+
+def _lemmatize_posts(load_submissions: pd.DataFrame, load_comments: pd.DataFrame) -> pd.DataFrame:
+    from src.data.preprocessing import concatenate_submissions_and_comments
+    from src.features.ngram_counts import LEMMATIZED_TOKENS_PIPELINE
+
+    posts_df = concatenate_submissions_and_comments(load_submissions, load_comments)
+    return pd.DataFrame({'tokens': LEMMATIZED_TOKENS_PIPELINE(posts_df['text']).to_numpy()})
+
+def _filter_transfer_sentences(
+    preprocess: pd.DataFrame,
+    drivers: Sequence[str],
+    teams: Sequence[str],
+    action_words: Sequence[str],
+) -> pd.DataFrame:
+    '''`filter_sentences_by_driver_and_team` of research question 3: the posts with a team and a driver directly
+    followed by an action word.
+    '''
+    driver_set, team_set, action_word_set = set(drivers), set(teams), set(action_words)
+
+    def is_transfer(tokens: Sequence[str]) -> bool:
+        return not team_set.isdisjoint(tokens) and any(
+            word in driver_set and next_word in action_word_set for word, next_word in zip(tokens, tokens[1:])
+        )
+
+    tokens = preprocess['tokens'].map(list)
+    return pd.DataFrame({'tokens': tokens[tokens.map(is_transfer)].to_numpy()})
+
+def _count_ngrams(filter_sentences: pd.DataFrame, n: int) -> NgramCounts:
+    return NgramCounts.from_sentences(filter_sentences['tokens'], n)
+
+def _predict_transfers(
+    aggregate: NgramCounts,
+    drivers: Sequence[Sequence[str]],
+    teams: Sequence[str],
+    action_word: str,
+) -> pd.DataFrame:
+    '''The most probable team after '<first name> <last name> <action_word>' for each driver, as `team_summary`,
+    or `UNKNOWN` if the model never saw it.
+    '''
+    model = NgramModel(aggregate)
+    driver_names = [' '.join(driver) for driver in drivers]
+    return pd.DataFrame({
+        'driver': driver_names,
+        'team': [model.predict_next(f'{name} {action_word}', teams) for name in driver_names],
+    })
+
+def transfer_ngrams_workload(limit: int | None = None, n: int = 3) -> Workload:
+    '''Research question 3: the lemmatized posts that mention a driver transfer, their n-gram counts and the team
+    each driver is predicted to go to.
+    '''
+    return Workload('transfer-ngrams', (
+        *_load_stages({'title', 'selftext'}, {'body'}, limit),
+        Stage('preprocess', _lemmatize_posts, ('load_submissions', 'load_comments')),
+        Stage('filter_sentences', _filter_transfer_sentences, ('preprocess',), {
+            'drivers': [name for driver in TRANSFER_DRIVERS for name in driver],
+            'teams': TRANSFER_TEAMS,
+            'action_words': TRANSFER_ACTION_WORDS,
+        }),
+        Stage('aggregate', _count_ngrams, ('filter_sentences',), {'n': n}, artifact=NGRAM_COUNTS),
+        Stage('predict', _predict_transfers, ('aggregate',), {
+            'drivers': TRANSFER_DRIVERS, 'teams': TRANSFER_TEAMS, 'action_word': 'to',
+        }, final=True),
+    ))
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Run the research workloads, skipping the stages that are up to date.')
+    subparsers = parser.add_subparsers(dest='workload', required=True)
+
+    def add_workload_parser(name: str, description: str) -> argparse.ArgumentParser:
+        workload_parser = subparsers.add_parser(name, help=description)
+        workload_parser.add_argument('--limit', type=int, help='maximum number of submissions and comments to load')
+        workload_parser.add_argument('--force', nargs='+', default=[], metavar='STAGE', help='re-run these stages')
+        workload_parser.add_argument('--status', action='store_true', help='only list the stages and their artifacts')
+        return workload_parser
+
+    for name, description in (
+        ('steward-sentiment', 'research question 1'),
+        ('race-prediction', 'research question 2'),
+    ):
+        workload_parser = add_workload_parser(name, description)
+        workload_parser.add_argument('--variant', default='default', choices=['default', 'int8', 'onnx'])
+        workload_parser.add_argument('--offline', action='store_true', help='only use models fetched into the registry')
+
+    steward_parser = subparsers.choices['steward-sentiment']
+    steward_parser.add_argument('--batch-size', type=int, default=32)
+
+    race_parser = subparsers.choices['race-prediction']
+    race_parser.add_argument('--year', type=int, default=constants.YEAR)
+    race_parser.add_argument('--threshold', type=float, default=0.45)
+    race_parser.add_argument('--n-events', type=int, nargs='+', default=[5])
+    race_parser.add_argument('--contributions', type=float, nargs='+', default=[0.4])
+    race_parser.add_argument('--start-offset-hours', type=float, default=0.0)
+
+    ngram_parser = add_workload_parser('transfer-ngrams', 'research question 3')
+    ngram_parser.add_argument('-n', type=int, default=3, help='n-gram order')
+
+    return parser.parse_args()
+
+def main() -> None:
+    args = _parse_args()
+
+    if args.workload == 'steward-sentiment':
+        workload = steward_sentiment_workload(args.limit, args.variant, args.offline, args.batch_size)
+    elif args.workload == 'race-prediction':
+        workload = race_prediction_workload(
+            args.year, limit=args.limit, variant=args.variant, offline=args.offline, threshold=args.threshold,
+            n_events=args.n_events, contributions=args.contributions, start_offset_hours=args.start_offset_hours,
+        )
+    else:
+        workload = transfer_ngrams_workload(args.limit, args.n)
+
+    runner = PipelineRunner(workload, args.force)
+
+    if args.status:
+        for stage in workload.stages:
+            artifact = runner.artifact_path(stage.name) if stage.artifact is not None else 'not stored'
+            print(f'{stage.name:<20}{"up to date" if runner.is_up_to_date(stage.name) else "stale":<12}{artifact}')
+        return
+
+    for stage_run in runner.run():
+        partitions = f', {stage_run.partitions_run} partitions run' if stage_run.partitions_run else ''
+        print(f'{stage_run.stage:<20}{stage_run.status:<12}{stage_run.seconds:>9.2f} s{partitions}')
+
+    for stage in workload.stages:
+        if stage.final:
+            print(f'{stage.name}: {runner.artifact_path(stage.name)}')
+
+if __name__ == '__main__':
+    main()
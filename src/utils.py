@@ -1,15 +1,20 @@
 import pandas as pd
 from collections.abc import Set as ImmutableSet
-from pandas.io.formats.style import Styler
+from collections.abc import Callable, Hashable
 from contextlib import contextmanager
 from functools import partial, reduce
-from typing import TypeVar
+from typing import TYPE_CHECKING, TypeVar
 from config import config
-import torch
-import torch.version
 import random
+import threading
 import numpy as np
 
+# torch and jinja2 (for Styler) take long to import and are not needed by most users of this module,
+# e.g. src.data.constants, so they are only imported when used.
+if TYPE_CHECKING:
+    from pandas.io.formats.style import Styler
+    import torch
+
 # TODO: improve: do you want try/finally here? type annotations, etc.
 @contextmanager
 def temporary_pandas_options(options):
@@ -29,7 +34,7 @@ display_full_dataframe = partial(temporary_pandas_options, options={
     'display.max_rows': None,
 })
 
-def hide_index(df: pd.DataFrame, /) -> Styler:
+def hide_index(df: pd.DataFrame, /) -> 'Styler':
     return df.style.hide(axis='index')
 
 def _compose_two_functions(f, g):
@@ -44,8 +49,44 @@ _U = TypeVar('_U')
 def infer_types(dct: dict[_T, _U], /) -> dict[_T, _U]:
     return dct
 
+_worker_locals: dict[Hashable, object] = {}
+_worker_locals_lock = threading.Lock()
+
+def _worker_local_key(factory: Callable[[], object]) -> Hashable:
+    '''A key that is equal for equal factories, also after they were unpickled in another task. Every unpickled
+    `functools.partial` is a new object that is only equal to itself, so partials are keyed on their contents.
+    '''
+    if isinstance(factory, partial):
+        return (
+            partial,
+            _worker_local_key(factory.func),
+            factory.args,
+            tuple(sorted(factory.keywords.items())),
+        )
+
+    return factory
+
+def worker_local(factory: Callable[[], _T], key: Hashable | None = None) -> _T:
+    '''Call `factory` once per process and return the same result afterwards, e.g. to load a model once per Dask
+    worker process instead of once per partition.
+
+    :param factory: Picklable by reference, e.g. a module-level function, `TransformerSentimentScorer.from_registry`
+        or a `functools.partial` of one with hashable arguments, so that it is the same key in every task of a worker.
+    :param key: Identifies the result instead of `factory`, e.g. for a lambda or a partial with unhashable arguments.
+    '''
+    if key is None:
+        key = _worker_local_key(factory)
+
+    with _worker_locals_lock:
+        if key not in _worker_locals:
+            _worker_locals[key] = factory()
+
+        return _worker_locals[key] # type: ignore[reportReturnType]
+
 def set_random_seeds(seed: int = config.RANDOM_SEED) -> None:
     '''Set random seeds for reproducibility across random, numpy.random, and torch.'''
+    import torch
+
     random.seed(seed)
     np.random.seed(seed)
     torch.manual_seed(seed)
@@ -73,7 +114,10 @@ def assert_columns_exist(
             f'missing: {missing_columns}.'
         )
 
-def get_device() -> torch.device:
+def get_device() -> 'torch.device':
+    import torch
+    import torch.version
+
     print(f'PyTorch version: {torch.__version__}')
     print(f'CUDA available: {torch.cuda.is_available()}')
 
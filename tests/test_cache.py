@@ -0,0 +1,81 @@
+import json
+from pathlib import Path
+import tempfile
+import unittest
+from unittest import mock
+import pandas as pd
+from src.data import cache, constants
+from src.data.loader import load_comments_df
+
+COLUMN_DTYPES = {'id': str}
+
+class ParsedDataCacheTest(unittest.TestCase):
+    def test_files_with_the_same_name_do_not_share_entries(self) -> None:
+        with tempfile.TemporaryDirectory() as directory, \
+                mock.patch.object(cache, 'PARSED_DATA_CACHE_DIR', Path(directory) / 'parsed'):
+            first_file = Path(directory) / 'labels' / 'comments.ndjson'
+            second_file = Path(directory) / 'labels copy' / 'comments.ndjson'
+            for ndjson_file, comment_id in ((first_file, 'a'), (second_file, 'b')):
+                ndjson_file.parent.mkdir()
+                ndjson_file.write_text(f'{{"id": "{comment_id}"}}\n', encoding='utf-8')
+
+            cache.write_cached_df(first_file, pd.DataFrame({'id': ['a']}), COLUMN_DTYPES)
+            cache.write_cached_df(second_file, pd.DataFrame({'id': ['b']}), COLUMN_DTYPES)
+
+            for ndjson_file, comment_id in ((first_file, 'a'), (second_file, 'b')):
+                cached_df = cache.read_cached_df(ndjson_file, frozenset({'id'}), COLUMN_DTYPES)
+                self.assertIsNotNone(cached_df)
+                self.assertEqual(cached_df['id'].tolist(), [comment_id]) # type: ignore[reportOptionalSubscript]
+
+            self.assertNotEqual(cache.fingerprint_file(first_file), cache.fingerprint_file(second_file))
+
+class CachedLoadTest(unittest.TestCase):
+    '''Loads with the default `use_cache=True` have to return what `use_cache=False` returns.'''
+
+    def setUp(self) -> None:
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+        patcher = mock.patch.object(cache, 'PARSED_DATA_CACHE_DIR', self.directory / 'parsed')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def write_ndjson(self, rows: list[dict[str, object]]) -> Path:
+        path = self.directory / 'comments.ndjson'
+        path.write_text(''.join(json.dumps(row) + '\n' for row in rows), encoding='utf-8')
+        return path
+
+    def assert_cached_load_equal(self, path: Path, columns: frozenset[str]) -> None:
+        expected_df = load_comments_df(path, columns=columns, use_cache=False)
+        for _ in range(2): # Populate the cache, then read from it.
+            pd.testing.assert_frame_equal(load_comments_df(path, columns=columns), expected_df)
+
+    def test_mixed_type_column(self) -> None:
+        path = self.write_ndjson([
+            {'id': 'c1', 'edited': False, 'score': 1},
+            {'id': 'c2', 'edited': 1654041700.5, 'score': 2},
+        ])
+
+        self.assert_cached_load_equal(path, frozenset({'id', 'edited'}))
+
+    def test_missing_unrequested_typed_column(self) -> None:
+        # There is no `gilded`, which has an integer dtype.
+        path = self.write_ndjson([{'id': 'c1', 'score': 1}, {'id': 'c2', 'score': -3}])
+
+        self.assert_cached_load_equal(path, frozenset({'id'}))
+        self.assert_cached_load_equal(path, frozenset({'id', 'score'}))
+        self.assertEqual(cache.cached_columns(path, constants.COMMENT_COLUMN_DTYPES), frozenset({'id', 'score'}))
+
+    def test_failed_write_is_skipped(self) -> None:
+        path = self.write_ndjson([{'id': 'c1'}])
+
+        # Arrow cannot convert a column of booleans and floats.
+        mixed_df = pd.DataFrame({'id': ['c1', 'c2'], 'edited': [False, 1.5]})
+        with self.assertWarns(UserWarning):
+            written = cache.write_cached_df(path, mixed_df, COLUMN_DTYPES)
+
+        self.assertIsNone(written)
+        self.assertEqual(list(cache.PARSED_DATA_CACHE_DIR.glob('*.feather*')), [])
+
+if __name__ == '__main__':
+    unittest.main()
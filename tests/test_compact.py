@@ -0,0 +1,61 @@
+import json
+from pathlib import Path
+import tempfile
+import unittest
+from unittest import mock
+import numpy as np
+import pandas as pd
+from src.data import cache, compact, constants, line_index
+from src.data.loader import load_comments_df
+
+COMMENTS = [
+    {'author': author, 'body': f'comment {index}', 'created_utc': 1654041600 + index, 'gilded': 0, 'id': compact_id,
+     'link_id': link_id, 'score': index}
+    for index, (author, compact_id, link_id) in enumerate([
+        ('b', 'c1', 't3_s1'), ('a', 'c2', 't3_s1'), ('c', 'c3', None), ('a', 'c4', 't3_s2'), ('d', 'c5', 't3_s2'),
+    ])
+]
+COLUMNS = frozenset({'author', 'body', 'created_utc', 'id', 'link_id'})
+
+class CompactSchemaTest(unittest.TestCase):
+    def setUp(self) -> None:
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = Path(directory.name) / 'comments.ndjson'
+        self.path.write_text(''.join(json.dumps(row) + '\n' for row in COMMENTS), encoding='utf-8')
+
+        for target, name, value in (
+            (cache, 'PARSED_DATA_CACHE_DIR', Path(directory.name) / 'parsed'),
+            (line_index, 'LINE_INDEX_DIR', Path(directory.name) / 'line_index'),
+            (compact, 'CHUNK_SIZE', 2),
+        ):
+            patcher = mock.patch.object(target, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_missing_ids_round_trip(self) -> None:
+        link_ids = pd.Series(['t3_s1', None, 'None', 't3_s2'])
+        decoded = compact.decode_base36(link_ids, 't3_')
+
+        self.assertEqual(decoded[[1, 2]].tolist(), [compact.MISSING_ID] * 2)
+        self.assertEqual(compact.encode_base36(decoded, 't3_').tolist(), ['t3_s1', None, None, 't3_s2'])
+
+    def test_chunked_loads_equal_converting_the_whole_frame(self) -> None:
+        default_df = load_comments_df(self.path, columns=COLUMNS, use_cache=False)
+        expected_df = compact.to_compact_schema(default_df, constants.COMPACT_COMMENT_COLUMN_DTYPES)
+        self.assertTrue((expected_df['link_id'] == compact.MISSING_ID).any())
+
+        for engine in ('python', 'pyarrow'):
+            for kwargs in ({'use_cache': False}, {'line_range': (0, len(COMMENTS)), 'processes': 1}):
+                compact_df = load_comments_df(self.path, columns=COLUMNS, engine=engine, compact_schema=True, **kwargs)
+                pd.testing.assert_frame_equal(compact_df[sorted(COLUMNS)], expected_df[sorted(COLUMNS)])
+
+        # Populate the cache, then read the compact schema from it.
+        load_comments_df(self.path, columns=COLUMNS)
+        cached_df = load_comments_df(self.path, columns=COLUMNS, compact_schema=True)
+        pd.testing.assert_frame_equal(cached_df[sorted(COLUMNS)], expected_df[sorted(COLUMNS)])
+        self.assertIsInstance(cached_df['author'].dtype, pd.CategoricalDtype)
+        self.assertEqual(cached_df['id'].dtype, np.int64)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,35 @@
+from collections.abc import Sequence
+from pathlib import Path
+import tempfile
+import unittest
+import numpy as np
+import pandas as pd
+from src.models.evaluation import compare_with_gpt
+
+class NoMentionDetector:
+    drivers = ('Max Verstappen',)
+
+    def find_many(self, texts: Sequence[str]) -> list[list[str]]:
+        return [[] for _ in texts]
+
+class UnusedEngine:
+    def predict(self, texts: Sequence[str], aspects: Sequence[str]) -> np.ndarray:
+        raise AssertionError('There are no pairs to score.')
+
+class CompareWithGptTest(unittest.TestCase):
+    def test_texts_without_driver_mentions(self) -> None:
+        with tempfile.TemporaryDirectory() as directory:
+            gpt_file = Path(directory) / 'sentiments.csv'
+            pd.DataFrame({
+                'text': ['What a race', 'Great drive by Max'],
+                'sentiments': [None, "{'Max Verstappen': {'positive': 0.75, 'negative': 0.0, 'count': 1}}"],
+            }).to_csv(gpt_file, index=False)
+
+            comparison = compare_with_gpt(UnusedEngine(), NoMentionDetector(), gpt_file) # type: ignore[arg-type]
+
+        self.assertEqual(comparison[['row', 'driver']].values.tolist(), [[1, 'Max Verstappen']])
+        self.assertEqual(comparison['model_score'].tolist(), [0.0])
+        self.assertEqual(comparison['error'].tolist(), [0.75])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+from pathlib import Path
+import tempfile
+import unittest
+from src.models.inference_cache import InferenceCache
+
+class InferenceCacheTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.path = Path(self.directory.name) / 'inference.sqlite3'
+
+    def count_rows(self, inference_cache: InferenceCache) -> int:
+        return inference_cache._connection.execute('SELECT COUNT(*) FROM results').fetchone()[0]
+
+    def test_entry_count_and_eviction(self) -> None:
+        inference_cache = InferenceCache(self.path, max_entries=3)
+        self.addCleanup(inference_cache.close)
+
+        inference_cache.put_many({'a': 1, 'b': 2})
+        inference_cache.put_many({'b': 3, 'c': 4})
+        self.assertEqual(len(inference_cache), 3)
+        self.assertEqual(inference_cache.get_many(['b']), {'b': 3})
+
+        inference_cache.get_many(['a'])
+        inference_cache.put_many({'d': 5})
+        self.assertEqual(len(inference_cache), 3)
+        self.assertEqual(len(inference_cache), self.count_rows(inference_cache))
+        self.assertEqual(set(inference_cache.get_many(['a', 'b', 'c', 'd'])), {'a', 'b', 'd'})
+
+        reopened = InferenceCache(self.path, max_entries=3)
+        self.addCleanup(reopened.close)
+        self.assertEqual(len(reopened), 3)
+
+        inference_cache.clear()
+        self.assertEqual(len(inference_cache), 0)
+
+    def test_connections_share_the_entry_count(self) -> None:
+        first = InferenceCache(self.path, max_entries=3)
+        second = InferenceCache(self.path, max_entries=3)
+        self.addCleanup(first.close)
+        self.addCleanup(second.close)
+
+        first.put_many({'a': 1, 'b': 2})
+        second.put_many({'c': 3, 'd': 4})
+        self.assertEqual(len(first), 3)
+        first.put_many({'e': 5})
+
+        self.assertEqual(len(first), 3)
+        self.assertEqual(len(second), 3)
+        self.assertEqual(self.count_rows(second), 3)
+        self.assertEqual(set(second.get_many(['a', 'b', 'c', 'd', 'e'])), {'c', 'd', 'e'})
+
+    def test_file_without_entry_count(self) -> None:
+        inference_cache = InferenceCache(self.path)
+        inference_cache.put_many({'a': 1, 'b': 2})
+        inference_cache._connection.execute('DROP TABLE result_count')
+        inference_cache.close()
+
+        reopened = InferenceCache(self.path)
+        self.addCleanup(reopened.close)
+        self.assertEqual(len(reopened), 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,40 @@
+from pathlib import Path
+import pstats
+import tempfile
+import unittest
+from src import instrumentation
+
+def _inner_work() -> int:
+    return sum(range(1000))
+
+class StageProfilingTest(unittest.TestCase):
+    '''Nested stages have to be profiled as part of the outermost stage, with a single active profiler.'''
+
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        instrumentation.REGISTRY.reset()
+        instrumentation.enable(profile_dir=Path(self.directory.name))
+        self.addCleanup(instrumentation.disable)
+        self.addCleanup(instrumentation.REGISTRY.reset)
+
+    def test_nested_stages(self) -> None:
+        with instrumentation.stage('outer'):
+            with instrumentation.stage('inner'):
+                _inner_work()
+            with instrumentation.stage('inner'):
+                _inner_work()
+
+        self.assertEqual(instrumentation.REGISTRY.stats['inner'].calls, 2)
+        self.assertEqual(instrumentation.REGISTRY.stats['outer'].calls, 1)
+        self.assertEqual(sorted(path.name for path in Path(self.directory.name).iterdir()), ['outer.0.prof'])
+
+        profiled = pstats.Stats(str(Path(self.directory.name) / 'outer.0.prof')).stats # type: ignore[attr-defined]
+        self.assertIn('_inner_work', {function_name for _, _, function_name in profiled})
+
+        with instrumentation.stage('inner'):
+            _inner_work()
+        self.assertTrue((Path(self.directory.name) / 'inner.2.prof').exists())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+from collections.abc import Callable
+import json
+from pathlib import Path
+import tempfile
+import unittest
+import pandas as pd
+from src.data import constants
+from src.data.loader import load_comments_df, load_submissions_df
+
+COMMENTS = [
+    {'author': 'a', 'body': 'box box', 'created_utc': 1654041600, 'edited': False, 'gilded': 0, 'id': 'c1',
+     'link_id': 't3_s1', 'parent_id': 't3_s1', 'score': 3},
+    {'author': 'b', 'body': 'p1', 'created_utc': 1654041660, 'edited': 1654041700.5, 'gilded': 1, 'id': 'c2',
+     'link_id': 't3_s1', 'parent_id': 't1_c1', 'score': -2},
+    {'author': 'c', 'body': 'dnf', 'created_utc': 1654041720, 'edited': True, 'gilded': 0, 'id': 'c3',
+     'link_id': 't3_s1', 'score': 0},
+]
+SUBMISSIONS = [
+    {'author': 'a', 'created_utc': 1654041600, 'edited': 1654041700.5, 'gilded': 0, 'id': 's1', 'score': 10,
+     'selftext': '', 'title': 'Penalty', 'permalink': '/r/formula1/s1', 'link_flair_text': 'Video'},
+    {'author': 'b', 'created_utc': 1654041660, 'edited': False, 'gilded': 0, 'id': 's2', 'score': 1,
+     'selftext': 'text', 'title': 'Steward decision', 'permalink': '/r/formula1/s2', 'link_flair_text': None},
+]
+
+class LoaderEngineTest(unittest.TestCase):
+    '''The 'pyarrow' engine has to return the same DataFrame as the 'python' engine.'''
+
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def write_ndjson(self, name: str, rows: list[dict[str, object]]) -> Path:
+        path = Path(self.directory.name) / name
+        path.write_text(''.join(json.dumps(row) + '\n' for row in rows), encoding='utf-8')
+        return path
+
+    def assert_engines_equal(
+        self,
+        load: Callable[..., pd.DataFrame],
+        path: Path,
+        columns: frozenset[str],
+        **kwargs: object,
+    ) -> None:
+        python_df = load(path, columns=columns, engine='python', use_cache=False, **kwargs)
+        pyarrow_df = load(path, columns=columns, engine='pyarrow', use_cache=False, **kwargs)
+        pd.testing.assert_frame_equal(pyarrow_df[sorted(columns)], python_df[sorted(columns)])
+
+    def test_untyped_columns_next_to_a_mixed_type_field(self) -> None:
+        path = self.write_ndjson('comments.ndjson', COMMENTS)
+
+        self.assert_engines_equal(load_comments_df, path, frozenset({'id', 'parent_id'}))
+        self.assert_engines_equal(load_comments_df, path, constants.DEFAULT_COMMENT_COLUMNS | {'parent_id'})
+
+        submissions_path = self.write_ndjson('submissions.ndjson', SUBMISSIONS)
+        self.assert_engines_equal(
+            load_submissions_df,
+            submissions_path,
+            constants.DEFAULT_SUBMISSION_COLUMNS | {'permalink', 'link_flair_text'},
+        )
+
+    def test_requested_mixed_type_column(self) -> None:
+        path = self.write_ndjson('comments.ndjson', COMMENTS)
+
+        self.assert_engines_equal(load_comments_df, path, frozenset({'id', 'edited'}))
+        self.assert_engines_equal(load_comments_df, path, frozenset({'id', 'edited'}), limit=2)
+
+if __name__ == '__main__':
+    unittest.main()
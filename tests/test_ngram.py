@@ -0,0 +1,35 @@
+import unittest
+import numpy as np
+from src.models.ngram import NgramModel
+
+SENTENCES = [
+    ['verstappen', 'go', 'to', 'red', 'bull'],
+    ['hamilton', 'go', 'to', 'ferrari'],
+    ['sainz', 'move', 'to', 'williams'],
+    ['perez', 'stay', 'at', 'red', 'bull'],
+]
+
+class KneserNeyBackoffTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.model = NgramModel.fit(SENTENCES, n=3)
+
+    def kneser_ney(self, prefix: list[str]) -> np.ndarray:
+        return self.model.probabilities(prefix, method='kneser_ney')[1]
+
+    def test_unknown_context_token_backs_off_to_known_suffix(self) -> None:
+        bigram_context = self.kneser_ney(['to'])
+        unigram = self.kneser_ney(['kimi', 'raikkonen'])
+
+        np.testing.assert_allclose(self.kneser_ney(['kimi', 'to']), bigram_context)
+        self.assertFalse(np.allclose(bigram_context, unigram))
+
+        words = self.model.vocabulary
+        self.assertGreater(bigram_context[words.index('ferrari')], unigram[words.index('ferrari')])
+
+    def test_distributions_sum_to_one(self) -> None:
+        for prefix in (['go', 'to'], ['kimi', 'to'], ['to'], [], ['kimi', 'raikkonen']):
+            with self.subTest(prefix=prefix):
+                self.assertAlmostEqual(float(self.kneser_ney(prefix).sum()), 1.0)
+
+if __name__ == '__main__':
+    unittest.main()
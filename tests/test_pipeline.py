@@ -0,0 +1,38 @@
+import json
+from pathlib import Path
+import tempfile
+import unittest
+from unittest import mock
+import pandas as pd
+from src import pipeline
+from src.data import cache, constants
+from src.data.loader import load_submissions_df
+
+SUBMISSIONS = [
+    {'author': 'a', 'created_utc': 1654041600, 'edited': 1654041700.5, 'gilded': 0, 'id': 's1', 'score': 10,
+     'selftext': '', 'title': 'Penalty for Max', 'permalink': '/r/formula1/s1', 'post_hint': 'image',
+     'link_flair_text': ':post-news: News'},
+    {'author': 'b', 'created_utc': 1654041660, 'edited': False, 'gilded': 0, 'id': 's2', 'score': 1,
+     'selftext': 'text', 'title': 'Steward decision', 'permalink': '/r/formula1/s2', 'link_flair_text': None},
+]
+
+class StewardSentimentLoadTest(unittest.TestCase):
+    def test_load_and_filter_submissions(self) -> None:
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / 'formula1_submissions.ndjson'
+            path.write_text(''.join(json.dumps(row) + '\n' for row in SUBMISSIONS), encoding='utf-8')
+            columns = sorted(constants.DEFAULT_SUBMISSION_COLUMNS | {'permalink', 'post_hint', 'link_flair_text'})
+
+            with mock.patch.object(cache, 'PARSED_DATA_CACHE_DIR', Path(directory) / 'parsed'):
+                submissions_df = pipeline._load_submissions(path, columns, None)
+
+            expected_df = load_submissions_df(path, columns=frozenset(columns), engine='python', use_cache=False)
+            pd.testing.assert_frame_equal(submissions_df[columns], expected_df[columns])
+
+            filtered_df = pipeline._filter_steward_decisions(
+                submissions_df, pipeline.STEWARD_DECISION_WORDS, pipeline.STEWARD_DECISION_FLAIRS, (),
+            )
+            self.assertEqual(filtered_df['id'].tolist(), ['s1'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+from collections.abc import Sequence
+import importlib.util
+from pathlib import Path
+import tempfile
+import unittest
+from types import SimpleNamespace
+from typing import Any
+from src.models.inference_cache import InferenceCache
+from src.models.prediction_detection import PredictionDetector, chunk_spans
+
+class FakeGliner:
+    '''Tags every 'P<n>' word as a position and counts the chunks it is run on.'''
+
+    def __init__(self) -> None:
+        self.config = SimpleNamespace(max_len=384)
+        self.predicted_chunks: list[str] = []
+
+    def to(self, device: Any) -> 'FakeGliner':
+        return self
+
+    def eval(self) -> 'FakeGliner':
+        return self
+
+    def batch_predict_entities(
+        self,
+        texts: Sequence[str],
+        labels: list[str],
+        threshold: float,
+    ) -> list[list[dict[str, Any]]]:
+        self.predicted_chunks.extend(texts)
+        return [
+            [
+                {'start': text.index(word), 'end': text.index(word) + len(word), 'text': word, 'label': 'position',
+                 'score': 0.9}
+                for word in text.split() if word[:1] == 'P' and word[1:].isdigit()
+            ]
+            for text in texts
+        ]
+
+class ChunkSpansTest(unittest.TestCase):
+    def test_invalid_chunk_sizes(self) -> None:
+        for max_words, overlap_words in ((0, 0), (-1, 0), (4, 4), (4, 5), (4, -1)):
+            with self.subTest(max_words=max_words, overlap_words=overlap_words):
+                with self.assertRaises(ValueError):
+                    chunk_spans('Verstappen finishes P1 ahead of Norris', max_words, overlap_words)
+                with self.assertRaises(ValueError):
+                    PredictionDetector(model=FakeGliner(), max_words=max_words, overlap_words=overlap_words)
+
+    def test_overlapping_chunks(self) -> None:
+        text = 'a b c d e f g'
+        self.assertEqual(
+            [text[start:end] for start, end in chunk_spans(text, 4, 2)],
+            ['a b c d', 'c d e f', 'e f g'],
+        )
+
+@unittest.skipUnless(importlib.util.find_spec('torch'), 'running GLiNER, even a fake one, needs torch')
+class PredictionDetectorCacheTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.inference_cache = InferenceCache(Path(self.directory.name) / 'inference.sqlite3')
+        self.addCleanup(self.inference_cache.close)
+
+    def test_cached_chunks_are_not_run_again(self) -> None:
+        texts = ['Verstappen finishes P1 ahead of Norris', 'Norris will win P2', 'no keyword here']
+        model = FakeGliner()
+        detector = PredictionDetector(model=model, revision='abc', inference_cache=self.inference_cache)
+
+        first = detector.entities(texts)
+        self.assertEqual(len(model.predicted_chunks), 2)
+        self.assertEqual(detector.entities(texts), first)
+        self.assertEqual(len(model.predicted_chunks), 2)
+        self.assertEqual(detector.has_prediction(texts).tolist(), [True, True, False])
+
+        other_threshold = PredictionDetector(
+            model=model, revision='abc', threshold=0.6, inference_cache=self.inference_cache,
+        )
+        other_threshold.entities(texts)
+        self.assertEqual(len(model.predicted_chunks), 4)
+
+if __name__ == '__main__':
+    unittest.main()
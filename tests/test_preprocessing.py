@@ -0,0 +1,52 @@
+from pathlib import Path
+import tempfile
+import unittest
+from unittest import mock
+from symspellpy import Verbosity
+from src.data import preprocessing
+
+DICTIONARY = '''the 23135851162
+receive 52361226
+penalty 9658285
+steward 1173584
+qualifying 2405237
+championship 5405214
+'''
+
+class SymSpellIndexTest(unittest.TestCase):
+    '''The persisted index has to give the same suggestions as the index built from the dictionary file.'''
+
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.dictionary_file = Path(self.directory.name) / 'dictionary.txt'
+        self.dictionary_file.write_text(DICTIONARY, encoding='utf-8')
+
+    def test_saved_index_lookups(self) -> None:
+        built = preprocessing.build_sym_spell(self.dictionary_file)
+        path = Path(self.directory.name) / 'sym_spell.npz'
+        preprocessing._save_sym_spell_index(built, path)
+        loaded = preprocessing._load_sym_spell_index(path)
+
+        self.assertEqual(loaded.words, built.words)
+        self.assertEqual(dict(loaded.deletes), dict(built.deletes))
+        for word in ('teh', 'recieve', 'penality', 'stewards', 'qualifyng', 'championsihp', 'verstapen', 'hamiltn'):
+            with self.subTest(word=word):
+                self.assertEqual(
+                    [str(suggestion) for suggestion in loaded.lookup(word, Verbosity.CLOSEST, max_edit_distance=3)],
+                    [str(suggestion) for suggestion in built.lookup(word, Verbosity.CLOSEST, max_edit_distance=3)],
+                )
+
+    def test_prebuilt_index_is_found(self) -> None:
+        with (
+            mock.patch.object(preprocessing, 'ENGLISH_WORDS_DICTIONARY_FILE', self.dictionary_file),
+            mock.patch.object(preprocessing, 'SYM_SPELL_ARTIFACTS_DIR', Path(self.directory.name) / 'sym_spell'),
+        ):
+            path = preprocessing.prebuild_sym_spell()
+            self.assertEqual(preprocessing._find_sym_spell_artifact(), path)
+
+            self.dictionary_file.unlink()
+            self.assertEqual(preprocessing._find_sym_spell_artifact(), path)
+
+if __name__ == '__main__':
+    unittest.main()
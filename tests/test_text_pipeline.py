@@ -0,0 +1,24 @@
+import unittest
+import pandas as pd
+from src.data import preprocessing
+from src.data.text_pipeline import normalize_column
+
+TEXTS = [
+    'Max\xa0Verstappen won 5٣ races',
+    'Check https://example.com/race?id=1 for the RESULTS!!',
+    'P1 for Pérez and Leclerc\tin Monaco',
+    'İstanbul Park returns in 2０２５?',
+]
+
+class NormalizeColumnTest(unittest.TestCase):
+    '''`normalize_column` has to return `preprocessing.normalize` of every text, whatever the string dtype.'''
+
+    def test_parity_with_normalize(self) -> None:
+        expected = [preprocessing.normalize(text) for text in TEXTS]
+
+        for dtype in (object, pd.StringDtype('pyarrow')):
+            with self.subTest(dtype=dtype):
+                self.assertEqual(normalize_column(pd.Series(TEXTS, dtype=dtype)).tolist(), expected)
+
+if __name__ == '__main__':
+    unittest.main()
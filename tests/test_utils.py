@@ -0,0 +1,36 @@
+from functools import partial
+import pickle
+import unittest
+from src import utils
+
+LOADS: list[str] = []
+
+def load_model(name: str, variant: str = 'default') -> tuple[str, str]:
+    LOADS.append(name)
+    return name, variant
+
+class WorkerLocalTest(unittest.TestCase):
+    def setUp(self) -> None:
+        LOADS.clear()
+        self.addCleanup(utils._worker_locals.clear)
+
+    def test_unpickled_partials_share_the_result(self) -> None:
+        factory = partial(load_model, 'roberta', variant='int8')
+
+        # Dask unpickles the factory again in every task.
+        results = [utils.worker_local(pickle.loads(pickle.dumps(factory))) for _ in range(3)]
+
+        self.assertEqual(LOADS, ['roberta'])
+        self.assertEqual(results, [('roberta', 'int8')] * 3)
+
+        self.assertEqual(utils.worker_local(partial(load_model, 'roberta', variant='default')), ('roberta', 'default'))
+        self.assertEqual(LOADS, ['roberta', 'roberta'])
+
+    def test_explicit_key(self) -> None:
+        for _ in range(2):
+            self.assertEqual(utils.worker_local(lambda: load_model('absa'), key='absa'), ('absa', 'default'))
+
+        self.assertEqual(LOADS, ['absa'])
+
+if __name__ == '__main__':
+    unittest.main()